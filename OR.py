@@ -1,41 +1,157 @@
 import pulp
-from tabulate import tabulate
 import json
+import os
+import tempfile
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+from trip_filter import filter_dominated_trips, print_filter_report
+from decomposed_solve import decomposed_solve, best_first_solve
+from pareto_frontier import pareto_frontier
+from query_index import QueryIndex
+from watch_mode import DatasetWatcher
+from dataset_validator import load_dataset, print_validation_report, format_report, DatasetError
+from result_export import open_writer, export_rows, print_table
+from model_cache import compiled_model, CACHE_DIR
+from tie_breaking import rank_ties, describe_criteria
+from solve_limits import SolveBudget, parse_cbc_log, new_solve_info
+from trip_store import trip_tuples
+from fare_classes import apply_fare_classes, choose_classes, parse_classes, FARE_POLICIES
 
-def load_json_and_solve(json_path):
+STOP_REASONS = {'time_limit': "时间上限", 'node_limit': "节点上限"}
+RESULT_HEADERS = ["目的地", "去程车次", "去程票价", "返程车次", "返程票价", "总交通成本", "停留时间(h)", "成本合规", "停留合规", "目标值"]
+
+
+def solution_row(sol, params, alpha, budget):
+    """把一个解转换为结果表格中的一行"""
+    dest = sol['destination']
+    out_trip, out_cost = sol['outbound'] if sol['outbound'] else ("-", 0)
+    ret_trip, ret_cost = sol['return'] if sol['return'] else ("-", 0)
+    # 分席别票价的车次在车次编号后注明所选席别
+    out_class, ret_class = sol.get('classes') or (None, None)
+    if out_class:
+        out_trip = f"{out_trip}({out_class})"
+    if ret_class:
+        ret_trip = f"{ret_trip}({ret_class})"
+    total_cost = sol['cost']
+    stay = sol['stay'] if sol['stay'] is not None else "-"
+
+    # 成本合规性检查
+    cost_ok = "√" if total_cost <= budget else "×"
+
+    # 停留时间合规性检查
+    stay_ok = "×"
+    if dest and stay != "-":
+        min_stay_j = params[dest]['min_stay_hours']
+        max_stay_j = params[dest]['max_stay_hours']
+        if min_stay_j <= stay <= max_stay_j:
+            stay_ok = "√"
+
+    # 计算目标值 U - alpha * D
+    objective = params[dest]['U'] - alpha * params[dest]['D']
+    return [dest, out_trip, out_cost, ret_trip, ret_cost, total_cost, stay, cost_ok, stay_ok, f"{objective:.2f}"]
+
+
+def check_solution(idx, sol, params, budget):
+    """第 idx 个解的额外验证信息：超出预算、停留时间不在允许区间等警告（列表）"""
+    dest = sol['destination']
+    total_cost = sol['cost']
+    stay = sol['stay']
+    messages = []
+    if total_cost > budget:
+        messages.append(f"警告：解{idx} ({dest}) 总交通成本 {total_cost} 超出预算 {budget}！")
+    if dest and stay is not None:
+        min_stay_j = params[dest]['min_stay_hours']
+        max_stay_j = params[dest]['max_stay_hours']
+        if not (min_stay_j <= stay <= max_stay_j):
+            messages.append(f"警告：解{idx} ({dest}) 停留时间 {stay:.1f}h 不在允许区间 [{min_stay_j}h, {max_stay_j}h]！")
+    elif dest and stay is None and sol['outbound'] and sol['return']:
+        messages.append(f"警告：解{idx} ({dest}) 无法计算停留时间（可能缺少车次信息？）")
+    return messages
+
+
+def load_json_and_solve(json_path, prefilter=None, engine="milp", workers=None, export_path=None,
+                        table_limit=None, model_cache=None, tie_break=None, top=1, time_limit=None,
+                        max_nodes=None, info=None, origin=None, delay_scenarios=None, delay_rerank=False,
+                        fare_classes=None, fare_policy="cheapest"):
+    # export_path: 把全部结果逐块写入 .csv/.jsonl/.orcol 文件；table_limit: 返回的表格最多保留的行数（None 为不限）
+    # model_cache: MILP 模型缓存目录（None 为不缓存），见 model_cache.py
+    # tie_break: 并列最优解的排序依据（如 "cost,departure"，见 tie_breaking.py），给出时只返回排序后的前 top 个
+    # time_limit: 整次求解（含并列解枚举）的时限（秒）；max_nodes: 每次调用 CBC 的分支节点上限
+    # origin: 多出发地数据文件中的出发地（None 为第一个），见 multi_origin.py
+    # delay_scenarios: 对结果做延误稳健性评估的场景数（None 为不评估）；delay_rerank: 按风险调整效用重新排序，见 delay_robustness.py
+    # fare_classes: 允许的席别（None 为不限）；fare_policy: 为每个解选择席别的策略 "cheapest" / "upgrade"，见 fare_classes.py
+    # info: 传入字典时填写求解信息（是否完整、是否证明最优、停止原因、最优界、间隙等，见 solve_limits.new_solve_info）
+    writer = None
+    solve_budget = SolveBudget(time_limit, max_nodes)
+    if info is None:
+        info = {}
+    info.update(new_solve_info())
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            
-        destinations = data["destinations"]
+        # --- 校验并规范化数据（缺少停留时间时使用默认值 0 和 M；结果按文件缓存，只读） ---
+        data, validation_report = load_dataset(json_path, origin=origin)
+        print_validation_report(validation_report)
+        if fare_classes:
+            # 车次票价取允许席别中的最低价，模型结构不变
+            data, removed = apply_fare_classes(data, fare_classes)
+            print(f"只允许席别 {', '.join(fare_classes)}，去掉没有这些席别的车次 {removed} 个")
+
+        destinations = list(data["destinations"])  # pulp 会把 tuple 下标当作多维下标
         params = data["params"]
         outbound_trips = data["outbound_trips"]
         return_trips = data["return_trips"]
 
-        # --- 检查数据完整性 ---
-        missing_stay_info = False
-        for j in destinations:
-            if 'min_stay_hours' not in params[j] or 'max_stay_hours' not in params[j]:
-                print(f"警告：目的地 '{j}' 在 'params' 中缺少 'min_stay_hours' 或 'max_stay_hours' 信息。")
-                missing_stay_info = True
-        if missing_stay_info:
-            print("将为缺少信息的目标使用默认值 0 和 M (非常宽松)")
-
-
         # --- Other Parameters ---
         global alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end
         M = 10000
 
+        # --- 求解前剔除被支配车次 (prefilter: None / "exact" / "aggressive") ---
+        if prefilter:
+            data, filter_report = filter_dominated_trips(data, prefilter, budget, W_out_start, W_out_end,
+                                                         W_ret_start, W_ret_end)
+            print_filter_report(filter_report)
+            outbound_trips = data["outbound_trips"]
+            return_trips = data["return_trips"]
+
+        # --- 逐个接收求解得到的解：选定席别后立即写入导出文件和表格，不保存全部解 ---
+        # 延误稳健性评估需要全部解（还可能重新排序），此时先保存，评估后再写入
+        table = []
+        headers = RESULT_HEADERS
+        held = [] if delay_scenarios else None
+        checks = []  # 额外验证信息
+        found = 0
+        if export_path:
+            writer = open_writer(export_path, headers)
+
+        def record(idx, sol):
+            row = solution_row(sol, params, alpha, budget)
+            if writer is not None:
+                writer.write_row(row)
+            if table_limit is None or len(table) < table_limit:
+                table.append(row)
+            checks.extend(check_solution(idx, sol, params, budget))
+
+        def emit(sol):
+            nonlocal found
+            found += 1
+            if data.get("fare_classes"):
+                sol = choose_classes(sol, data, budget, fare_policy, fare_classes)
+            if held is not None:
+                held.append(sol)
+            else:
+                record(found, sol)
+
         # --- Function to create the basic model ---
         def create_model():
             prob = pulp.LpProblem("TrainTicketOptimization", pulp.LpMaximize)
+            # 每个目的地的车次一次性取为 (车次, 发车, 到达, 票价) 元组，列式存储时直接切取列数组
+            outs = {j: trip_tuples(outbound_trips.get(j, {})) for j in destinations}
+            rets = {j: trip_tuples(return_trips.get(j, {})) for j in destinations}
             # Define Decision Variables
             x = pulp.LpVariable.dicts("ChooseDest", destinations, cat='Binary')
-            y_keys = [(j, tout) for j in destinations for tout in outbound_trips[j]]
+            y_keys = [(j, t[0]) for j in destinations for t in outs[j]]
             y = pulp.LpVariable.dicts("OutboundTrip", y_keys, cat='Binary')
-            z_keys = [(j, tret) for j in destinations for tret in return_trips[j]]
+            z_keys = [(j, t[0]) for j in destinations for t in rets[j]]
             z = pulp.LpVariable.dicts("ReturnTrip", z_keys, cat='Binary')
 
             # Define Objective Function
@@ -46,155 +162,264 @@ def load_json_and_solve(json_path):
             prob += pulp.lpSum(x[j] for j in destinations) == 1, "Exactly_One_Destination"
             # Constraint 2: Link outbound trip selection to destination selection
             for j in destinations:
-                prob += pulp.lpSum(y[(j, tout)] for tout in outbound_trips[j]) == x[j], f"Link_Outbound_{j}"
+                prob += pulp.lpSum(y[(j, t[0])] for t in outs[j]) == x[j], f"Link_Outbound_{j}"
             # Constraint 3: Link return trip selection to destination selection
             for j in destinations:
-                prob += pulp.lpSum(z[(j, tret)] for tret in return_trips[j]) == x[j], f"Link_Return_{j}"
+                prob += pulp.lpSum(z[(j, t[0])] for t in rets[j]) == x[j], f"Link_Return_{j}"
             # Constraint 4: Budget Limit (Traffic Cost)
-            prob += (pulp.lpSum(outbound_trips[j][tout]['cost'] * y[(j, tout)] for j, tout in y_keys) +
-                    pulp.lpSum(return_trips[j][tret]['cost'] * z[(j, tret)] for j, tret in z_keys) <= budget), "Budget_Limit"
+            prob += (pulp.lpSum(cost * y[(j, tout)] for j in destinations for tout, _, _, cost in outs[j]) +
+                    pulp.lpSum(cost * z[(j, tret)] for j in destinations for tret, _, _, cost in rets[j]) <= budget), "Budget_Limit"
             # Constraint 5: Outbound Time Window (Using Big M)
-            for j, tout in y_keys:
-                prob += outbound_trips[j][tout]['dep_time'] >= W_out_start - M * (1 - y[(j, tout)]), f"OutWindowStart_{j}_{tout}"
-                prob += outbound_trips[j][tout]['dep_time'] <= W_out_end + M * (1 - y[(j, tout)]), f"OutWindowEnd_{j}_{tout}"
+            for j in destinations:
+                for tout, dep, _, _ in outs[j]:
+                    prob += dep >= W_out_start - M * (1 - y[(j, tout)]), f"OutWindowStart_{j}_{tout}"
+                    prob += dep <= W_out_end + M * (1 - y[(j, tout)]), f"OutWindowEnd_{j}_{tout}"
             # Constraint 6: Return Time Window (Using Big M)
-            for j, tret in z_keys:
-                prob += return_trips[j][tret]['dep_time'] >= W_ret_start - M * (1 - z[(j, tret)]), f"RetWindowStart_{j}_{tret}"
-                prob += return_trips[j][tret]['dep_time'] <= W_ret_end + M * (1 - z[(j, tret)]), f"RetWindowEnd_{j}_{tret}"
+            for j in destinations:
+                for tret, dep, _, _ in rets[j]:
+                    prob += dep >= W_ret_start - M * (1 - z[(j, tret)]), f"RetWindowStart_{j}_{tret}"
+                    prob += dep <= W_ret_end + M * (1 - z[(j, tret)]), f"RetWindowEnd_{j}_{tret}"
 
             # Constraint 7 & 8: Destination-Specific Stay Duration (Using Big M)
             for j in destinations:
                 # 获取目的地 j 特定 的最短和最长停留时间
-                # 添加 .get() 以处理可能缺失键的情况，提供默认值
-                min_stay_j = params[j].get('min_stay_hours', 0) # 默认最短0小时
-                max_stay_j = params[j].get('max_stay_hours', M) # 默认最长 M 小时 (非常宽松)
+                # 缺失的停留时间已在数据校验时补为默认值 0 和 M
+                min_stay_j = params[j]['min_stay_hours']
+                max_stay_j = params[j]['max_stay_hours']
 
-                for tout in outbound_trips[j]:
-                    for tret in return_trips[j]:
+                for tout, _, arr, _ in outs[j]:
+                    for tret, dep, _, _ in rets[j]:
                         # Constraint 7: Minimum Stay Duration
-                        prob += (return_trips[j][tret]['dep_time'] - outbound_trips[j][tout]['arr_time'] >=
+                        prob += (dep - arr >=
                                 min_stay_j - M * (2 - y[(j, tout)] - z[(j, tret)])), f"MinStay_{j}_{tout}_{tret}"
                         # Constraint 8: Maximum Stay Duration
-                        prob += (return_trips[j][tret]['dep_time'] - outbound_trips[j][tout]['arr_time'] <=
+                        prob += (dep - arr <=
                                 max_stay_j + M * (2 - y[(j, tout)] - z[(j, tret)])), f"MaxStay_{j}_{tout}_{tret}"
 
             # Return the problem and variables for modification
             return prob, x, y, z
 
+        # --- 记录并打印一个最优解 ---
+        def describe_solution(j, selected_out_trip, selected_ret_trip, current_objective_value, solution_count):
+            print(f"\n--- 找到最优解 #{solution_count} ---")
+            solution_details = {'destination': j, 'outbound': None, 'return': None, 'cost': 0, 'objective': current_objective_value, 'stay': None}
+            print(f"- 目的地: {j}")
+            cost = 0
+            if selected_out_trip is not None:
+                solution_details['outbound'] = (selected_out_trip, outbound_trips[j][selected_out_trip]['cost'])
+                print(f"  - 去程车次: {selected_out_trip} (成本: {outbound_trips[j][selected_out_trip]['cost']})")
+                cost += outbound_trips[j][selected_out_trip]['cost']
+            if selected_ret_trip is not None:
+                solution_details['return'] = (selected_ret_trip, return_trips[j][selected_ret_trip]['cost'])
+                print(f"  - 返程车次: {selected_ret_trip} (成本: {return_trips[j][selected_ret_trip]['cost']})")
+                cost += return_trips[j][selected_ret_trip]['cost']
+            solution_details['cost'] = cost
+            print(f"总交通成本: {cost}")
+            # 计算并存储停留时间
+            if selected_out_trip and selected_ret_trip:
+                stay_duration = return_trips[j][selected_ret_trip]['dep_time'] - outbound_trips[j][selected_out_trip]['arr_time']
+                solution_details['stay'] = stay_duration
+                print(f"停留时间: {stay_duration} 小时")
+            return solution_details
+
+        # --- 判断一次 CBC 求解的结果（时限 / 节点上限见 solve_limits.py） ---
+        def judge(status, proven, current_objective_value, target_objective_value, log):
+            """返回 'record'（记录为最优解并继续）、'record_stop'（记录后停止）或 'stop'"""
+            info['solves'] += 1
+            reason = solve_budget.stop_reason(log)
+            if info['solves'] == 1:
+                info['proven_optimal'] = proven if status == 'Optimal' else (False if reason else None)
+                info['bound'] = current_objective_value if proven else log.get('bound')
+                info['gap'] = 0.0 if proven else log.get('gap')
+            if status != 'Optimal':
+                if reason:
+                    info.update(complete=False, stopped=reason)
+                    print(f"\n达到{STOP_REASONS[reason]}，未找到更多可行解。停止搜索。")
+                else:
+                    print(f"\n求解器状态: {status}。未找到更多最优解。")
+                return 'stop'
+            if target_objective_value is None:
+                if not proven:
+                    # 只找到可行解：作为目前最好的结果返回，不再枚举
+                    info.update(complete=False, stopped=reason)
+                    print(f"达到{STOP_REASONS.get(reason, '求解上限')}，目前最好的目标值 {current_objective_value}"
+                          f"（最优界 {info['bound']}，间隙 {info['gap']}），未证明最优。")
+                    return 'record_stop'
+                return 'record'
+            if abs(current_objective_value - target_objective_value) < 1e-5:
+                return 'record'
+            if not proven:
+                info.update(complete=False, stopped=reason)
+                print(f"\n达到{STOP_REASONS.get(reason, '求解上限')}，无法确定是否还有并列最优解。停止搜索。")
+                return 'stop'
+            print(f"\n找到次优解，目标值 {current_objective_value}。停止搜索。")
+            return 'stop'
+
+        def out_of_time():
+            if solve_budget.expired():
+                info.update(complete=False, stopped='time_limit')
+                print(f"\n已用完 {solve_budget.time_limit} 秒时限，返回已找到的解。")
+                return True
+            return False
+
         # --- Iterative Solving Process ---
-        prob, x, y, z = create_model()
-        optimal_solutions = []
-        solution_count = 0
-        target_objective_value = None
-
-        while True:
-            prob.solve(pulp.PULP_CBC_CMD(msg=0))
-            if pulp.LpStatus[prob.status] == 'Optimal':
-                current_objective_value = pulp.value(prob.objective)
+        def solve_iteratively():
+            # 逐个加入排除约束，枚举目标值相同的全部最优解
+            prob, x, y, z = create_model()
+            solution_count = 0
+            target_objective_value = None
+
+            while not out_of_time():
+                log = {}
+                if solve_budget.limited:
+                    with tempfile.TemporaryDirectory() as tmp:
+                        log_path = os.path.join(tmp, "cbc.log")
+                        prob.solve(solve_budget.pulp_solver(log_path))
+                        with open(log_path, "r", errors="replace") as f:
+                            log = parse_cbc_log(f.read())
+                else:
+                    prob.solve(pulp.PULP_CBC_CMD(msg=0))
+                status = pulp.LpStatus[prob.status]
+                current_objective_value = pulp.value(prob.objective) if status == 'Optimal' else None
+                action = judge(status, prob.sol_status == pulp.LpSolutionOptimal, current_objective_value,
+                               target_objective_value, log)
+                if action == 'stop':
+                    break
                 if target_objective_value is None:
                     target_objective_value = current_objective_value
                     print(f"找到初始最优目标值: {target_objective_value}")
 
-                if abs(current_objective_value - target_objective_value) < 1e-5:
-                    solution_count += 1
-                    print(f"\n--- 找到最优解 #{solution_count} ---")
-                    solution_details = {'destination': None, 'outbound': None, 'return': None, 'cost': 0, 'objective': current_objective_value, 'stay': None}
-                    vars_in_solution = []
-                    selected_dest = None # 记录选中的目的地
-                    selected_out_trip = None
-                    selected_ret_trip = None
-
-                    for j in destinations:
-                        if x[j].varValue > 0.9:
-                            solution_details['destination'] = j
-                            selected_dest = j # 记录
-                            vars_in_solution.append(x[j])
-                            print(f"- 目的地: {j}")
-                            cost = 0
-                            for tout in outbound_trips[j]:
-                                if y[(j, tout)].varValue > 0.9:
-                                    solution_details['outbound'] = (tout, outbound_trips[j][tout]['cost'])
-                                    selected_out_trip = tout # 记录
-                                    vars_in_solution.append(y[(j, tout)])
-                                    print(f"  - 去程车次: {tout} (成本: {outbound_trips[j][tout]['cost']})")
-                                    cost += outbound_trips[j][tout]['cost']
-                            for tret in return_trips[j]:
-                                if z[(j, tret)].varValue > 0.9:
-                                    solution_details['return'] = (tret, return_trips[j][tret]['cost'])
-                                    selected_ret_trip = tret # 记录
-                                    vars_in_solution.append(z[(j, tret)])
-                                    print(f"  - 返程车次: {tret} (成本: {return_trips[j][tret]['cost']})")
-                                    cost += return_trips[j][tret]['cost']
-                            solution_details['cost'] = cost
-                            print(f"总交通成本: {cost}")
-                            # 计算并存储停留时间
-                            if selected_out_trip and selected_ret_trip:
-                                stay_duration = return_trips[j][selected_ret_trip]['dep_time'] - outbound_trips[j][selected_out_trip]['arr_time']
-                                solution_details['stay'] = stay_duration
-                                print(f"停留时间: {stay_duration} 小时")
-
-                    optimal_solutions.append(solution_details)
-                    prob += pulp.lpSum(v for v in vars_in_solution) <= (len(vars_in_solution) - 1), f"Exclude_Solution_{solution_count}"
-                else:
-                    print(f"\n找到次优解，目标值 {current_objective_value}。停止搜索。")
+                solution_count += 1
+                vars_in_solution = []
+                selected_out_trip = None
+                selected_ret_trip = None
+
+                for j in destinations:
+                    if x[j].varValue > 0.9:
+                        vars_in_solution.append(x[j])
+                        for tout in outbound_trips[j]:
+                            if y[(j, tout)].varValue > 0.9:
+                                selected_out_trip = tout # 记录
+                                vars_in_solution.append(y[(j, tout)])
+                        for tret in return_trips[j]:
+                            if z[(j, tret)].varValue > 0.9:
+                                selected_ret_trip = tret # 记录
+                                vars_in_solution.append(z[(j, tret)])
+                        emit(describe_solution(
+                            j, selected_out_trip, selected_ret_trip, current_objective_value, solution_count))
+
+                if action == 'record_stop':
                     break
-            else:
-                print(f"\n求解器状态: {pulp.LpStatus[prob.status]}。未找到更多最优解。")
-                break
+                prob += pulp.lpSum(v for v in vars_in_solution) <= (len(vars_in_solution) - 1), f"Exclude_Solution_{solution_count}"
+            return target_objective_value
+
+        # --- 使用磁盘缓存的模型求解（逐个排除法与 solve_iteratively 相同） ---
+        def solve_iteratively_cached():
+            settings = {'budget': budget, 'W_out_start': W_out_start, 'W_out_end': W_out_end,
+                        'W_ret_start': W_ret_start, 'W_ret_end': W_ret_end}
+            start = time.perf_counter()
+            model, hit = compiled_model(data, create_model, settings, M=M, cache_dir=model_cache)
+            print(f"{'已载入缓存的模型' if hit else '已构建模型并写入缓存'}（{time.perf_counter() - start:.2f}s）")
+            model.set_parameters(params, alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+            solution_count = 0
+            target_objective_value = None
+
+            while not out_of_time():
+                status, current_objective_value, chosen, log = model.solve(
+                    budget=solve_budget if solve_budget.limited else None)
+                action = judge(status, log['proven'], current_objective_value, target_objective_value, log)
+                if action == 'stop':
+                    break
+                if target_objective_value is None:
+                    target_objective_value = current_objective_value
+                    print(f"找到初始最优目标值: {target_objective_value}")
+                selected = {kind: (j, trip) for kind, j, trip in chosen}
+                solution_count += 1
+                emit(describe_solution(
+                    selected['x'][0], selected.get('y', (None, None))[1], selected.get('z', (None, None))[1],
+                    current_objective_value, solution_count))
+                if action == 'record_stop':
+                    break
+                model.exclude(chosen)
+            return target_objective_value
+
+        if tie_break and engine == "pareto":
+            raise ValueError("Pareto 前沿中的方案目标值各不相同，不能按并列最优解排序；请选择其他求解方式或不设置并列排序")
+        if tie_break:
+            # 指定了并列排序时，任何求解方式都改为按目标值逐个检查并在搜索中排序，一次得到前 top 个，
+            # 不再用 CBC 或分解求解列出全部并列解（结果与列出全部并列解后再排序相同）
+            if engine != "best_first":
+                print(f"并列排序在按目标值逐个检查的搜索中一次完成，不逐个列出并列解（不使用 {engine} 求解方式）")
+            ranked, target_objective_value = rank_ties(
+                data, tie_break, alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end, top=top)
+            for sol in ranked:
+                emit(sol)
+            if target_objective_value is not None:
+                print(f"找到初始最优目标值: {target_objective_value}")
+                print(f"并列时依次按 {describe_criteria(tie_break)} 排序，保留前 {top} 个")
+        elif engine == "decomposed":
+            # 按目的地分解并行求解，不调用 CBC
+            _, target_objective_value = decomposed_solve(
+                data, alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end, workers=workers, on_solution=emit)
+            if target_objective_value is not None:
+                print(f"找到初始最优目标值: {target_objective_value}")
+        elif engine == "best_first":
+            # 按目标值从高到低逐个检查目的地，找到最优及并列者后立即停止，不调用 CBC
+            stats = {}
+            _, target_objective_value = best_first_solve(
+                data, alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end, stats=stats, on_solution=emit)
+            if target_objective_value is not None:
+                print(f"找到初始最优目标值: {target_objective_value}")
+            print(f"检查了 {stats['checked']}/{stats['total']} 个目的地")
+        elif engine == "pareto":
+            # 目标值 / 交通成本 / 停留时间 三个指标上互不支配的全部方案（不是单一最优）
+            frontier = pareto_frontier(data, alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+            target_objective_value = frontier[0]['objective'] if frontier else None
+            print(f"Pareto 前沿共 {len(frontier)} 个方案（目标值越高、成本越低、停留越长越好）")
+            for sol in frontier:
+                emit(sol)
+        elif model_cache:
+            target_objective_value = solve_iteratively_cached()
+        else:
+            target_objective_value = solve_iteratively()
 
         # --- Final Summary ---
+        info['elapsed'] = solve_budget.elapsed()
         print("\n=============================================")
-        if target_objective_value is not None:
-            print(f"搜索完成。找到 {len(optimal_solutions)} 个最优解，目标值 {target_objective_value}")
+        if not info['complete'] and target_objective_value is None:
+            print(f"搜索未完成（{STOP_REASONS.get(info['stopped'], '求解上限')}），尚未找到可行解。")
+        elif not info['complete']:
+            print(f"搜索未完成（{STOP_REASONS.get(info['stopped'], '求解上限')}），"
+                  f"返回目前找到的 {found} 个解，目标值 {target_objective_value}"
+                  + ("（未证明最优）" if info['proven_optimal'] is False else ""))
+        elif target_objective_value is not None:
+            print(f"搜索完成。找到 {found} 个最优解，目标值 {target_objective_value}")
         else:
             print("搜索完成。未找到可行解。")
         print("=============================================")
 
-        # 表格化输出所有最优解
-        table = []
-        headers = ["目的地", "去程车次", "去程票价", "返程车次", "返程票价", "总交通成本", "停留时间(h)", "成本合规", "停留合规", "目标值"]
-        for sol in optimal_solutions:
-            dest = sol['destination']
-            out_trip, out_cost = sol['outbound'] if sol['outbound'] else ("-", 0)
-            ret_trip, ret_cost = sol['return'] if sol['return'] else ("-", 0)
-            total_cost = sol['cost']
-            stay = sol['stay'] if sol['stay'] is not None else "-"
-
-            # 成本合规性检查
-            cost_ok = "√" if total_cost <= budget else "×"
-
-            # 停留时间合规性检查
-            stay_ok = "×"
-            if dest and stay != "-":
-                min_stay_j = params[dest].get('min_stay_hours', 0)
-                max_stay_j = params[dest].get('max_stay_hours', M)
-                if min_stay_j <= stay <= max_stay_j:
-                    stay_ok = "√"
-
-            # 计算目标值 U - alpha * D
-            objective = params[dest]['U'] - alpha * params[dest]['D']
-            table.append([dest, out_trip, out_cost, ret_trip, ret_cost, total_cost, stay, cost_ok, stay_ok, f"{objective:.2f}"])
+        if held:
+            # 只在需要时导入（依赖 NumPy）
+            from delay_robustness import score_itineraries, rerank, print_robustness
+            delay_scores = score_itineraries(data, held, W_out_start, W_out_end, W_ret_start, W_ret_end,
+                                             scenarios=delay_scenarios)
+            if delay_rerank:
+                held, delay_scores = rerank(held, delay_scores)
+                print("结果已按风险调整效用（满足概率 × 目标值）重新排序")
+            print_robustness(held, delay_scores, delay_scenarios)
+            for idx, sol in enumerate(held, 1):
+                record(idx, sol)
+
+        if writer is not None:
+            writer.close()
+            print(f"\n已将 {writer.rows_written} 条结果导出到 {export_path}")
 
         # 额外验证信息
         print("\n--- 额外验证信息 ---")
-        if not optimal_solutions:
+        if not found:
             print("无最优解可供验证。")
-
-        for idx, sol in enumerate(optimal_solutions, 1):
-            dest = sol['destination']
-            total_cost = sol['cost']
-            stay = sol['stay']
-
-            if total_cost > budget:
-                print(f"警告：解{idx} ({dest}) 总交通成本 {total_cost} 超出预算 {budget}！")
-
-            if dest and stay is not None:
-                min_stay_j = params[dest].get('min_stay_hours', 0)
-                max_stay_j = params[dest].get('max_stay_hours', M)
-                if not (min_stay_j <= stay <= max_stay_j):
-                    print(f"警告：解{idx} ({dest}) 停留时间 {stay:.1f}h 不在允许区间 [{min_stay_j}h, {max_stay_j}h]！")
-            elif dest and stay is None and sol['outbound'] and sol['return']:
-                print(f"警告：解{idx} ({dest}) 无法计算停留时间（可能缺少车次信息？）")
+        for message in checks:
+            print(message)
 
         if target_objective_value is not None:
             print(f"\n最优目标值（Weighted Utility）：{target_objective_value}")
@@ -209,12 +434,19 @@ def load_json_and_solve(json_path):
     except json.JSONDecodeError:
         messagebox.showerror("错误", f"JSON文件格式无效：{json_path}")
         return None, None
+    except DatasetError as e:
+        print_validation_report(e.report)
+        messagebox.showerror("数据错误", f"数据文件校验未通过：{json_path}\n\n{format_report(e.report, limit=10)}")
+        return None, None
     except KeyError as e:
         messagebox.showerror("错误", f"JSON文件缺少必需的键: {e}")
         return None, None
     except Exception as e:
         messagebox.showerror("错误", f"处理文件时发生错误：{e}")
         return None, None
+    finally:
+        if writer is not None:
+            writer.close()
 
 def show_result_in_window(table_data, headers):
     if not table_data or not headers:
@@ -237,30 +469,68 @@ def show_result_in_window(table_data, headers):
         'W_ret_end': tk.IntVar(value=120)
     }
     
+    # 参数滑块：拖动时用预先构建的查询索引实时更新结果表（不调用 CBC）
+    def slider(parent, name, from_, to, resolution=1, length=160):
+        tk.Scale(parent, variable=params[name], from_=from_, to=to, resolution=resolution, orient="horizontal",
+                 length=length, command=lambda _value: schedule_live_update()).pack(side="left", padx=5)
+
     # 第一行参数
     row1 = tk.Frame(param_frame)
     row1.pack(fill="x", pady=2)
     tk.Label(row1, text="惩罚系数(α):").pack(side="left")
-    tk.Entry(row1, textvariable=params['alpha'], width=8).pack(side="left", padx=5)
+    slider(row1, 'alpha', 0, 5, resolution=0.1)
     tk.Label(row1, text="交通预算:").pack(side="left", padx=(20,0))
-    tk.Entry(row1, textvariable=params['budget'], width=8).pack(side="left", padx=5)
+    slider(row1, 'budget', 0, 5000, resolution=10, length=220)
+
+    row1b = tk.Frame(param_frame)
+    row1b.pack(fill="x", pady=2)
+    tk.Label(row1b, text="车次预筛选:").pack(side="left")
+    prefilter_var = tk.StringVar(value="不剔除")
+    ttk.Combobox(row1b, textvariable=prefilter_var, width=10, state="readonly",
+                 values=["不剔除", "exact", "aggressive"]).pack(side="left", padx=5)
+    tk.Label(row1b, text="求解方式:").pack(side="left", padx=(20,0))
+    engine_var = tk.StringVar(value="MILP (CBC)")
+    engine_names = {"MILP (CBC)": "milp", "按目的地分解并行": "decomposed", "按目标值逐个检查": "best_first",
+                    "Pareto前沿(目标值/成本/停留)": "pareto"}
+    ttk.Combobox(row1b, textvariable=engine_var, width=24, state="readonly",
+                 values=list(engine_names)).pack(side="left", padx=5)
+    tk.Label(row1b, text="并列时优先:").pack(side="left", padx=(20,0))
+    tie_var = tk.StringVar(value="全部列出")
+    tie_names = {"全部列出": None, "最低票价": "cost", "最低票价→最早出发": "cost,departure",
+                 "最低票价→停留最长": "cost,stay", "停留最长→最低票价": "stay,cost"}
+    ttk.Combobox(row1b, textvariable=tie_var, width=16, state="readonly",
+                 values=list(tie_names)).pack(side="left", padx=5)
+    tk.Label(row1b, text="前").pack(side="left")
+    top_var = tk.IntVar(value=1)
+    tk.Spinbox(row1b, from_=1, to=1000, textvariable=top_var, width=5).pack(side="left")
+    tk.Label(row1b, text="个").pack(side="left")
+    tk.Label(row1b, text="时限(秒,0为不限):").pack(side="left", padx=(20,0))
+    time_limit_var = tk.DoubleVar(value=0)
+    tk.Entry(row1b, textvariable=time_limit_var, width=6).pack(side="left", padx=5)
+    live_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(row1b, text="拖动滑块时实时更新", variable=live_var).pack(side="left", padx=(20,0))
+    cache_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(row1b, text="缓存MILP模型", variable=cache_var).pack(side="left", padx=(10,0))
+    watch_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(row1b, text="文件变化时自动重新求解", variable=watch_var,
+                   command=lambda: watch_tick()).pack(side="left", padx=(10,0))
     
     # 第二行参数
     row2 = tk.Frame(param_frame)
     row2.pack(fill="x", pady=2)
     tk.Label(row2, text="出发时间窗口:").pack(side="left")
-    tk.Entry(row2, textvariable=params['W_out_start'], width=4).pack(side="left", padx=2)
+    slider(row2, 'W_out_start', 0, 24)
     tk.Label(row2, text="至").pack(side="left")
-    tk.Entry(row2, textvariable=params['W_out_end'], width=4).pack(side="left", padx=2)
+    slider(row2, 'W_out_end', 0, 24)
     tk.Label(row2, text="小时").pack(side="left")
     
     # 第三行参数
     row3 = tk.Frame(param_frame)
     row3.pack(fill="x", pady=2)
     tk.Label(row3, text="返程时间窗口:").pack(side="left")
-    tk.Entry(row3, textvariable=params['W_ret_start'], width=4).pack(side="left", padx=2)
+    slider(row3, 'W_ret_start', 0, 168)
     tk.Label(row3, text="至").pack(side="left")
-    tk.Entry(row3, textvariable=params['W_ret_end'], width=4).pack(side="left", padx=2)
+    slider(row3, 'W_ret_end', 0, 168)
     tk.Label(row3, text="小时").pack(side="left")
     
     # 添加文件选择框和按钮
@@ -271,6 +541,16 @@ def show_result_in_window(table_data, headers):
     json_path_var = tk.StringVar(value="edited_travel_data.json")
     entry = tk.Entry(file_frame, textvariable=json_path_var, width=40)
     entry.pack(side="left", padx=5)
+    tk.Label(file_frame, text="出发地:").pack(side="left")
+    origin_var = tk.StringVar(value="")  # 只用于多出发地数据文件，留空时使用第一个出发地
+    tk.Entry(file_frame, textvariable=origin_var, width=8).pack(side="left", padx=5)
+    tk.Label(file_frame, text="席别:").pack(side="left")
+    fare_classes_var = tk.StringVar(value="")  # 逗号分隔，留空时不限
+    tk.Entry(file_frame, textvariable=fare_classes_var, width=14).pack(side="left", padx=5)
+    fare_policy_names = {label: name for name, label in FARE_POLICIES.items()}
+    fare_policy_var = tk.StringVar(value=FARE_POLICIES["cheapest"])
+    ttk.Combobox(file_frame, textvariable=fare_policy_var, width=14, state="readonly",
+                 values=list(fare_policy_names)).pack(side="left", padx=5)
     
     def browse():
         path = filedialog.askopenfilename(filetypes=[("JSON文件", "*.json")])
@@ -298,30 +578,146 @@ def show_result_in_window(table_data, headers):
             if budget <= 0:
                 raise ValueError("预算必须为正数")
                 
-            table, headers = load_json_and_solve(json_path_var.get())
+            time_limit = time_limit_var.get()
+            if time_limit < 0:
+                raise ValueError("时限不能为负数")
+
+            prefilter = None if prefilter_var.get() == "不剔除" else prefilter_var.get()
+            info = {}
+            table, headers = load_json_and_solve(json_path_var.get(), prefilter=prefilter,
+                                                 engine=engine_names[engine_var.get()],
+                                                 model_cache=CACHE_DIR if cache_var.get() else None,
+                                                 tie_break=tie_names[tie_var.get()], top=top_var.get(),
+                                                 time_limit=time_limit or None, info=info,
+                                                 origin=origin_var.get().strip() or None,
+                                                 fare_classes=parse_classes(fare_classes_var.get()),
+                                                 fare_policy=fare_policy_names[fare_policy_var.get()])
             if table and headers:
-                # 清除现有内容
-                for item in tree.get_children():
-                    tree.delete(item)
-                # 插入新数据
-                for row in table:
-                    tree.insert("", tk.END, values=row)
+                show_table(table)
+            if info and not info['complete']:
+                messagebox.showwarning("结果不完整", f"已达到{STOP_REASONS.get(info['stopped'], '求解上限')}，"
+                                       f"表中为目前找到的 {len(table or [])} 个解"
+                                       + ("，目标值尚未证明最优" if info['proven_optimal'] is False else "，可能还有其他并列最优解")
+                                       + (f"（间隙 {info['gap']}）" if info['gap'] else "") + "。")
         except ValueError as e:
             messagebox.showerror("参数错误", str(e))
         except Exception as e:
             messagebox.showerror("错误", f"求解过程出错：{str(e)}")
     
+    # --- 滑块实时查询 ---
+    live = {'dataset': None, 'index': None, 'pending': False}
+    live_label = tk.Label(param_frame, anchor="w", fg="gray")
+    live_label.pack(fill="x")
+
+    def live_update():
+        live['pending'] = False
+        if not live_var.get():
+            return
+        try:
+            values = {name: var.get() for name, var in params.items()}
+        except tk.TclError:
+            return
+        if values['W_out_start'] > values['W_out_end'] or values['W_ret_start'] > values['W_ret_end']:
+            live_label.config(text="时间窗口的起点不能晚于终点")
+            return
+        try:
+            data, _ = load_dataset(json_path_var.get(), origin=origin_var.get().strip() or None)
+            if live['dataset'] is not data:  # 数据文件变化后重新构建索引
+                live['index'] = QueryIndex(data)
+                live['dataset'] = data
+        except Exception as e:
+            live_label.config(text=f"无法实时查询：{e}")
+            return
+        start = time.perf_counter()
+        solutions, objective = live['index'].query(limit=LIVE_RESULT_LIMIT, **values)
+        elapsed = (time.perf_counter() - start) * 1000
+        show_table([solution_row(sol, data["params"], values['alpha'], values['budget']) for sol in solutions])
+        if objective is None:
+            live_label.config(text=f"实时结果：无可行解（查询 {elapsed:.1f}ms）")
+        else:
+            more = "（已截断）" if len(solutions) >= LIVE_RESULT_LIMIT else ""
+            live_label.config(text=f"实时结果：目标值 {objective:.2f}，{len(solutions)} 个最优解{more}（查询 {elapsed:.1f}ms）")
+
+    def schedule_live_update():
+        # 同一轮事件中多次拖动只查询一次
+        if not live['pending']:
+            live['pending'] = True
+            win.after_idle(live_update)
+
+    # --- 监视数据文件 ---
+    watch = {'watcher': None}
+
+    def watch_tick():
+        if not watch_var.get():
+            watch['watcher'] = None
+            return
+        try:
+            values = {name: var.get() for name, var in params.items()}
+        except tk.TclError:
+            values = None
+        if values is not None:
+            settings = tuple(values[k] for k in ('alpha', 'budget', 'W_out_start', 'W_out_end', 'W_ret_start', 'W_ret_end'))
+            origin = origin_var.get().strip() or None
+            watcher = watch['watcher']
+            if (watcher is None or watcher.path != json_path_var.get() or watcher.settings != settings
+                    or watcher.origin != origin):
+                watcher = watch['watcher'] = DatasetWatcher(json_path_var.get(), *settings, origin=origin)
+            result = watcher.poll()
+            if result is not None:
+                show_table([solution_row(sol, watcher.data["params"], values['alpha'], values['budget'])
+                            for sol in result['solutions']])
+                live_label.config(text=f"{time.strftime('%H:%M:%S')} 文件已更新：重新计算了 {len(result['changed'])} 个目的地，"
+                                       f"{len(result['solutions'])} 个最优解")
+        win.after(WATCH_INTERVAL_MS, watch_tick)
+
+    def export():
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("JSON Lines", "*.jsonl"), ("列式二进制", "*.orcol")],
+            title="导出结果")
+        if not path:
+            return
+        try:
+            count = export_rows(path, headers, shown['table'])
+            messagebox.showinfo("导出成功", f"已将 {count} 条结果导出到 {path}")
+        except Exception as e:
+            messagebox.showerror("导出失败", str(e))
+
     tk.Button(file_frame, text="浏览", command=browse).pack(side="left", padx=5)
     tk.Button(file_frame, text="求解", command=solve).pack(side="left", padx=5)
+    tk.Button(file_frame, text="导出结果", command=export).pack(side="left", padx=5)
     
-    # 创建表格
+    # 创建表格：结果很多时分页插入，避免一次性创建上万行
     tree = ttk.Treeview(win, columns=headers, show="headings", height=min(20, len(table_data)+1))
     for h in headers:
         tree.heading(h, text=h)
         tree.column(h, width=110, anchor="center")
-    for row in table_data:
-        tree.insert("", tk.END, values=row)
     tree.pack(expand=True, fill="both", padx=10, pady=5)
+
+    page_frame = tk.Frame(win)
+    page_frame.pack(fill="x", padx=10)
+    page_label = tk.Label(page_frame)
+    page_label.pack(side="left")
+    shown = {'table': [], 'loaded': 0}
+
+    def show_more():
+        table = shown['table']
+        end = min(shown['loaded'] + RESULT_PAGE_SIZE, len(table))
+        for row in table[shown['loaded']:end]:
+            tree.insert("", tk.END, values=row)
+        shown['loaded'] = end
+        page_label.config(text=f"已显示 {end}/{len(table)} 条")
+        more_btn.config(state="normal" if end < len(table) else "disabled")
+
+    def show_table(table):
+        tree.delete(*tree.get_children())
+        shown['table'] = table
+        shown['loaded'] = 0
+        show_more()
+
+    more_btn = tk.Button(page_frame, text="显示更多", command=show_more)
+    more_btn.pack(side="left", padx=10)
+    show_table(table_data)
     
     # 关闭按钮
     btn = tk.Button(win, text="关闭", command=win.destroy)
@@ -329,6 +725,13 @@ def show_result_in_window(table_data, headers):
     
     win.mainloop()
 
+# 结果窗口每页插入的行数
+RESULT_PAGE_SIZE = 500
+# 滑块实时查询最多列出的并列最优解
+LIVE_RESULT_LIMIT = 5000
+# 监视数据文件的检查间隔（毫秒）
+WATCH_INTERVAL_MS = 1000
+
 # 全局变量初始化
 alpha = 1.0      # Difficulty weight
 budget = 1200    # Max **交通** budget
@@ -338,12 +741,80 @@ W_ret_start = 72
 W_ret_end = 120
 
 if __name__ == "__main__":
-    # 默认加载edited_travel_data.json
-    table, headers = load_json_and_solve("edited_travel_data.json")
+    # 默认加载edited_travel_data.json；可选参数：数据文件路径、--origin 出发地（多出发地数据文件）、
+    # --export 结果文件(.csv/.jsonl/.orcol)、
+    # --model-cache（使用 model_cache.CACHE_DIR 缓存构建好的 MILP 模型）、
+    # --tie-break 排序依据（如 cost,stay_target=60,departure）与 --top N（并列最优解只保留排序后的前 N 个）、
+    # --engine milp/decomposed/best_first/pareto（求解方式，缺省 milp）、
+    # --time-limit 秒（整次求解的时限）、--max-nodes N（每次调用 CBC 的节点上限）、
+    # --delay-check 场景数（延误稳健性评估）与 --delay-rerank（按风险调整效用重新排序）、
+    # --fare-classes 席别（如 二等座,一等座）与 --fare-policy cheapest/upgrade
+    import sys
+    args = sys.argv[1:]
+    export_path = None
+    if "--export" in args:
+        k = args.index("--export")
+        export_path = args[k + 1]
+        del args[k:k + 2]
+    model_cache = None
+    if "--model-cache" in args:
+        args.remove("--model-cache")
+        model_cache = CACHE_DIR
+    tie_break, top = None, 1
+    if "--tie-break" in args:
+        k = args.index("--tie-break")
+        tie_break = args[k + 1]
+        del args[k:k + 2]
+    if "--top" in args:
+        k = args.index("--top")
+        top = int(args[k + 1])
+        del args[k:k + 2]
+    engine = "milp"
+    if "--engine" in args:
+        k = args.index("--engine")
+        engine = args[k + 1]
+        del args[k:k + 2]
+    time_limit = max_nodes = None
+    if "--time-limit" in args:
+        k = args.index("--time-limit")
+        time_limit = float(args[k + 1])
+        del args[k:k + 2]
+    if "--max-nodes" in args:
+        k = args.index("--max-nodes")
+        max_nodes = int(args[k + 1])
+        del args[k:k + 2]
+    origin = None
+    if "--origin" in args:
+        k = args.index("--origin")
+        origin = args[k + 1]
+        del args[k:k + 2]
+    delay_scenarios = None
+    if "--delay-check" in args:
+        k = args.index("--delay-check")
+        delay_scenarios = int(args[k + 1])
+        del args[k:k + 2]
+    delay_rerank = "--delay-rerank" in args
+    if delay_rerank:
+        args.remove("--delay-rerank")
+        delay_scenarios = delay_scenarios or 2000
+    fare_classes, fare_policy = None, "cheapest"
+    if "--fare-classes" in args:
+        k = args.index("--fare-classes")
+        fare_classes = parse_classes(args[k + 1])
+        del args[k:k + 2]
+    if "--fare-policy" in args:
+        k = args.index("--fare-policy")
+        fare_policy = args[k + 1]
+        del args[k:k + 2]
+    json_path = args[0] if args else "edited_travel_data.json"
+    table, headers = load_json_and_solve(json_path, engine=engine, export_path=export_path, model_cache=model_cache,
+                                         tie_break=tie_break, top=top, time_limit=time_limit,
+                                         max_nodes=max_nodes, origin=origin, delay_scenarios=delay_scenarios,
+                                         delay_rerank=delay_rerank, fare_classes=fare_classes,
+                                         fare_policy=fare_policy)
     if table and headers:
         try:
-            table_str = tabulate(table, headers, tablefmt="grid", stralign="center")
-            print(table_str)
+            print_table(table, headers)
             show_result_in_window(table, headers)
         except Exception as e:
             print(f"\n输出结果时发生错误: {e}")
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import os
+import time
+from decomposed_solve import best_first_solve, decomposed_solve, _make_executor
+from dataset_validator import load_dataset, DatasetError
+from fare_classes import choose_classes
+from result_export import open_writer, print_table
+
+# --- 批量求解一个目录中的全部数据文件 ---
+# 每个节假日（五一、国庆、春节……）各有一份车次数据文件，比较时原本要对每个文件分别运行 OR.py 再手工汇总。
+# 这里用 asyncio 调度：目录中的每个文件是一个任务，同时进行的任务数不超过 concurrency；
+# 读取、解析校验和求解都在进程池（或线程池）中完成，一个文件在读取解析时，其他文件的求解照常进行。
+# 每个文件的结果（最优方案、耗时）或失败原因（文件不存在、JSON 无效、校验未通过、求解出错）
+# 都记录在同一份汇总报告中，单个文件失败不影响其他文件。
+
+ENGINES = ("best_first", "decomposed")
+REPORT_HEADERS = ["文件", "状态", "目的地", "去程车次", "去程票价", "返程车次", "返程票价", "总交通成本",
+                  "停留时间(h)", "目标值", "最优解数", "读取解析(s)", "求解(s)", "说明"]
+SUMMARY_HEADERS = ["文件", "状态", "最优目的地", "目标值", "最优解数", "最低总成本", "读取解析(s)", "求解(s)"]
+STATUS = {'ok': "成功", 'infeasible': "无可行解", 'failed': "失败"}
+
+
+def find_datasets(directory, pattern=".json"):
+    """目录中扩展名为 pattern 的数据文件，按文件名排序"""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(pattern) and os.path.isfile(os.path.join(directory, name)))
+
+
+def solve_file(path, settings, engine="best_first", origin=None, top=None):
+    """在工作进程中读取、校验并求解一个数据文件，返回结果字典（异常也转为结果，不向外抛出）"""
+    result = {'file': path, 'status': 'failed', 'solutions': [], 'count': 0, 'objective': None, 'best': None,
+              'load_time': None, 'solve_time': None, 'note': ""}
+    start = time.perf_counter()
+    try:
+        data, report = load_dataset(path, origin=origin)
+    except DatasetError as e:
+        errors = e.report['errors']
+        result['note'] = "；".join(errors[:3]) + (f"；另有 {len(errors) - 3} 个错误" if len(errors) > 3 else "")
+        return result
+    except (OSError, ValueError) as e:  # 文件不存在、无法读取或不是合法 JSON
+        result['note'] = f"{type(e).__name__}: {e}"
+        return result
+    result['load_time'] = time.perf_counter() - start
+    if report['warnings']:
+        result['note'] = f"{len(report['warnings'])} 条校验警告"
+
+    start = time.perf_counter()
+    try:
+        if engine == "best_first":
+            solutions, objective = best_first_solve(data, **settings)
+        else:
+            solutions, objective = decomposed_solve(data, executor=None, **settings)
+        if data.get("fare_classes"):
+            solutions = [choose_classes(sol, data, settings['budget']) for sol in solutions]
+    except Exception as e:
+        result['note'] = f"求解出错 {type(e).__name__}: {e}"
+        return result
+    result['solve_time'] = time.perf_counter() - start
+    result['status'] = 'ok' if objective is not None else 'infeasible'
+    result['objective'] = objective
+    result['count'] = len(solutions)
+    result['best'] = min(solutions, key=lambda sol: sol['cost'], default=None)  # 并列最优解中总成本最低的
+    result['solutions'] = solutions if top is None else solutions[:top]
+    return result
+
+
+async def solve_directory(paths, settings, engine="best_first", origin=None, top=None, concurrency=None,
+                          executor="process", on_result=None):
+    """并发求解 paths 中的全部文件，返回与 paths 顺序一致的结果列表
+
+    concurrency 为同时进行的文件数（默认 CPU 核数）；每个文件完成时调用 on_result(result)。
+    """
+    concurrency = concurrency or os.cpu_count()
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+    pool = _make_executor(executor, concurrency)
+
+    async def run(path):
+        async with limit:
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(pool, solve_file, path, settings, engine, origin, top)
+            except Exception as e:  # 工作进程异常退出等
+                result = {'file': path, 'status': 'failed', 'solutions': [], 'count': 0, 'objective': None,
+                          'best': None, 'load_time': None, 'solve_time': None, 'note': f"{type(e).__name__}: {e}"}
+            result['elapsed'] = time.perf_counter() - start
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    with pool:
+        return await asyncio.gather(*(run(path) for path in paths))
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def _trip(sol, kind, k):
+    """去程 / 返程车次编号；分席别票价的车次注明所选席别"""
+    tid = sol[kind][0]
+    classes = sol.get('classes')
+    return f"{tid}({classes[k]})" if classes and classes[k] else tid
+
+
+def report_rows(results):
+    """汇总报告的行：每个最优方案一行，无解或失败的文件各一行"""
+    for r in results:
+        name = os.path.basename(r['file'])
+        timing = [r['count'], _seconds(r['load_time']), _seconds(r['solve_time']), r['note']]
+        if not r['solutions']:
+            yield [name, STATUS[r['status']], "-", "-", "-", "-", "-", "-", "-", "-"] + timing
+        for sol in r['solutions']:
+            yield [name, STATUS[r['status']], sol['destination'], _trip(sol, 'outbound', 0), sol['outbound'][1],
+                   _trip(sol, 'return', 1), sol['return'][1], sol['cost'], sol['stay'],
+                   f"{sol['objective']:.2f}"] + timing
+
+
+def summary_rows(results):
+    """每个文件一行的摘要"""
+    for r in results:
+        best = r['best']
+        yield [os.path.basename(r['file']), STATUS[r['status']], best['destination'] if best else "-",
+               "-" if r['objective'] is None else f"{r['objective']:.2f}", r['count'],
+               best['cost'] if best else "-", _seconds(r['load_time']), _seconds(r['solve_time'])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量求解目录中的全部数据文件并汇总结果")
+    parser.add_argument("directory", help="数据文件所在目录")
+    parser.add_argument("--report", default="batch_report.csv", help="汇总报告（.csv/.jsonl/.orcol）")
+    parser.add_argument("--engine", choices=ENGINES, default="best_first")
+    parser.add_argument("--origin", default=None, help="多出发地数据文件中的出发地")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--budget", type=float, default=1200)
+    parser.add_argument("--out-window", type=float, nargs=2, default=(0, 24), metavar=("START", "END"))
+    parser.add_argument("--ret-window", type=float, nargs=2, default=(72, 120), metavar=("START", "END"))
+    parser.add_argument("--top", type=int, default=20, help="每个文件在报告中最多列出的最优方案数")
+    parser.add_argument("--concurrency", type=int, default=None, help="同时处理的文件数（默认 CPU 核数）")
+    parser.add_argument("--threads", action="store_true", help="使用线程池代替进程池")
+    args = parser.parse_args()
+
+    paths = find_datasets(args.directory)
+    if not paths:
+        print(f"{args.directory} 中没有 .json 数据文件。")
+        raise SystemExit(1)
+    settings = dict(alpha=args.alpha, budget=args.budget, W_out_start=args.out_window[0],
+                    W_out_end=args.out_window[1], W_ret_start=args.ret_window[0], W_ret_end=args.ret_window[1])
+
+    def progress(result):
+        print(f"  {STATUS[result['status']]:<4} {os.path.basename(result['file'])}（{result['elapsed']:.2f}s）"
+              + (f"：{result['note']}" if result['status'] != 'ok' and result['note'] else ""))
+
+    print(f"共 {len(paths)} 个数据文件：")
+    start = time.perf_counter()
+    results = asyncio.run(solve_directory(paths, settings, args.engine, args.origin, args.top, args.concurrency,
+                                          "thread" if args.threads else "process", progress))
+    elapsed = time.perf_counter() - start
+    print_table(list(summary_rows(results)), SUMMARY_HEADERS)
+    failed = sum(r['status'] == 'failed' for r in results)
+    with open_writer(args.report, REPORT_HEADERS) as writer:
+        writer.write_rows(report_rows(results))
+    print(f"总耗时 {elapsed:.2f}s，{len(results) - failed} 个文件完成，{failed} 个失败；"
+          f"汇总报告已写入 {args.report}（{writer.rows_written} 行）")
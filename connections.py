@@ -0,0 +1,279 @@
+import argparse
+import heapq
+import json
+from collections import defaultdict
+
+# --- 多段换乘车次生成 ---
+# 输入为车站之间的原始时刻表（每条记录是一段直达区间）：
+#   {"train": "G1", "from": "杭州东", "to": "南京南", "dep_time": 8.0, "arr_time": 9.5, "cost": 120}
+# 用连接扫描算法 (Connection Scan Algorithm, CSA) 按发车时间顺序扫描一遍所有区间，
+# 为每个目的地求出模型会用到的各个时间组合下成本最低的换乘方案，
+# 再作为虚拟车次写入现有的 outbound_trips / return_trips 结构，求解器无需任何改动。
+# 返程方向把时间取负、起终点互换后复用同一个正向扫描。
+# 给定去程时间窗口（out_window，缺省与 OR.py 相同）时，只从窗口内发车的区间出发，
+# 窗口内出发更晚、到达不晚、成本不高的方案淘汰较早的方案，保留 (出发, 到达, 成本) 上 Pareto 最优的方案；
+# 生成的车次只对该窗口完整，用其他去程窗口求解时需要用新的窗口重新生成。
+# out_window 为 None 时不限出发时间，出发时间没有单调的优劣，只在出发时间相同的行程之间剪枝，
+# 对每个出发时间保留 (到达时间, 成本) 上 Pareto 最优的方案（结果对任意窗口都完整，但方案数多得多）。
+# 两种方式下同一出发时间更晚到达、更贵的方案都只在最长停留时间成为瓶颈时才有用，与原来一样舍弃。
+# 返程只有从目的地出发的时间进入模型，回到出发地的时间越早（反向扫描中的出发越晚）越好；
+# 给定 ret_window 时只保留从目的地出发时间在窗口内的方案。
+# 途经出发地的行程不会作为一个换乘方案输出：列车到达出发地时车上的行程全部结束，之后需从出发地重新上车。
+
+
+class _Journey:
+    __slots__ = ("start", "cost", "n_trains", "legs")
+
+    def __init__(self, start, cost, n_trains, legs):
+        self.start = start        # 在起点站的出发时间
+        self.cost = cost
+        self.n_trains = n_trains  # 已乘坐的车次数
+        self.legs = legs          # (区间, 前一段) 组成的链表，避免每次扩展复制整条路径
+
+    def dominates(self, other):
+        return (self.start >= other.start and self.cost <= other.cost
+                and self.n_trains <= other.n_trains)
+
+
+class _Front:
+    """行程的 Pareto 集合（成本越低、车次越少、出发越晚越好）
+
+    same_start 为 True 时按出发时间分组，只在出发时间相同的行程之间比较（去程）。
+    """
+    __slots__ = ("groups", "same_start")
+
+    def __init__(self, same_start):
+        self.groups = {}  # 出发时间（不分组时为 None）-> [行程]
+        self.same_start = same_start
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def __iter__(self):
+        for group in self.groups.values():
+            yield from group
+
+    def insert(self, new):
+        group = self.groups.setdefault(new.start if self.same_start else None, [])
+        for old in group:
+            if old.dominates(new):
+                return
+        group[:] = [old for old in group if not new.dominates(old)]
+        group.append(new)
+
+    def drop_started_before(self, earliest):
+        """删除出发时间早于 earliest 的行程"""
+        if self.same_start:
+            self.groups = {start: group for start, group in self.groups.items() if start >= earliest}
+        else:
+            self.groups = {key: kept for key, group in self.groups.items()
+                           if (kept := [j for j in group if j.start >= earliest])}
+
+    def clear(self):
+        self.groups = {}
+
+    def ride(self, c, cost):
+        """全部行程乘坐区间 c"""
+        self.groups = {key: [_Journey(j.start, j.cost + cost, j.n_trains, (c, j.legs)) for j in group]
+                       for key, group in self.groups.items()}
+
+
+def _scan(connections, origin, targets, min_transfer, max_trains, max_duration, same_start, start_window=None):
+    """从 origin 出发的多准则连接扫描，connections 需按发车时间排序
+
+    每个车次维护一个 "车上" 的 Pareto 集合，每个车站维护一个已完成换乘、可以上车的 Pareto 集合，
+    因此每个区间只需处理这两个小集合；超过 max_duration 的行程不再扩展，集合大小保持有界。
+    same_start 为 True 时只在出发时间相同的行程之间剪枝，否则更晚出发的行程可以淘汰较早的。
+    start_window 为 (最早, 最晚) 时只从发车时间在其中的区间出发。
+    返回 targets 中各车站的 [(出发, 到达, 成本, 区间链表)]。
+    """
+    new_front = lambda: _Front(same_start)
+    on_board = defaultdict(new_front)  # 车次 -> 车上的行程
+    pending = defaultdict(list)        # 车站 -> (可换乘时间, 序号, 行程) 小顶堆
+    ready = defaultdict(new_front)     # 车站 -> 已可换乘上车的 Pareto 集合
+    arrivals = defaultdict(list)
+    seq = 0
+    for c in connections:
+        u, v, dep, arr, cost, train = c
+        if arr < dep:
+            continue
+
+        # 换乘时间已满足的到站行程转入可上车集合
+        queue = pending.get(u)
+        while queue and queue[0][0] <= dep:
+            ready[u].insert(heapq.heappop(queue)[2])
+
+        # 上车：从起点出发，或在本站换乘
+        bag = on_board[train]
+        if u == origin and (start_window is None or start_window[0] <= dep <= start_window[1]):
+            bag.insert(_Journey(dep, 0, 1, None))
+        front = ready.get(u)
+        if front:
+            # 发车时间单调不减，发车时已超过 max_duration 的行程以后也不可能满足；
+            # 到达时间不单调，只能决定本区间能否上车，不能据此永久删除
+            front.drop_started_before(dep - max_duration)
+            for j in front:
+                if j.n_trains < max_trains and arr - j.start <= max_duration:
+                    bag.insert(_Journey(j.start, j.cost, j.n_trains + 1, j.legs))
+
+        # 乘坐本区间并在 v 下车（同一车次的区间依次相接，到达时间单调，超时的行程可以删除）
+        bag.drop_started_before(arr - max_duration)
+        bag.ride(c, cost)
+        if v == origin:
+            bag.clear()  # 回到出发地：行程结束，不继续乘坐途经出发地的列车
+            continue
+        if not bag:
+            continue
+        for j in bag:
+            heapq.heappush(pending[v], (arr + min_transfer, seq, j))
+            seq += 1
+            if v in targets:
+                arrivals[v].append((j.start, arr, j.cost, j.legs))
+    return arrivals
+
+
+def _pareto_journeys(journeys, key):
+    """key(行程) 相同的行程中，筛出在 (到达时间, 成本) 上 Pareto 最优的行程"""
+    kept, groups = [], {}
+    for j in sorted(journeys, key=lambda j: (j[1], j[2], -j[0])):
+        group = groups.setdefault(key(j), [])
+        if not any(k[1] <= j[1] and k[2] <= j[2] for k in group):
+            group.append(j)
+            kept.append(j)
+    return sorted(kept, key=lambda j: (-j[0], j[1]))
+
+
+def _pareto_windowed(journeys):
+    """筛出 (出发越晚、到达越早、成本越低越好) 上 Pareto 最优的行程（出发时间都在去程窗口内）"""
+    kept = []
+    for j in sorted(journeys, key=lambda j: (j[1], j[2], -j[0])):
+        if not any(k[0] >= j[0] and k[1] <= j[1] and k[2] <= j[2] for k in kept):
+            kept.append(j)
+    return sorted(kept, key=lambda j: (-j[0], j[1]))
+
+
+def _journey_to_trip(legs, reverse=False):
+    """把区间链表转换为虚拟车次 (trip_id, trip_dict)"""
+    chain = []
+    while legs is not None:
+        leg, legs = legs
+        chain.append(leg)
+    legs = chain[::-1]
+    if reverse:
+        # 反向扫描得到的是时间取负、起终点互换的区间，这里还原
+        legs = [(v, u, -arr, -dep, cost, train) for u, v, dep, arr, cost, train in reversed(legs)]
+    trains = []
+    for leg in legs:
+        if not trains or trains[-1] != leg[5]:
+            trains.append(leg[5])
+    trip_id = "+".join(trains)
+    trip = {
+        "dep_time": legs[0][2],
+        "arr_time": legs[-1][3],
+        "cost": sum(leg[4] for leg in legs),
+        "legs": [{"train": train, "from": u, "to": v, "dep_time": dep, "arr_time": arr, "cost": cost}
+                 for u, v, dep, arr, cost, train in legs],
+    }
+    return trip_id, trip
+
+
+def _add_trip(trips, tid, trip):
+    """同一车次组合可能在不同车站换乘，编号重复时追加序号"""
+    key, k = tid, 1
+    while key in trips:
+        k += 1
+        key = f"{tid}#{k}"
+    trips[key] = trip
+
+
+def build_connections(legs, home, destinations, destination_stations=None,
+                      min_transfer=0.5, max_trains=3, max_duration=24, out_window=(0, 24), ret_window=(72, 120)):
+    """由原始时刻表生成每个目的地的去程/返程 Pareto 最优换乘方案
+
+    destination_stations: {目的地: [车站, ...]}，缺省时目的地名即车站名。
+    max_duration: 单程最长旅行时间(h)，超过的换乘方案不予考虑。
+    out_window / ret_window: 去程出发 / 从目的地返程出发的时间窗口（与求解时的窗口一致），
+    为 None 时不限（去程方案会多得多，见文件开头的说明）。
+    返回 (outbound_trips, return_trips)，结构与数据文件中的同名字段一致。
+    """
+    destination_stations = destination_stations or {}
+    forward = sorted(((leg["from"], leg["to"], leg["dep_time"], leg["arr_time"], leg["cost"], leg["train"])
+                      for leg in legs), key=lambda c: c[2])
+    # 返程：时间取负、起终点互换后，仍然是从 home 出发的正向扫描
+    backward = sorted(((v, u, -arr, -dep, cost, train) for u, v, dep, arr, cost, train in forward),
+                      key=lambda c: c[2])
+
+    stations = {station for j in destinations for station in destination_stations.get(j, [j])}
+    out_arrivals = _scan(forward, home, stations, min_transfer, max_trains, max_duration,
+                         same_start=out_window is None, start_window=out_window)
+    ret_arrivals = _scan(backward, home, stations, min_transfer, max_trains, max_duration, same_start=False)
+
+    def in_ret_window(journey):
+        # 反向扫描中的到达时间取负即从目的地出发的时间
+        return ret_window is None or ret_window[0] <= -journey[1] <= ret_window[1]
+
+    outbound_trips, return_trips = {}, {}
+    for j in destinations:
+        outbound_trips[j], return_trips[j] = {}, {}
+        for station in destination_stations.get(j, [j]):
+            out = out_arrivals.get(station, ())
+            # 去程：窗口内按 (出发, 到达, 成本) 筛选，不限窗口时按出发时间分组；
+            # 返程按反向扫描中的到达时间（即从目的地出发的时间）分组
+            out = _pareto_journeys(out, key=lambda j: j[0]) if out_window is None else _pareto_windowed(out)
+            for journey in out:
+                _add_trip(outbound_trips[j], *_journey_to_trip(journey[3]))
+            rets = [journey for journey in ret_arrivals.get(station, ()) if in_ret_window(journey)]
+            for journey in _pareto_journeys(rets, key=lambda j: j[1]):
+                _add_trip(return_trips[j], *_journey_to_trip(journey[3], reverse=True))
+    return outbound_trips, return_trips
+
+
+def merge_connections(data, outbound_trips, return_trips, keep_direct=True):
+    """把生成的换乘方案写入数据集；keep_direct=False 时替换原有直达车次"""
+    for key, generated in (("outbound_trips", outbound_trips), ("return_trips", return_trips)):
+        for j, trips in generated.items():
+            if keep_direct:
+                target = data[key].setdefault(j, {})
+                for tid, trip in trips.items():
+                    target.setdefault(tid, trip)  # 同名直达车次优先
+            else:
+                data[key][j] = dict(trips)
+    return data
+
+
+def load_legs(path):
+    """读取原始时刻表：JSON 列表，或包含 "legs" 字段的对象"""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return raw["legs"] if isinstance(raw, dict) else raw
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="由车站时刻表生成多段换乘车次")
+    parser.add_argument("timetable", help="原始时刻表 JSON")
+    parser.add_argument("data", help="现有数据文件（提供目的地与参数）")
+    parser.add_argument("output", help="输出数据文件")
+    parser.add_argument("--home", required=True, help="出发/返回车站")
+    parser.add_argument("--min-transfer", type=float, default=0.5, help="最短换乘时间(h)")
+    parser.add_argument("--max-trains", type=int, default=3, help="最多乘坐车次数（含换乘）")
+    parser.add_argument("--max-duration", type=float, default=24, help="单程最长旅行时间(h)")
+    parser.add_argument("--replace-direct", action="store_true", help="用换乘方案替换原有直达车次")
+    parser.add_argument("--out-window", type=float, nargs=2, default=(0, 24), metavar=("START", "END"),
+                        help="去程出发时间窗口（与求解时一致）")
+    parser.add_argument("--ret-window", type=float, nargs=2, default=(72, 120), metavar=("START", "END"),
+                        help="返程出发时间窗口（与求解时一致）")
+    parser.add_argument("--any-window", action="store_true", help="不限时间窗口（方案数多得多）")
+    args = parser.parse_args()
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    outbound, ret = build_connections(load_legs(args.timetable), args.home, data["destinations"],
+                                      data.get("destination_stations"), args.min_transfer, args.max_trains, args.max_duration,
+                                      None if args.any_window else tuple(args.out_window),
+                                      None if args.any_window else tuple(args.ret_window))
+    merge_connections(data, outbound, ret, keep_direct=not args.replace_direct)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    n_out = sum(len(v) for v in outbound.values())
+    n_ret = sum(len(v) for v in ret.values())
+    print(f"已生成 {n_out} 个去程方案、{n_ret} 个返程方案，写入 {args.output}")
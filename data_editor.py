@@ -4,6 +4,17 @@ import json
 import os # 用于检查文件是否存在
 from datetime import datetime, timedelta
 import calendar
+from timetable_import import (FIELDS, FIELD_LABELS, read_table, guess_mapping, import_timetable,
+                              missing_fields, to_relative_hours)
+from edit_journal import EditJournal, atomic_write_json
+from dataset_validator import validate_dataset, print_validation_report, thaw
+
+# 车次表每次插入的行数：Treeview 只保留已滚动到的行，目的地车次再多切换也不卡顿
+TRIP_PAGE_SIZE = 200
+# 后台把编辑日志合并进主文件的间隔（秒）
+AUTOSAVE_INTERVAL = 30
+# 导入对话框中 "该字段没有对应列" 的选项
+UNMAPPED = "（未映射）"
 
 # --- Function to load data ---
 def load_data(filename="edited_travel_data.json"):
@@ -14,10 +25,17 @@ def load_data(filename="edited_travel_data.json"):
                 # 基本结构检查
                 if all(k in data for k in ["destinations", "params", "outbound_trips", "return_trips"]):
                     print(f"成功从 {filename} 加载数据。")
-                    # 确保 params 包含新键 (如果加载旧文件)
-                    for dest, p_data in data["params"].items():
-                        p_data.setdefault('min_stay_hours', 48) # 提供默认值
-                        p_data.setdefault('max_stay_hours', 96) # 提供默认值
+                    # 统一校验；缺少停留时间的目的地使用编辑器的默认值
+                    normalized, report = validate_dataset(data, stay_defaults=(48, 96))
+                    print_validation_report(report)
+                    if normalized is not None:
+                        data = thaw(normalized)
+                    else:
+                        # 有错误时按原样加载，便于在编辑器中修正
+                        print("数据存在错误，已按原样加载，请在编辑器中修正。")
+                        for dest, p_data in data["params"].items():
+                            p_data.setdefault('min_stay_hours', 48)
+                            p_data.setdefault('max_stay_hours', 96)
                     return data["destinations"], data["params"], data["outbound_trips"], data["return_trips"]
                 else:
                     print(f"警告: {filename} 文件结构不完整，将使用内置默认数据。")
@@ -55,7 +73,14 @@ class DataEditor(tk.Tk):
         super().__init__()
         # 加载数据
         self.current_file = "edited_travel_data.json"  # 默认文件名
+        self.data_path = self.current_file  # 自动保存的目标文件；新建且未保存时为 None
+        self.journal = None
         self.destinations, self.params, self.outbound_trips, self.return_trips = load_data()
+        # 车次表行缓存：(方向, 目的地) -> [行元组]，车次修改时按目的地失效
+        self._trip_rows = {}
+        # 每个车次表当前显示的内容：{'dest': 目的地, 'rows': [...], 'loaded': 已插入行数}
+        self._tree_state = {}
+        self._listed_dests = None
 
         # 设置默认起始时间（当前时间）
         now = datetime.now()
@@ -66,6 +91,7 @@ class DataEditor(tk.Tk):
         self.title(f"目的地与车次数据可视化编辑器 - {self.current_file}")
         self.geometry("950x700")  # 增加高度以容纳时间选择控件
         self.create_widgets()
+        self.open_journal(self.data_path)
         self.refresh_dest_list()
         self.protocol("WM_DELETE_WINDOW", self.on_exit)
 
@@ -115,23 +141,35 @@ class DataEditor(tk.Tk):
         self.grid_columnconfigure(3, weight=1) # 让车次部分可以水平拉伸
 
         # 去程车次
-        tk.Label(trip_frame, text="去程车次", font=("Arial", 11)).grid(row=0, column=0, pady=(0, 5))
-        self.out_tree = ttk.Treeview(trip_frame, columns=("train", "dep", "arr", "cost"), show="headings", height=8)
+        self.out_label = tk.Label(trip_frame, text="去程车次", font=("Arial", 11))
+        self.out_label.grid(row=0, column=0, pady=(0, 5))
+        out_box = tk.Frame(trip_frame)
+        out_box.grid(row=1, column=0, padx=5, pady=2, sticky="nsew")
+        self.out_tree = ttk.Treeview(out_box, columns=("train", "dep", "arr", "cost"), show="headings", height=8)
         for i, col in enumerate(["train", "dep", "arr", "cost"]):
             self.out_tree.heading(col, text=["车次", "发车(h)", "到达(h)", "票价"][i])
             self.out_tree.column(col, width=[100, 80, 80, 80][i], anchor='center')
-        self.out_tree.grid(row=1, column=0, padx=5, pady=2, sticky="nsew")
+        out_scroll = ttk.Scrollbar(out_box, orient="vertical", command=self.out_tree.yview)
+        self.out_tree.configure(yscrollcommand=lambda first, last: self.on_trip_scroll(self.out_tree, out_scroll, first, last))
+        self.out_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        out_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.out_tree.bind("<Double-1>", self.edit_outbound)
         tk.Button(trip_frame, text="新增去程", command=self.add_outbound).grid(row=2, column=0, padx=5, pady=5, sticky="ew")
         tk.Button(trip_frame, text="删除选中去程", command=self.del_outbound).grid(row=3, column=0, padx=5, pady=5, sticky="ew")
 
         # 返程车次
-        tk.Label(trip_frame, text="返程车次", font=("Arial", 11)).grid(row=0, column=1, pady=(0, 5))
-        self.ret_tree = ttk.Treeview(trip_frame, columns=("train", "dep", "arr", "cost"), show="headings", height=8)
+        self.ret_label = tk.Label(trip_frame, text="返程车次", font=("Arial", 11))
+        self.ret_label.grid(row=0, column=1, pady=(0, 5))
+        ret_box = tk.Frame(trip_frame)
+        ret_box.grid(row=1, column=1, padx=5, pady=2, sticky="nsew")
+        self.ret_tree = ttk.Treeview(ret_box, columns=("train", "dep", "arr", "cost"), show="headings", height=8)
         for i, col in enumerate(["train", "dep", "arr", "cost"]):
             self.ret_tree.heading(col, text=["车次", "发车(h)", "到达(h)", "票价"][i])
             self.ret_tree.column(col, width=[100, 80, 80, 80][i], anchor='center')
-        self.ret_tree.grid(row=1, column=1, padx=5, pady=2, sticky="nsew")
+        ret_scroll = ttk.Scrollbar(ret_box, orient="vertical", command=self.ret_tree.yview)
+        self.ret_tree.configure(yscrollcommand=lambda first, last: self.on_trip_scroll(self.ret_tree, ret_scroll, first, last))
+        self.ret_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        ret_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.ret_tree.bind("<Double-1>", self.edit_return)
         tk.Button(trip_frame, text="新增返程", command=self.add_return).grid(row=2, column=1, padx=5, pady=5, sticky="ew")
         tk.Button(trip_frame, text="删除选中返程", command=self.del_return).grid(row=3, column=1, padx=5, pady=5, sticky="ew")
@@ -178,12 +216,20 @@ class DataEditor(tk.Tk):
         tk.Button(bottom_frame, text="打开JSON文件", command=self.load_json, width=15).pack(side=tk.LEFT, padx=10)
         tk.Button(bottom_frame, text="新建JSON文件", command=self.new_json, width=15).pack(side=tk.LEFT, padx=10)
         tk.Button(bottom_frame, text="保存为JSON", command=self.save_json, width=15).pack(side=tk.LEFT, padx=10)
+        tk.Button(bottom_frame, text="导入CSV/TSV", command=self.import_csv, width=15).pack(side=tk.LEFT, padx=10)
         tk.Button(bottom_frame, text="退出", command=self.on_exit, width=15).pack(side=tk.RIGHT, padx=10)
 
     def refresh_dest_list(self):
-        self.dest_listbox.delete(0, tk.END)
-        for d in self.destinations:
-            self.dest_listbox.insert(tk.END, d)
+        # 目的地列表或数据整体变化时调用：清空行缓存，列表内容变化时才重建 Listbox
+        self._trip_rows.clear()
+        self._tree_state.clear()
+        if self._listed_dests != self.destinations:
+            self.dest_listbox.delete(0, tk.END)
+            if self.destinations:
+                self.dest_listbox.insert(tk.END, *self.destinations)
+            self._listed_dests = list(self.destinations)
+        else:
+            self.dest_listbox.selection_clear(0, tk.END)
         if self.destinations:
             self.dest_listbox.selection_set(0)
             self.on_dest_select()
@@ -204,8 +250,8 @@ class DataEditor(tk.Tk):
             self.min_stay_entry.delete(0, tk.END)
             self.max_stay_entry.delete(0, tk.END)
             # 清空车次表
-            self.out_tree.delete(*self.out_tree.get_children())
-            self.ret_tree.delete(*self.ret_tree.get_children())
+            self.show_trips(self.out_tree, "outbound", None)
+            self.show_trips(self.ret_tree, "return", None)
             return
 
         # 获取选中的目的地
@@ -222,19 +268,58 @@ class DataEditor(tk.Tk):
         self.max_stay_entry.delete(0, tk.END)
         self.max_stay_entry.insert(0, d_params.get("max_stay_hours", "")) # 显示已存或空
 
-        # 填充去程车次
-        self.out_tree.delete(*self.out_tree.get_children())
-        if d in self.outbound_trips:
-            for tid, info in self.outbound_trips[d].items():
-                values = (tid, info.get("dep_time", "-"), info.get("arr_time", "-"), info.get("cost", "-"))
-                self.out_tree.insert("", tk.END, iid=tid, values=values)
-
-        # 填充返程车次
-        self.ret_tree.delete(*self.ret_tree.get_children())
-        if d in self.return_trips:
-            for tid, info in self.return_trips[d].items():
-                values = (tid, info.get("dep_time", "-"), info.get("arr_time", "-"), info.get("cost", "-"))
-                self.ret_tree.insert("", tk.END, iid=tid, values=values)
+        # 填充去程、返程车次（只插入第一页，滚动到底部时再加载）
+        self.show_trips(self.out_tree, "outbound", d)
+        self.show_trips(self.ret_tree, "return", d)
+
+    def trip_rows(self, direction, d):
+        """返回目的地 d 某方向车次的行元组列表（带缓存）"""
+        key = (direction, d)
+        rows = self._trip_rows.get(key)
+        if rows is None:
+            trips = self.outbound_trips if direction == "outbound" else self.return_trips
+            rows = [(tid, info.get("dep_time", "-"), info.get("arr_time", "-"), info.get("cost", "-"))
+                    for tid, info in trips.get(d, {}).items()]
+            self._trip_rows[key] = rows
+        return rows
+
+    def invalidate_trip_rows(self, d):
+        """目的地 d 的车次被修改后调用，使行缓存失效"""
+        self._trip_rows.pop(("outbound", d), None)
+        self._trip_rows.pop(("return", d), None)
+
+    def show_trips(self, tree, direction, d):
+        """在车次表中显示目的地 d 的车次；同一目的地刷新时保留已加载的行数"""
+        state = self._tree_state.get(tree)
+        keep = state['loaded'] if state and state['dest'] == d else 0
+        tree.delete(*tree.get_children())
+        rows = self.trip_rows(direction, d) if d is not None else []
+        self._tree_state[tree] = {'dest': d, 'direction': direction, 'rows': rows, 'loaded': 0, 'pending': False}
+        self.load_more_trips(tree, max(keep, TRIP_PAGE_SIZE))
+
+    def load_more_trips(self, tree, count=TRIP_PAGE_SIZE):
+        """向车次表追加下一页"""
+        state = self._tree_state.get(tree)
+        if not state:
+            return
+        state['pending'] = False
+        rows = state['rows']
+        start = state['loaded']
+        end = min(len(rows), start + count)
+        for row in rows[start:end]:
+            tree.insert("", tk.END, iid=row[0], values=row)
+        state['loaded'] = end
+        label = self.out_label if state['direction'] == "outbound" else self.ret_label
+        title = "去程车次" if state['direction'] == "outbound" else "返程车次"
+        label.config(text=f"{title} ({end}/{len(rows)})" if end < len(rows) else title)
+
+    def on_trip_scroll(self, tree, scrollbar, first, last):
+        """车次表滚动回调：接近底部时加载下一页"""
+        scrollbar.set(first, last)
+        state = self._tree_state.get(tree)
+        if state and not state['pending'] and float(last) >= 0.95 and state['loaded'] < len(state['rows']):
+            state['pending'] = True
+            self.after_idle(self.load_more_trips, tree)
 
     def add_dest(self):
         name = simpledialog.askstring("新增目的地", "输入新目的地名称：")
@@ -249,6 +334,7 @@ class DataEditor(tk.Tk):
         self.params[name] = {"U": 5, "D": 2, "min_stay_hours": 48, "max_stay_hours": 96}
         self.outbound_trips[name] = {}
         self.return_trips[name] = {}
+        self.record({"op": "add_dest", "dest": name, "params": self.params[name]})
 
         self.refresh_dest_list()
         # 选中新添加的目的地
@@ -277,6 +363,7 @@ class DataEditor(tk.Tk):
         self.params[new_name] = self.params.pop(old_name)
         self.outbound_trips[new_name] = self.outbound_trips.pop(old_name)
         self.return_trips[new_name] = self.return_trips.pop(old_name)
+        self.record({"op": "rename_dest", "old": old_name, "new": new_name})
 
         # 刷新列表并保持选中
         current_index = idxs[0]
@@ -295,6 +382,7 @@ class DataEditor(tk.Tk):
             self.params.pop(d, None) # 使用 pop 带默认值以防万一
             self.outbound_trips.pop(d, None)
             self.return_trips.pop(d, None)
+            self.record({"op": "del_dest", "dest": d})
             self.refresh_dest_list() # 列表刷新后会自动选中第一个或清空
 
     def save_params(self):
@@ -328,6 +416,7 @@ class DataEditor(tk.Tk):
             self.params[d]["D"] = d_val
             self.params[d]["min_stay_hours"] = min_stay_val
             self.params[d]["max_stay_hours"] = max_stay_val
+            self.record({"op": "set_params", "dest": d, "params": self.params[d]})
             # messagebox.showinfo("成功", f"目的地 '{d}' 的参数已更新（内存中）。\n请记得最后点击 '保存为JSON' 以持久化存储。") # 可以加提示，但可能有点烦
             print(f"目的地 '{d}' 的参数已更新（内存中）。")
         else:
@@ -359,6 +448,10 @@ class DataEditor(tk.Tk):
         except ValueError:
             pass
 
+    def start_datetime(self):
+        """当前设置的起始时间（相对小时数的零点）"""
+        return datetime(datetime.now().year, self.start_month, self.start_day, self.start_hour, 0)
+
     def get_time_input(self, title, prompt):
         """获取时间输入（月-日-时-分）并转换为相对小时数"""
         dialog = tk.Toplevel(self)
@@ -413,19 +506,9 @@ class DataEditor(tk.Tk):
                 if not (1 <= month <= 12 and 1 <= day <= 31 and 0 <= hour <= 23 and 0 <= minute <= 59):
                     raise ValueError("Invalid time format")
 
-                # 计算与起始时间的差值
+                # 计算与起始时间的差值（根据分钟数进行四舍五入）
                 input_date = datetime(datetime.now().year, month, day, hour, minute)
-                start_date = datetime(datetime.now().year, self.start_month, self.start_day, self.start_hour, 0)
-                
-                # 计算小时差
-                time_diff = input_date - start_date
-                hours = time_diff.total_seconds() / 3600
-                
-                # 根据分钟数进行四舍五入
-                if minute >= 30:
-                    hours = int(hours) + 1
-                else:
-                    hours = int(hours)
+                hours = to_relative_hours(input_date, self.start_datetime())
 
                 result['success'] = True
                 result['hours'] = hours
@@ -472,6 +555,9 @@ class DataEditor(tk.Tk):
 
         if d not in self.outbound_trips: self.outbound_trips[d] = {}
         self.outbound_trips[d][tid] = {"dep_time": dep, "arr_time": arr, "cost": cost}
+        self.record({"op": "set_trip", "direction": "outbound", "dest": d, "trip_id": tid,
+                     "trip": self.outbound_trips[d][tid]})
+        self.invalidate_trip_rows(d)
         self.on_dest_select()
 
     def edit_outbound(self, event):
@@ -513,9 +599,13 @@ class DataEditor(tk.Tk):
                 messagebox.showerror("错误", f"新车次编号 '{new_tid}' 已存在于 '{d}' 的去程中。")
                 return
             self.outbound_trips[d].pop(tid)
+            self.record({"op": "del_trip", "direction": "outbound", "dest": d, "trip_id": tid})
             tid = new_tid
 
         self.outbound_trips[d][tid] = {"dep_time": dep, "arr_time": arr, "cost": cost}
+        self.record({"op": "set_trip", "direction": "outbound", "dest": d, "trip_id": tid,
+                     "trip": self.outbound_trips[d][tid]})
+        self.invalidate_trip_rows(d)
         self.on_dest_select()
 
     def del_outbound(self):
@@ -530,6 +620,8 @@ class DataEditor(tk.Tk):
             if d in self.outbound_trips:
                 for tid in sels:
                     self.outbound_trips[d].pop(tid, None) # 使用 pop 带默认值
+                self.record(*({"op": "del_trip", "direction": "outbound", "dest": d, "trip_id": tid} for tid in sels))
+            self.invalidate_trip_rows(d)
             self.on_dest_select() # 刷新
 
     def add_return(self):
@@ -565,6 +657,9 @@ class DataEditor(tk.Tk):
 
         if d not in self.return_trips: self.return_trips[d] = {}
         self.return_trips[d][tid] = {"dep_time": dep, "arr_time": arr, "cost": cost}
+        self.record({"op": "set_trip", "direction": "return", "dest": d, "trip_id": tid,
+                     "trip": self.return_trips[d][tid]})
+        self.invalidate_trip_rows(d)
         self.on_dest_select()
 
     def edit_return(self, event):
@@ -606,9 +701,13 @@ class DataEditor(tk.Tk):
                 messagebox.showerror("错误", f"新车次编号 '{new_tid}' 已存在于 '{d}' 的返程中。")
                 return
             self.return_trips[d].pop(tid)
+            self.record({"op": "del_trip", "direction": "return", "dest": d, "trip_id": tid})
             tid = new_tid
 
         self.return_trips[d][tid] = {"dep_time": dep, "arr_time": arr, "cost": cost}
+        self.record({"op": "set_trip", "direction": "return", "dest": d, "trip_id": tid,
+                     "trip": self.return_trips[d][tid]})
+        self.invalidate_trip_rows(d)
         self.on_dest_select()
 
     def del_return(self): # 与 del_outbound 类似
@@ -623,8 +722,173 @@ class DataEditor(tk.Tk):
             if d in self.return_trips:
                 for tid in sels:
                     self.return_trips[d].pop(tid, None)
+                self.record(*({"op": "del_trip", "direction": "return", "dest": d, "trip_id": tid} for tid in sels))
+            self.invalidate_trip_rows(d)
             self.on_dest_select()
 
+    # --- CSV/TSV 批量导入 ---
+    def ask_column_mapping(self, header):
+        """列映射对话框，返回 (mapping, default_dest, default_direction)；取消时返回 None"""
+        dialog = tk.Toplevel(self)
+        dialog.title("选择列对应关系")
+        dialog.transient(self)
+        dialog.grab_set()
+
+        guessed = guess_mapping(header)
+        idxs = self.dest_listbox.curselection()
+        current_dest = self.destinations[idxs[0]] if idxs else None
+        fixed_choices = {
+            "dest": [f"(全部为 {current_dest})"] if current_dest else [],
+            "direction": ["(全部为去程)", "(全部为返程)"],
+        }
+        vars_ = {}
+        for row, field in enumerate(FIELDS):
+            tk.Label(dialog, text=f"{FIELD_LABELS[field]}:").grid(row=row, column=0, sticky="e", padx=5, pady=2)
+            # 没能自动匹配的字段默认为 "未映射"，必须由用户明确选择
+            choices = [UNMAPPED] + fixed_choices.get(field, []) + header
+            var = tk.StringVar(value=guessed.get(field, UNMAPPED))
+            ttk.Combobox(dialog, textvariable=var, values=choices, state="readonly", width=20).grid(
+                row=row, column=1, padx=5, pady=2)
+            vars_[field] = var
+
+        result = {}
+
+        def confirm():
+            mapping = {}
+            default_dest = default_direction = None
+            for field, var in vars_.items():
+                value = var.get()
+                if value == f"(全部为 {current_dest})":
+                    default_dest = current_dest
+                elif value == "(全部为去程)":
+                    default_direction = "outbound"
+                elif value == "(全部为返程)":
+                    default_direction = "return"
+                elif value and value != UNMAPPED:
+                    mapping[field] = value
+            missing = missing_fields(mapping, default_dest, default_direction)
+            if missing:
+                messagebox.showerror("列未指定", "以下字段还没有对应的列：" +
+                                     "、".join(FIELD_LABELS[field] for field in missing), parent=dialog)
+                return
+            result['value'] = (mapping, default_dest, default_direction)
+            dialog.destroy()
+
+        tk.Button(dialog, text="导入", command=confirm).grid(row=len(FIELDS), column=0, columnspan=2, pady=10)
+        dialog.wait_window()
+        return result.get('value')
+
+    def import_csv(self):
+        filename = filedialog.askopenfilename(
+            filetypes=[("时刻表", "*.csv *.tsv *.txt"), ("所有文件", "*.*")],
+            title="导入CSV/TSV时刻表"
+        )
+        if not filename:
+            return
+        try:
+            header, columns = read_table(filename)
+        except Exception as e:
+            messagebox.showerror("错误", f"读取文件失败：{e}")
+            return
+        chosen = self.ask_column_mapping(header)
+        if chosen is None:
+            return
+        mapping, default_dest, default_direction = chosen
+
+        result = import_timetable(columns, mapping, self.start_datetime(),
+                                  existing={"outbound": self.outbound_trips, "return": self.return_trips},
+                                  default_dest=default_dest, default_direction=default_direction)
+        if result['errors']:
+            self.show_import_errors(result)
+        if not result['imported']:
+            return
+        if result['errors'] and not messagebox.askyesno(
+                "确认导入", f"共 {result['rows']} 行，其中 {len(result['errors'])} 条错误。\n"
+                            f"是否导入其余 {result['imported']} 行有效数据？"):
+            return
+
+        # 合并到内存数据；未知目的地使用与 "新增目的地" 相同的默认参数
+        new_dests = []
+        ops = []
+        for direction, trips in (("outbound", self.outbound_trips), ("return", self.return_trips)):
+            for dest, rows in result['trips'][direction].items():
+                if dest not in self.params:
+                    self.destinations.append(dest)
+                    self.params[dest] = {"U": 5, "D": 2, "min_stay_hours": 48, "max_stay_hours": 96}
+                    self.outbound_trips.setdefault(dest, {})
+                    self.return_trips.setdefault(dest, {})
+                    new_dests.append(dest)
+                    ops.append({"op": "add_dest", "dest": dest, "params": self.params[dest]})
+                trips.setdefault(dest, {}).update(rows)
+                ops.extend({"op": "set_trip", "direction": direction, "dest": dest, "trip_id": tid, "trip": info}
+                           for tid, info in rows.items())
+        self.record(*ops)
+        self.refresh_dest_list()
+        message = f"成功导入 {result['imported']} 个车次。"
+        if new_dests:
+            message += f"\n新增目的地（使用默认参数）：{', '.join(new_dests)}"
+        messagebox.showinfo("导入完成", message)
+
+    def show_import_errors(self, result):
+        """在一个窗口中列出全部导入错误"""
+        win = tk.Toplevel(self)
+        win.title(f"导入错误（{len(result['errors'])} 条）")
+        text = tk.Text(win, width=70, height=20)
+        scroll = ttk.Scrollbar(win, orient="vertical", command=text.yview)
+        text.configure(yscrollcommand=scroll.set)
+        text.insert(tk.END, "\n".join(f"第 {row_no} 行：{message}" for row_no, message in result['errors']))
+        text.configure(state="disabled")
+        text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # --- 编辑日志（增量自动保存） ---
+    def current_data(self):
+        """当前内存中的数据（直接引用，不复制）"""
+        return {
+            "destinations": self.destinations,
+            "params": self.params,
+            "outbound_trips": self.outbound_trips,
+            "return_trips": self.return_trips
+        }
+
+    def open_journal(self, path):
+        """切换自动保存的目标文件：先合并旧文件的日志，再重放新文件中上次未合并的修改"""
+        self.close_journal()
+        self.data_path = path
+        if path is None:
+            return
+        self.journal = EditJournal(path)
+        try:
+            replayed = self.journal.replay(self.current_data())
+        except Exception as e:
+            print(f"警告：重放编辑日志失败：{e}")
+            replayed = 0
+        if replayed:
+            print(f"已从编辑日志恢复 {replayed} 条未合并的修改。")
+        self.journal.start_autosave(AUTOSAVE_INTERVAL,
+                                    on_error=lambda e: print(f"警告：自动保存合并失败：{e}"))
+
+    def close_journal(self):
+        if self.journal is not None:
+            try:
+                self.journal.close(compact=True)
+            except Exception as e:
+                print(f"警告：合并编辑日志失败，修改仍保留在 {self.journal.journal_path}：{e}")
+            self.journal = None
+
+    def record(self, *ops):
+        """记录一次修改：追加到编辑日志，开销与修改量成正比"""
+        if self.journal is None or not ops:
+            return
+        try:
+            if not os.path.exists(self.data_path):
+                # 主文件还不存在（例如使用内置默认数据），先完整写入一次作为日志的基准
+                atomic_write_json(self.data_path, self.current_data())
+            else:
+                self.journal.append(*ops)
+        except Exception as e:
+            messagebox.showerror("自动保存失败", f"无法写入编辑日志。\n错误: {e}")
+
     # --- 保存与退出 ---
     def update_title(self, filename=None):
         """更新窗口标题以显示当前文件名"""
@@ -632,6 +896,14 @@ class DataEditor(tk.Tk):
             self.current_file = filename
         self.title(f"目的地与车次数据可视化编辑器 - {self.current_file}")
 
+    def open_data_file(self, filename):
+        """加载数据文件并开始对其自动保存"""
+        self.close_journal()
+        self.destinations, self.params, self.outbound_trips, self.return_trips = load_data(filename)
+        self.open_journal(filename)
+        self.refresh_dest_list()
+        self.update_title(os.path.basename(filename))
+
     def load_json(self):
         filename = filedialog.askopenfilename(
             filetypes=[("JSON文件", "*.json")],
@@ -639,15 +911,15 @@ class DataEditor(tk.Tk):
         )
         if filename:
             try:
-                self.destinations, self.params, self.outbound_trips, self.return_trips = load_data(filename)
-                self.refresh_dest_list()
-                self.update_title(os.path.basename(filename))
+                self.open_data_file(filename)
                 messagebox.showinfo("成功", f"成功加载文件：{filename}")
             except Exception as e:
                 messagebox.showerror("错误", f"加载文件失败：{str(e)}")
 
     def new_json(self):
         if messagebox.askokcancel("确认", "创建新文件将清空当前所有数据，确定要继续吗？"):
+            # 新文件在第一次 "保存为JSON" 之前不做自动保存
+            self.open_journal(None)
             self.destinations = []
             self.params = {}
             self.outbound_trips = {}
@@ -657,14 +929,6 @@ class DataEditor(tk.Tk):
             messagebox.showinfo("成功", "已创建新文件，请添加目的地和相关数据。")
 
     def save_json(self):
-        # 将当前内存中的数据保存到文件
-        data_to_save = {
-            "destinations": self.destinations,
-            "params": self.params,
-            "outbound_trips": self.outbound_trips,
-            "return_trips": self.return_trips
-        }
-        
         # 让用户选择保存位置和文件名
         filename = filedialog.asksaveasfilename(
             defaultextension=".json",
@@ -677,17 +941,23 @@ class DataEditor(tk.Tk):
             return
             
         try:
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+            # 先合并当前文件的日志，再把完整数据原子写入目标文件；之后的修改自动保存到目标文件
+            self.close_journal()
+            atomic_write_json(filename, self.current_data())
+            EditJournal(filename).discard()  # 目标文件已整体重写，旧日志作废
+            self.open_journal(filename)
             self.update_title(os.path.basename(filename))
-            messagebox.showinfo("保存成功", f"数据已成功保存到 {filename}")
+            messagebox.showinfo("保存成功", f"数据已成功保存到 {filename}\n之后的修改会自动保存到该文件。")
         except Exception as e:
             messagebox.showerror("保存失败", f"无法将数据写入文件 {filename}。\n错误: {e}")
 
     def on_exit(self):
-        # 可以在这里添加一个检查，看是否有未保存的修改
-        # （简化起见，这里直接询问退出）
-        if messagebox.askokcancel("退出确认", "您确定要退出编辑器吗？\n（请确保已保存您的修改）"):
+        if self.journal is None:
+            prompt = "您确定要退出编辑器吗？\n（新文件尚未保存，请确保已点击 '保存为JSON'）"
+        else:
+            prompt = f"您确定要退出编辑器吗？\n（修改已自动保存到 {self.current_file}）"
+        if messagebox.askokcancel("退出确认", prompt):
+            self.close_journal()
             self.destroy()
 
 if __name__ == "__main__":
@@ -699,9 +969,7 @@ if __name__ == "__main__":
         # 如果提供了文件路径参数，尝试加载该文件
         filename = sys.argv[1]
         try:
-            app.destinations, app.params, app.outbound_trips, app.return_trips = load_data(filename)
-            app.refresh_dest_list()
-            app.update_title(os.path.basename(filename))
+            app.open_data_file(filename)
         except Exception as e:
             print(f"警告：加载文件 {filename} 失败，将使用默认数据。错误：{e}")
     
@@ -0,0 +1,327 @@
+import argparse
+import json
+import math
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# --- 数据集校验与规范化 ---
+# 加载时一次遍历完成全部检查，输出完整的错误/警告报告和一个只读的规范化数据集：
+#   错误：缺少顶层键、目的地不在 params 中、U/D/时间/票价不是数字、到达早于发车、票价为负、座位数不是非负整数、
+#         最短停留大于最长停留等
+#   警告：params 或车次字典中出现未列出的目的地（丢弃）、缺少停留时间（使用默认值）、目的地没有车次等
+# 规范化后的数据集中 destinations 为 tuple，params 为 FrozenDict（不可修改、可 pickle 传给进程池），
+# 去程/返程车次为 trip_store.py 的列式存储视图（trips[j][tid]['cost'] 的读取方式不变），
+# 所有求解引擎都可以直接使用而无需再次检查。
+# load_dataset 按 (路径, 修改时间, 文件大小) 缓存结果，同一文件重复求解时不再解析和校验。
+# 带 origins 键的多出发地文件见 multi_origin.py，load_dataset 返回其中一个出发地的视图。
+# 车次可以带分席别票价 fares（cost 取最便宜席别的票价，可省略），数据集中的 fare_classes 列出出现过的全部席别。
+
+M = 10000  # 与 OR.py 一致：缺省的最长停留时间
+TOP_KEYS = ("destinations", "params", "outbound_trips", "return_trips")
+TRIP_FIELDS = ("dep_time", "arr_time", "cost")
+DIRECTION_NAMES = {"outbound_trips": "去程", "return_trips": "返程"}
+FARES_KEY = "fares"  # 可选的分席别票价 {席别: 票价}，按从低到高的等级排列，见 fare_classes.py
+SEATS_KEY = "seats"  # 可选的座位数（非负整数），见 group_assignment.py
+CACHE_SIZE = 8
+
+
+class FrozenDict(dict):
+    """只读字典：读取方式与 dict 完全相同，任何修改都会抛出 TypeError"""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("规范化后的数据集是只读的，请先用 thaw() 复制为普通字典")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    update = pop = popitem = clear = setdefault = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def thaw(value):
+    """把规范化数据集还原为可修改的普通 dict / list"""
+    if isinstance(value, Mapping):  # 包括 FrozenDict 和列式车次视图
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def _number(value):
+    """转换为数字；bool、NaN、无法解析的字符串返回 None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value if math.isfinite(value) else None
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+    return None
+
+
+def seat_count(value):
+    """转换为座位数（非负整数，允许 50.0 这样的整数值）；不合法时返回 None"""
+    number = _number(value)
+    if number is None or number < 0 or number != int(number):
+        return None
+    return int(number)
+
+
+def _fares(value, where, errors):
+    """校验分席别票价，返回 FrozenDict；有错误时返回 None"""
+    if not isinstance(value, dict) or not value:
+        errors.append(f"{where}：{FARES_KEY} 必须是非空的 {{席别: 票价}} 对象")
+        return None
+    fares = {}
+    for c, fare in value.items():
+        number = _number(fare)
+        if number is None or number < 0:
+            errors.append(f"{where}：席别 '{c}' 的票价必须是非负数字: {fare!r}")
+            return None
+        fares[c] = number
+    return FrozenDict(fares)
+
+
+def validate_dataset(data, stay_defaults=(0, M)):
+    """校验并规范化数据集
+
+    stay_defaults: 缺少 min_stay_hours / max_stay_hours 时使用的默认值（求解器的约定是 0 和 M）。
+    返回 (规范化数据集, 报告)，报告为 {'errors': [...], 'warnings': [...]}；
+    存在错误时规范化数据集为 None。
+    """
+    errors, warnings = [], []
+    if not isinstance(data, dict):
+        return None, {'errors': ["数据文件的顶层必须是 JSON 对象"], 'warnings': warnings}
+    missing = [key for key in TOP_KEYS if key not in data]
+    if missing:
+        return None, {'errors': [f"缺少必需的键: {', '.join(missing)}"], 'warnings': warnings}
+    if not isinstance(data["destinations"], list):
+        return None, {'errors': ["destinations 必须是列表"], 'warnings': warnings}
+    for key in TOP_KEYS[1:]:
+        if not isinstance(data[key], dict):
+            errors.append(f"{key} 必须是对象")
+    if errors:
+        return None, {'errors': errors, 'warnings': warnings}
+
+    destinations = []
+    seen = set()
+    for j in data["destinations"]:
+        if not isinstance(j, str):
+            errors.append(f"目的地名称必须是字符串: {j!r}")
+        elif j in seen:
+            warnings.append(f"目的地 '{j}' 重复出现，只保留一次")
+        else:
+            seen.add(j)
+            destinations.append(j)
+    if not destinations:
+        warnings.append("没有任何目的地")
+
+    params = {}
+    trips = {"outbound_trips": {}, "return_trips": {}}
+    fare_classes = []  # 数据中出现的全部席别，按首次出现的顺序
+    for j in destinations:
+        # 参数
+        p = data["params"].get(j)
+        if not isinstance(p, dict):
+            errors.append(f"目的地 '{j}' 在 params 中没有参数")
+            continue
+        normalized = dict(p)
+        for key in ("U", "D"):
+            value = _number(p.get(key))
+            if value is None:
+                errors.append(f"目的地 '{j}' 的 {key} 缺失或不是数字: {p.get(key)!r}")
+            normalized[key] = value
+        for key, default in zip(("min_stay_hours", "max_stay_hours"), stay_defaults):
+            if key not in p:
+                warnings.append(f"目的地 '{j}' 缺少 {key}，使用默认值 {default}")
+                normalized[key] = default
+                continue
+            value = _number(p[key])
+            if value is None or value < 0:
+                errors.append(f"目的地 '{j}' 的 {key} 必须是非负数字: {p[key]!r}")
+            normalized[key] = value
+        if (normalized["min_stay_hours"] is not None and normalized["max_stay_hours"] is not None
+                and normalized["min_stay_hours"] > normalized["max_stay_hours"]):
+            errors.append(f"目的地 '{j}' 的最短停留时间大于最长停留时间")
+        params[j] = FrozenDict(normalized)
+
+        # 车次
+        for key, name in DIRECTION_NAMES.items():
+            raw_trips = data[key].get(j)
+            if raw_trips is None:
+                warnings.append(f"目的地 '{j}' 没有{name}车次")
+                raw_trips = {}
+            elif not isinstance(raw_trips, dict):
+                errors.append(f"目的地 '{j}' 的{name}车次必须是对象")
+                continue
+            result = {}
+            for tid, info in raw_trips.items():
+                where = f"目的地 '{j}' {name}车次 '{tid}'"
+                if not isinstance(info, dict):
+                    errors.append(f"{where}：必须是对象")
+                    continue
+                trip = dict(info)
+                bad = False
+                if FARES_KEY in info:
+                    fares = _fares(info[FARES_KEY], where, errors)
+                    if fares is None:
+                        continue
+                    trip[FARES_KEY] = fares
+                    for c in fares:
+                        if c not in fare_classes:
+                            fare_classes.append(c)
+                    # cost 取最便宜席别的票价，各求解引擎的预算约束不需要区分席别
+                    cheapest = min(fares.values())
+                    if "cost" in info and _number(info["cost"]) != cheapest:
+                        warnings.append(f"{where}：cost {info['cost']!r} 与最便宜席别的票价 {cheapest} 不同，使用 {cheapest}")
+                    info = dict(info, cost=cheapest)
+                for field in TRIP_FIELDS:
+                    value = _number(info.get(field))
+                    if value is None:
+                        errors.append(f"{where}：{field} 缺失或不是数字: {info.get(field)!r}")
+                        bad = True
+                    trip[field] = value
+                if SEATS_KEY in info:
+                    seats = seat_count(info[SEATS_KEY])
+                    if seats is None:
+                        errors.append(f"{where}：{SEATS_KEY} 必须是非负整数: {info[SEATS_KEY]!r}")
+                        bad = True
+                    trip[SEATS_KEY] = seats
+                if bad:
+                    continue
+                if trip["arr_time"] < trip["dep_time"]:
+                    errors.append(f"{where}：到达时间 {trip['arr_time']} 早于发车时间 {trip['dep_time']}")
+                elif trip["arr_time"] == trip["dep_time"]:
+                    warnings.append(f"{where}：到达时间与发车时间相同")
+                if trip["cost"] < 0:
+                    errors.append(f"{where}：票价不能为负: {trip['cost']}")
+                result[tid] = trip
+            trips[key][j] = result
+
+    # 未列出的目的地
+    for key in ("params",) + tuple(DIRECTION_NAMES):
+        extra = [j for j in data[key] if j not in seen]
+        if extra:
+            warnings.append(f"{key} 中的目的地不在 destinations 列表中，已忽略: {', '.join(map(str, extra))}")
+
+    report = {'errors': errors, 'warnings': warnings}
+    if errors:
+        return None, report
+    from trip_store import TripStore
+    normalized = dict(data)
+    normalized.update(destinations=tuple(destinations), params=FrozenDict(params),
+                      **{key: TripStore.from_trip_dicts(destinations, trips[key]).as_mapping() for key in trips})
+    if fare_classes:
+        normalized["fare_classes"] = tuple(fare_classes)
+    return FrozenDict(normalized), report
+
+
+class DatasetError(ValueError):
+    """数据集校验未通过；report 中是完整的错误/警告列表"""
+
+    def __init__(self, path, report):
+        self.path = path
+        self.report = report
+        super().__init__(f"{path} 中有 {len(report['errors'])} 个数据错误，第一个：{report['errors'][0]}")
+
+
+_cache = OrderedDict()
+
+
+def load_validated(path, stay_defaults=(0, M)):
+    """读取并校验数据文件（带缓存），返回 (数据集, 报告)；多出发地文件返回 MultiOriginDataset
+
+    校验未通过时抛出 DatasetError；文件不存在或不是合法 JSON 时抛出 FileNotFoundError / json.JSONDecodeError。
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, tuple(stay_defaults))
+    cached = _cache.get(key)
+    if cached is None:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        if isinstance(raw, dict) and "origins" in raw:
+            from multi_origin import validate_multi_origin
+            cached = validate_multi_origin(raw, stay_defaults)
+        else:
+            cached = validate_dataset(raw, stay_defaults)
+        _cache[key] = cached
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+    dataset, report = cached
+    if dataset is None:
+        raise DatasetError(path, report)
+    return dataset, report
+
+
+def load_dataset(path, stay_defaults=(0, M), origin=None):
+    """读取、校验并规范化数据文件，返回 (规范化数据集, 报告)
+
+    结果按 (路径, 修改时间, 文件大小) 缓存；校验未通过时抛出 DatasetError。
+    多出发地文件返回出发地 origin 的视图（未指定时使用第一个出发地）。
+    文件不存在或不是合法 JSON 时抛出 FileNotFoundError / json.JSONDecodeError。
+    """
+    dataset, report = load_validated(path, stay_defaults)
+    origins = getattr(dataset, "origins", None)
+    if origins is None:
+        if origin is not None:
+            raise DatasetError(path, {'errors': [f"{path} 不是多出发地数据文件，不能指定出发地 '{origin}'"],
+                                      'warnings': []})
+        return dataset, report
+    if origin is None:
+        origin = origins[0]
+        report = {'errors': report['errors'],
+                  'warnings': report['warnings'] + [f"未指定出发地，使用第一个出发地 '{origin}'"]}
+    elif origin not in origins:
+        raise DatasetError(path, {'errors': [f"数据文件中没有出发地 '{origin}'（可选：{', '.join(origins)}）"],
+                                  'warnings': []})
+    return dataset.origin(origin), report
+
+
+def format_report(report, limit=20):
+    """把报告整理为多行文本，每类最多列出 limit 条"""
+    lines = []
+    for key, title in (('errors', "错误"), ('warnings', "警告")):
+        items = report[key]
+        if not items:
+            continue
+        lines.append(f"{title}（{len(items)} 条）：")
+        lines.extend(f"  - {item}" for item in items[:limit])
+        if len(items) > limit:
+            lines.append(f"  ... 另有 {len(items) - limit} 条")
+    return "\n".join(lines)
+
+
+def print_validation_report(report, limit=20):
+    text = format_report(report, limit)
+    if text:
+        print("\n--- 数据校验 ---")
+        print(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="校验旅行数据文件")
+    parser.add_argument("json_path", help="数据文件路径")
+    parser.add_argument("--limit", type=int, default=50, help="每类最多显示的条数")
+    args = parser.parse_args()
+
+    with open(args.json_path, "r", encoding="utf-8") as f:
+        dataset, report = validate_dataset(json.load(f))
+    print(format_report(report, args.limit) or "数据校验通过，没有错误或警告。")
+    if dataset is not None:
+        n_out = sum(len(t) for t in dataset["outbound_trips"].values())
+        n_ret = sum(len(t) for t in dataset["return_trips"].values())
+        print(f"目的地 {len(dataset['destinations'])} 个，去程车次 {n_out} 个，返程车次 {n_ret} 个")
+    raise SystemExit(1 if report['errors'] else 0)
@@ -0,0 +1,207 @@
+import heapq
+import os
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from trip_store import trip_tuples
+
+# --- 按目的地分解的并行求解 ---
+# 模型中恰好选择一个目的地，目标值 U - α·D 只与目的地有关，车次只影响可行性；
+# 除预算约束外各目的地之间没有耦合，而预算约束对单个方案同样适用。因此：
+#   map   : 各目的地独立地（在进程池/线程池中）判断是否存在满足时间窗口、停留时间和预算的 (去程, 返程) 组合；
+#   reduce: 取可行目的地中目标值最高者，再对并列的目的地枚举全部可行组合，得到与 MILP 逐个排除法相同的最优解集合。
+# best_first_solve 不做 map，而是按目标值从高到低逐个检查，找到第一个可行目的地（及并列者）后即停止。
+# 约束与 OR.py 中 create_model() 的约束 4~8 一一对应。
+
+M = 10000  # 与 OR.py 一致：缺省的最长停留时间
+TOL = 1e-5  # 与 OR.py 一致：判断目标值相同的容差
+
+
+def destination_task(data, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end):
+    """把目的地 j 的数据整理为可在进程间传递的元组"""
+    params_j = data["params"][j]
+    # 列式存储的数据集直接切取列数组，不逐个车次经过字典式视图
+    outs = [t for t in trip_tuples(data["outbound_trips"].get(j, {})) if W_out_start <= t[1] <= W_out_end]
+    rets = [t for t in trip_tuples(data["return_trips"].get(j, {})) if W_ret_start <= t[1] <= W_ret_end]
+    outs.sort(key=lambda t: t[2])  # 按到达时间
+    rets.sort(key=lambda t: t[1])  # 按发车时间
+    return (j, outs, rets, params_j.get('min_stay_hours', 0), params_j.get('max_stay_hours', M), budget)
+
+
+def cheapest_pair(task):
+    """返回 (目的地, 最低总票价)；不存在可行组合时票价为 None"""
+    j, outs, rets, min_stay, max_stay, budget = task
+    ret_deps = [t[1] for t in rets]
+    # 去程按到达时间排序后，可搭配的返程区间 [lo, hi) 两端都单调不减，用单调队列求区间最小票价
+    window = deque()
+    next_in = 0
+    best = None
+    for tid, dep, arr, cost in outs:
+        lo = bisect_left(ret_deps, arr + min_stay)
+        hi = bisect_right(ret_deps, arr + max_stay)
+        while next_in < hi:
+            while window and rets[window[-1]][3] >= rets[next_in][3]:
+                window.pop()
+            window.append(next_in)
+            next_in += 1
+        while window and window[0] < lo:
+            window.popleft()
+        if window:
+            total = cost + rets[window[0]][3]
+            if total <= budget and (best is None or total < best):
+                best = total
+    return j, best
+
+
+def iter_feasible_pairs(task):
+    """逐个生成目的地的可行 (去程, 返程) 组合"""
+    j, outs, rets, min_stay, max_stay, budget = task
+    ret_deps = [t[1] for t in rets]
+    for out in outs:
+        lo = bisect_left(ret_deps, out[2] + min_stay)
+        hi = bisect_right(ret_deps, out[2] + max_stay)
+        for ret in rets[lo:hi]:
+            if out[3] + ret[3] <= budget:
+                yield out, ret
+
+
+def iter_pairs_by_cost(task):
+    """按 (总票价, 去程, 返程) 从小到大逐个生成满足预算的可行组合，不预先生成全部组合
+
+    每个去程可搭配的返程是按发车时间排序后的一个区间；用稀疏表求区间内票价最低的返程，
+    堆中每个去程只放一项，弹出后把区间从该返程处一分为二，内存只与已生成的组合数成正比。
+    """
+    j, outs, rets, min_stay, max_stay, budget = task
+    if not outs or not rets:
+        return
+    ret_deps = [t[1] for t in rets]
+    keys = [(t[3], t) for t in rets]
+    # table[p][i]：区间 [i, i + 2^p) 中 (票价, 返程) 最小的返程下标
+    table = [list(range(len(rets)))]
+    width = 1
+    while 2 * width <= len(rets):
+        prev = table[-1]
+        table.append([a if keys[a] <= keys[b] else b for a, b in zip(prev, prev[width:])])
+        width *= 2
+
+    def cheapest(lo, hi):
+        p = (hi - lo).bit_length() - 1
+        a, b = table[p][lo], table[p][hi - (1 << p)]
+        return a if keys[a] <= keys[b] else b
+
+    heap = []
+    for out in outs:
+        lo = bisect_left(ret_deps, out[2] + min_stay)
+        hi = bisect_right(ret_deps, out[2] + max_stay)
+        if lo < hi:
+            k = cheapest(lo, hi)
+            heap.append((out[3] + rets[k][3], out, rets[k], lo, hi, k))
+    heapq.heapify(heap)
+    while heap:
+        total, out, ret, lo, hi, k = heapq.heappop(heap)
+        if total > budget:
+            return
+        yield total, out, ret
+        for a, b in ((lo, k), (k + 1, hi)):
+            if a < b:
+                m = cheapest(a, b)
+                heapq.heappush(heap, (out[3] + rets[m][3], out, rets[m], a, b, m))
+
+
+def feasible_pairs(task):
+    """返回 (目的地, [(去程, 返程), ...])：目的地 j 的全部可行组合"""
+    return task[0], list(iter_feasible_pairs(task))
+
+
+def pair_to_solution(j, out, ret, objective):
+    """转换为与 load_json_and_solve 相同的解结构"""
+    return {'destination': j, 'outbound': (out[0], out[3]), 'return': (ret[0], ret[3]),
+            'cost': out[3] + ret[3], 'objective': objective, 'stay': ret[1] - out[2]}
+
+
+def _make_executor(executor, workers):
+    if executor == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    raise ValueError(f"未知的执行器类型: {executor}")
+
+
+def decomposed_solve(data, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24,
+                     W_ret_start=72, W_ret_end=120, workers=None, executor="process", on_solution=None):
+    """返回 (optimal_solutions, target_objective_value)，无可行解时为 ([], None)
+
+    executor 为 "process" / "thread"；为 None 时在当前进程中串行计算。
+    on_solution 给出时每得到一个解就调用 on_solution(sol)（如直接写入导出文件），
+    不在内存中保存全部解，返回的 optimal_solutions 为空列表。
+    """
+    destinations = data["destinations"]
+    params = data["params"]
+    tasks = [destination_task(data, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+             for j in destinations]
+    score = {j: params[j]['U'] - alpha * params[j]['D'] for j in destinations}
+
+    if executor is None or len(tasks) <= 1:
+        pool = None
+        map_fn = map
+    else:
+        pool = _make_executor(executor, workers or os.cpu_count())
+        # 进程池按块分发，减少大量小任务的进程间通信开销
+        chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count())))
+        map_fn = lambda fn, items: pool.map(fn, items, chunksize=chunksize)
+
+    try:
+        # map：各目的地是否存在可行组合
+        feasible = [j for j, best in map_fn(cheapest_pair, tasks) if best is not None]
+        if not feasible:
+            return [], None
+        # reduce：取目标值最高的可行目的地，对并列者枚举全部可行组合
+        target_objective_value = max(score[j] for j in feasible)
+        tied = {j for j in feasible if abs(score[j] - target_objective_value) < TOL}
+        tied_tasks = [task for task in tasks if task[0] in tied]
+        optimal_solutions = []
+        emit = optimal_solutions.append if on_solution is None else on_solution
+        # 串行时逐个生成组合；并行时每个目的地的组合由工作进程整体返回，收到后立即逐个传出
+        pairs_fn = (lambda task: (task[0], iter_feasible_pairs(task))) if pool is None else feasible_pairs
+        for j, pairs in map_fn(pairs_fn, tied_tasks):
+            for out, ret in pairs:
+                emit(pair_to_solution(j, out, ret, score[j]))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return optimal_solutions, target_objective_value
+
+
+def best_first_solve(data, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24,
+                     W_ret_start=72, W_ret_end=120, stats=None, on_solution=None):
+    """按目标值从高到低逐个检查目的地，返回 (optimal_solutions, target_objective_value)，结果与 decomposed_solve 相同
+
+    目标值只与目的地有关：第一个存在可行组合的目的地即为最优，之后只需再检查与它目标值并列的目的地，
+    目标值更低的目的地不必整理车次。stats 为字典时记录检查过的目的地数 checked 和目的地总数 total。
+    on_solution 的含义与 decomposed_solve 相同。
+    """
+    destinations = data["destinations"]
+    params = data["params"]
+    score = {j: params[j]['U'] - alpha * params[j]['D'] for j in destinations}
+    target_objective_value = None
+    tied_tasks = []
+    checked = 0
+    for j in sorted(destinations, key=lambda j: -score[j]):
+        if target_objective_value is not None and target_objective_value - score[j] >= TOL:
+            break
+        checked += 1
+        task = destination_task(data, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+        if cheapest_pair(task)[1] is not None:
+            if target_objective_value is None:
+                target_objective_value = score[j]
+            tied_tasks.append(task)
+    if stats is not None:
+        stats.update(checked=checked, total=len(destinations))
+    # 并列的目的地按数据中的顺序列出，与 decomposed_solve 一致
+    order = {j: k for k, j in enumerate(destinations)}
+    optimal_solutions = []
+    emit = optimal_solutions.append if on_solution is None else on_solution
+    for task in sorted(tied_tasks, key=lambda task: order[task[0]]):
+        for out, ret in iter_feasible_pairs(task):
+            emit(pair_to_solution(task[0], out, ret, score[task[0]]))
+    return optimal_solutions, target_objective_value
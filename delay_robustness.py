@@ -0,0 +1,174 @@
+import argparse
+import heapq
+import time
+import numpy as np
+from decomposed_solve import destination_task, iter_feasible_pairs, pair_to_solution
+from dataset_validator import load_dataset, print_validation_report
+from result_export import print_table
+
+# --- 延误稳健性评估（蒙特卡洛） ---
+# 模型中的停留时间和时间窗口约束按时刻表上的 dep_time / arr_time 精确计算，
+# 停留时间刚好等于 min_stay_hours 的方案只要去程晚点几分钟就不再满足要求。
+# 这里对候选方案（最优解、Top-K 方案）抽样大量延误场景，统计每个方案仍满足
+# 停留时间（约束 7、8）和时间窗口（约束 5、6）的概率：
+#   每个车次以概率 p_late 晚点发车，晚点时长服从均值 mean_late 的指数分布；
+#   途中再以概率 p_run 增加运行延误（均值 mean_run），只影响到达时间。
+# 车次数据中的 delay_prob / delay_mean 字段覆盖该车次的 p_late / mean_late。
+# 同一车次在所有方案中使用同一组抽样结果；全部计算用 NumPy 按 (场景 × 方案) 矩阵完成，
+# 每秒可评估数千万个 方案×场景 组合，可以在每次查询后运行。
+
+SCENARIOS = 2000
+BLOCK = 512  # 每次计算的方案数，限制 (场景 × 方案) 矩阵的内存
+ROBUSTNESS_HEADERS = ["目的地", "去程车次", "返程车次", "总交通成本", "停留时间(h)", "目标值",
+                      "全部满足", "停留满足", "窗口满足", "停留P5(h)", "风险调整效用"]
+
+
+class DelayModel:
+    """车次延误分布（单位：小时）；单次延误最多 cap 小时"""
+
+    def __init__(self, p_late=0.2, mean_late=0.5, p_run=0.1, mean_run=0.25, cap=12.0):
+        self.p_late = p_late
+        self.mean_late = mean_late
+        self.p_run = p_run
+        self.mean_run = mean_run
+        self.cap = cap
+
+    def trip_params(self, info):
+        """车次的 (晚点概率, 平均晚点时长)；数据中的 delay_prob / delay_mean 优先"""
+        p = info.get("delay_prob")
+        mean = info.get("delay_mean")
+        return (self.p_late if p is None else float(p)), (self.mean_late if mean is None else float(mean))
+
+    def _sample(self, rng, p, mean, scenarios):
+        late = rng.random((scenarios, len(p))) < p
+        size = rng.standard_exponential((scenarios, len(p))) * mean
+        return np.minimum(np.where(late, size, 0.0), self.cap)
+
+    def sample(self, rng, p_late, mean_late, scenarios):
+        """返回 (发车延误, 到达延误)，形状均为 (场景数, 车次数)"""
+        dep_delay = self._sample(rng, p_late, mean_late, scenarios)
+        run_delay = self._sample(rng, np.full(len(p_late), self.p_run), np.full(len(p_late), self.mean_run),
+                                 scenarios)
+        return dep_delay, dep_delay + run_delay
+
+
+def candidate_itineraries(data, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24, W_ret_start=72,
+                          W_ret_end=120, top_k=20):
+    """目标值最高的 top_k 个可行方案（目标值相同时总交通成本低的在前）"""
+    params = data["params"]
+    score = {j: params[j]['U'] - alpha * params[j]['D'] for j in data["destinations"]}
+    candidates = []
+    for j in sorted(data["destinations"], key=lambda j: -score[j]):
+        if len(candidates) >= top_k:
+            break
+        task = destination_task(data, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+        best = heapq.nsmallest(top_k - len(candidates), iter_feasible_pairs(task),
+                               key=lambda pair: (pair[0][3] + pair[1][3], pair[0][0], pair[1][0]))
+        candidates.extend(pair_to_solution(j, out, ret, score[j]) for out, ret in best)
+    return candidates
+
+
+def score_itineraries(data, solutions, W_out_start=0, W_out_end=24, W_ret_start=72, W_ret_end=120,
+                      model=None, scenarios=SCENARIOS, seed=0, fail_value=0.0):
+    """评估每个方案在延误场景下的稳健性，返回与 solutions 一一对应的字典列表：
+
+    p_ok（停留时间和时间窗口都满足的概率）、p_stay、p_window、stay_p5（停留时间的 5% 分位数）、
+    risk_adjusted（风险调整效用 = p_ok × 目标值 + (1 - p_ok) × fail_value）。
+    seed 固定时结果可重复。
+    """
+    model = model or DelayModel()
+    if not solutions:
+        return []
+    # 方案中用到的车次，每个只抽样一次
+    index = {}
+    rows = []
+    for sol in solutions:
+        j = sol['destination']
+        for direction, kind in (("outbound_trips", 'outbound'), ("return_trips", 'return')):
+            key = (direction, j, sol[kind][0])
+            if key not in index:
+                index[key] = len(rows)
+                rows.append(data[direction][j][sol[kind][0]])
+    dep = np.array([info['dep_time'] for info in rows], dtype=float)
+    arr = np.array([info['arr_time'] for info in rows], dtype=float)
+    p_late, mean_late = np.array([model.trip_params(info) for info in rows], dtype=float).T
+    dep_delay, arr_delay = model.sample(np.random.default_rng(seed), p_late, mean_late, scenarios)
+
+    params = data["params"]
+    out_idx = np.array([index[("outbound_trips", s['destination'], s['outbound'][0])] for s in solutions])
+    ret_idx = np.array([index[("return_trips", s['destination'], s['return'][0])] for s in solutions])
+    min_stay = np.array([params[s['destination']]['min_stay_hours'] for s in solutions], dtype=float)
+    max_stay = np.array([params[s['destination']]['max_stay_hours'] for s in solutions], dtype=float)
+
+    p_ok, p_stay, p_window, stay_p5 = [], [], [], []
+    for lo in range(0, len(solutions), BLOCK):
+        o, r = out_idx[lo:lo + BLOCK], ret_idx[lo:lo + BLOCK]
+        out_dep = dep[o] + dep_delay[:, o]
+        ret_dep = dep[r] + dep_delay[:, r]
+        stay = ret_dep - (arr[o] + arr_delay[:, o])
+        stay_ok = (stay >= min_stay[lo:lo + BLOCK]) & (stay <= max_stay[lo:lo + BLOCK])
+        window_ok = ((out_dep >= W_out_start) & (out_dep <= W_out_end) &
+                     (ret_dep >= W_ret_start) & (ret_dep <= W_ret_end))
+        p_ok.append((stay_ok & window_ok).mean(axis=0))
+        p_stay.append(stay_ok.mean(axis=0))
+        p_window.append(window_ok.mean(axis=0))
+        stay_p5.append(np.percentile(stay, 5, axis=0))
+    p_ok, p_stay, p_window, stay_p5 = (np.concatenate(a) for a in (p_ok, p_stay, p_window, stay_p5))
+    return [{'p_ok': float(p_ok[k]), 'p_stay': float(p_stay[k]), 'p_window': float(p_window[k]),
+             'stay_p5': float(stay_p5[k]),
+             'risk_adjusted': float(p_ok[k] * sol['objective'] + (1 - p_ok[k]) * fail_value)}
+            for k, sol in enumerate(solutions)]
+
+
+def rerank(solutions, scores):
+    """按风险调整效用从高到低重新排序（相同时保持原顺序），返回 (solutions, scores)"""
+    order = sorted(range(len(solutions)), key=lambda k: -scores[k]['risk_adjusted'])
+    return [solutions[k] for k in order], [scores[k] for k in order]
+
+
+def robustness_rows(solutions, scores):
+    for sol, sc in zip(solutions, scores):
+        yield [sol['destination'], sol['outbound'][0], sol['return'][0], sol['cost'], sol['stay'],
+               f"{sol['objective']:.2f}", f"{sc['p_ok']:.1%}", f"{sc['p_stay']:.1%}", f"{sc['p_window']:.1%}",
+               f"{sc['stay_p5']:.1f}", f"{sc['risk_adjusted']:.2f}"]
+
+
+def print_robustness(solutions, scores, scenarios=SCENARIOS):
+    print(f"\n--- 延误稳健性（{scenarios} 个场景） ---")
+    print_table(list(robustness_rows(solutions, scores)), ROBUSTNESS_HEADERS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="蒙特卡洛评估候选方案的延误稳健性")
+    parser.add_argument("json_path", help="数据文件路径")
+    parser.add_argument("--origin", default=None, help="多出发地数据文件中的出发地")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--budget", type=float, default=1200)
+    parser.add_argument("--windows", type=float, nargs=4, default=(0, 24, 72, 120),
+                        metavar=("去程起", "去程止", "返程起", "返程止"))
+    parser.add_argument("--top-k", type=int, default=20, help="评估目标值最高的前 K 个方案")
+    parser.add_argument("--scenarios", type=int, default=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--p-late", type=float, default=0.2, help="晚点发车的概率")
+    parser.add_argument("--mean-late", type=float, default=0.5, help="平均晚点时长（小时）")
+    parser.add_argument("--p-run", type=float, default=0.1, help="途中延误的概率")
+    parser.add_argument("--mean-run", type=float, default=0.25, help="平均途中延误（小时）")
+    parser.add_argument("--fail-value", type=float, default=0.0, help="方案失败时的效用（用于风险调整效用）")
+    parser.add_argument("--rerank", action="store_true", help="按风险调整效用重新排序")
+    args = parser.parse_args()
+
+    data, report = load_dataset(args.json_path, origin=args.origin)
+    print_validation_report(report)
+    solutions = candidate_itineraries(data, args.alpha, args.budget, *args.windows, top_k=args.top_k)
+    if not solutions:
+        print("未找到可行方案。")
+        raise SystemExit(0)
+    model = DelayModel(args.p_late, args.mean_late, args.p_run, args.mean_run)
+    start = time.perf_counter()
+    scores = score_itineraries(data, solutions, *args.windows, model=model, scenarios=args.scenarios,
+                               seed=args.seed, fail_value=args.fail_value)
+    elapsed = time.perf_counter() - start
+    if args.rerank:
+        solutions, scores = rerank(solutions, scores)
+    print_robustness(solutions, scores, args.scenarios)
+    print(f"评估 {len(solutions)} 个方案 × {args.scenarios} 个场景，耗时 {elapsed:.3f}s")
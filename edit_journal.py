@@ -0,0 +1,193 @@
+import json
+import os
+import tempfile
+import threading
+
+# --- 编辑日志与增量自动保存 ---
+# 每次修改（车次/目的地/参数的增删改）以一行 JSON 追加到 <数据文件>.journal，
+# 写入开销只与本次修改有关，与数据集大小无关；程序崩溃后重新打开时重放日志即可恢复。
+# 后台线程定期把日志合并进主文件：先把当前日志改名为 .journal.compacting（新的修改写入新日志），
+# 再读取主文件、重放 compacting 日志、写入临时文件后 os.replace 原子替换，最后删除 compacting 日志。
+# 所有操作都是幂等的，合并中途崩溃后重复重放也不会出错。
+
+DATA_KEYS = ("destinations", "params", "outbound_trips", "return_trips")
+TRIP_KEYS = {"outbound": "outbound_trips", "return": "return_trips"}
+
+
+def apply_op(data, op):
+    """把一条日志操作应用到 data（包含 destinations/params/outbound_trips/return_trips 的字典）"""
+    kind = op["op"]
+    if kind == "set_trip":
+        data[TRIP_KEYS[op["direction"]]].setdefault(op["dest"], {})[op["trip_id"]] = op["trip"]
+    elif kind == "del_trip":
+        data[TRIP_KEYS[op["direction"]]].get(op["dest"], {}).pop(op["trip_id"], None)
+    elif kind == "add_dest":
+        if op["dest"] not in data["destinations"]:
+            data["destinations"].append(op["dest"])
+        data["params"][op["dest"]] = op["params"]
+        data["outbound_trips"].setdefault(op["dest"], {})
+        data["return_trips"].setdefault(op["dest"], {})
+    elif kind == "del_dest":
+        if op["dest"] in data["destinations"]:
+            data["destinations"].remove(op["dest"])
+        for key in ("params", "outbound_trips", "return_trips"):
+            data[key].pop(op["dest"], None)
+    elif kind == "rename_dest":
+        old, new = op["old"], op["new"]
+        if old in data["destinations"] and new not in data["destinations"]:
+            data["destinations"][data["destinations"].index(old)] = new
+            for key in ("params", "outbound_trips", "return_trips"):
+                if old in data[key]:
+                    data[key][new] = data[key].pop(old)
+    elif kind == "set_params":
+        data["params"][op["dest"]] = op["params"]
+    else:
+        raise ValueError(f"未知的日志操作: {kind}")
+
+
+def atomic_write_json(path, data):
+    """写入临时文件并 fsync 后原子替换目标文件，写入中途崩溃不会损坏原文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_ops(path):
+    """读取日志中的操作；写了一半（崩溃）的行直接跳过"""
+    ops = []
+    if not os.path.exists(path):
+        return ops
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                ops.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return ops
+
+
+def _ends_with_newline(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class EditJournal:
+    """某个数据文件的编辑日志"""
+
+    def __init__(self, data_path):
+        self.data_path = data_path
+        self.journal_path = data_path + ".journal"
+        self.compacting_path = data_path + ".journal.compacting"
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0  # 上次合并后追加的操作数
+        self._stop = None
+        self._thread = None
+
+    def append(self, *ops):
+        """追加一条或多条操作并立即写入磁盘"""
+        if not ops:
+            return
+        payload = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops)
+        with self._lock:
+            if self._file is None:
+                # 上次崩溃可能留下半行，先补换行，避免与新记录粘在一起
+                prefix = "" if _ends_with_newline(self.journal_path) else "\n"
+                self._file = open(self.journal_path, "a", encoding="utf-8")
+                self._file.write(prefix)
+            self._file.write(payload)
+            self._file.flush()
+            self._pending += len(ops)
+
+    def pending(self):
+        return self._pending
+
+    def replay(self, data):
+        """把尚未合并的日志（包括上次中断的合并）应用到 data，返回重放的操作数"""
+        count = 0
+        for path in (self.compacting_path, self.journal_path):
+            ops = _read_ops(path)
+            for op in ops:
+                apply_op(data, op)
+            count += len(ops)
+        self._pending = len(_read_ops(self.journal_path))
+        return count
+
+    def compact(self):
+        """把日志合并进主文件；没有待合并的修改时直接返回 False"""
+        with self._lock:
+            # 上次合并中断时先完成那一次，当前日志留到下一轮
+            if not os.path.exists(self.compacting_path):
+                if self._pending == 0:
+                    return False
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                if os.path.exists(self.journal_path):
+                    os.replace(self.journal_path, self.compacting_path)
+                self._pending = 0
+
+        # 以下不持有锁：编辑器继续向新日志追加
+        if os.path.exists(self.data_path):
+            with open(self.data_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = {"destinations": [], "params": {}, "outbound_trips": {}, "return_trips": {}}
+        for op in _read_ops(self.compacting_path):
+            apply_op(data, op)
+        atomic_write_json(self.data_path, data)
+        os.remove(self.compacting_path)
+        return True
+
+    def start_autosave(self, interval=30, on_error=None):
+        """启动后台合并线程，每 interval 秒检查一次"""
+        if self._thread is not None:
+            return
+        self._stop = threading.Event()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except Exception as e:
+                    if on_error:
+                        on_error(e)
+
+        self._thread = threading.Thread(target=run, name="journal-compaction", daemon=True)
+        self._thread.start()
+
+    def close(self, compact=True):
+        """停止后台线程；compact=True 时在退出前做最后一次合并"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if compact:
+            self.compact()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """丢弃日志（主文件已被整体重写时使用）"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._pending = 0
@@ -0,0 +1,122 @@
+import sys
+from collections import OrderedDict
+from dataset_validator import FrozenDict, FARES_KEY, load_dataset
+
+# --- 分席别票价 ---
+# 车次可以带 fares: {席别: 票价}（如二等座、一等座、商务座，按等级从低到高排列）。
+# 目标值 U - α·D 与票价无关，票价只出现在预算约束中，所以对任意一组 (目的地, 去程, 返程)，
+# 最便宜的可选席别总是可行性最好的选择：
+#   求解时每个车次的 cost 取允许席别中的最低票价（apply_fare_classes），模型不增加任何变量，
+#   停留时间的成对约束和各求解引擎都不变；
+#   求解后再为每个解选定席别（choose_classes）：cheapest 取最便宜的席别，
+#   upgrade 在预算内尽量选等级高的席别。
+# 没有 fares 的车次视为单一票价，不受席别限制。
+
+FARE_POLICIES = {"cheapest": "最便宜的席别", "upgrade": "预算内尽量高的席别"}
+CACHE_SIZE = 4
+
+_cache = OrderedDict()
+
+
+def allowed_fares(info, classes=None):
+    """车次在允许的席别中的票价 {席别: 票价}；单一票价的车次返回 None"""
+    fares = info.get(FARES_KEY)
+    if fares is None:
+        return None
+    return {c: fare for c, fare in fares.items() if classes is None or c in classes}
+
+
+def apply_fare_classes(data, classes=None):
+    """只允许 classes 中的席别：返回 (数据集, 去掉的车次数)
+
+    每个车次的 cost 换成允许席别中的最低票价，没有允许席别的车次被去掉；
+    结果按 (数据集, 席别) 缓存，同一数据集重复求解时不再重建。
+    """
+    if classes is None:
+        return data, 0
+    classes = tuple(classes)
+    key = (id(data), classes)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] is data:
+        _cache.move_to_end(key)
+        return cached[1]
+    allowed = set(classes)
+    trips = {}
+    removed = 0
+    for direction in ("outbound_trips", "return_trips"):
+        result = {}
+        for j, dest_trips in data[direction].items():
+            kept = {}
+            for tid, info in dest_trips.items():
+                fares = allowed_fares(info, allowed)
+                if fares is None:
+                    kept[tid] = info
+                elif fares:
+                    kept[tid] = FrozenDict(dict(info, cost=min(fares.values())))
+                else:
+                    removed += 1
+            result[j] = FrozenDict(kept)
+        trips[direction] = FrozenDict(result)
+    restricted = FrozenDict(dict(data, **trips))
+    _cache[key] = (data, (restricted, removed))
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return restricted, removed
+
+
+def choose_classes(sol, data, budget, policy="cheapest", classes=None):
+    """为一个解选定去程、返程的席别
+
+    返回新的解：outbound / return / cost 改为所选席别的票价，并增加 'classes': (去程席别, 返程席别)，
+    单一票价的车次席别为 None。两个车次都是单一票价时原样返回。
+    """
+    if policy not in FARE_POLICIES:
+        raise ValueError(f"未知的席别策略: {policy}（可选 {', '.join(FARE_POLICIES)}）")
+    j = sol['destination']
+    allowed = None if classes is None else set(classes)
+    out_fares = allowed_fares(data["outbound_trips"][j][sol['outbound'][0]], allowed)
+    ret_fares = allowed_fares(data["return_trips"][j][sol['return'][0]], allowed)
+    if out_fares is None and ret_fares is None:
+        return sol
+    # (席别, 票价, 等级)；单一票价的车次只有一个选项
+    out_options = [(c, fare, rank) for rank, (c, fare) in enumerate(out_fares.items())] if out_fares is not None \
+        else [(None, sol['outbound'][1], 0)]
+    ret_options = [(c, fare, rank) for rank, (c, fare) in enumerate(ret_fares.items())] if ret_fares is not None \
+        else [(None, sol['return'][1], 0)]
+    options = [(out, ret) for out in out_options for ret in ret_options if out[1] + ret[1] <= budget]
+    if not options:
+        return sol
+    if policy == "cheapest":
+        out, ret = min(options, key=lambda o: (o[0][1] + o[1][1], o[0][2] + o[1][2]))
+    else:
+        out, ret = max(options, key=lambda o: (o[0][2] + o[1][2], -(o[0][1] + o[1][1])))
+    chosen = dict(sol, cost=out[1] + ret[1], classes=(out[0], ret[0]))
+    chosen['outbound'] = (sol['outbound'][0], out[1])
+    chosen['return'] = (sol['return'][0], ret[1])
+    return chosen
+
+
+def parse_classes(spec):
+    """"二等座,一等座" -> ("二等座", "一等座")；空字符串或 None 表示不限"""
+    if not spec:
+        return None
+    return tuple(c.strip() for c in spec.split(",") if c.strip())
+
+
+if __name__ == "__main__":
+    # python fare_classes.py [数据文件]：列出数据中的席别及各席别的车次数
+    path = sys.argv[1] if len(sys.argv) > 1 else "edited_travel_data.json"
+    data, _ = load_dataset(path)
+    counts = {c: 0 for c in data.get("fare_classes", ())}
+    single = 0
+    for direction in ("outbound_trips", "return_trips"):
+        for dest_trips in data[direction].values():
+            for info in dest_trips.values():
+                fares = info.get(FARES_KEY)
+                if fares is None:
+                    single += 1
+                for c in fares or ():
+                    counts[c] += 1
+    for c, n in counts.items():
+        print(f"{c}: {n} 个车次")
+    print(f"单一票价: {single} 个车次")
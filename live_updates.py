@@ -0,0 +1,305 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from decomposed_solve import destination_task, cheapest_pair, feasible_pairs, pair_to_solution, TOL
+from dataset_validator import FrozenDict, FARES_KEY, load_dataset, print_validation_report, _number
+from query_index import QueryIndex
+from result_export import print_table
+
+# --- 增量更新流：票价 / 余票变化实时应用到内存中的数据集 ---
+# 以前要拿到变化只能重写整个 JSON 文件再重新加载。LiveDataset 接收一行一个 JSON 的小更新（JSONL，文件或管道）：
+#   {"op": "add",    "direction": "outbound", "destination": "Beijing", "trip": "G1", "dep_time": 8, "arr_time": 12.5, "cost": 553}
+#   {"op": "update", "direction": "return",   "destination": "Beijing", "trip": "G2", "cost": 610}      # 改价 / 改时刻，只给变化的字段
+#   {"op": "remove", "direction": "outbound", "destination": "Beijing", "trip": "G1"}                   # 停运 / 售罄
+# 应用一条更新只改一个字典项并把目的地记为"有变化"，开销与数据集大小无关；
+# 查询时才对有变化的目的地重建查询索引（query_index.py）、丢弃它们的缓存结果，其余目的地的索引和缓存照常使用。
+# 读取更新的线程和查询线程共用一把 RLock，查询看到的总是完整应用了若干条更新之后的一致数据。
+
+DIRECTIONS = {"outbound": "outbound_trips", "return": "return_trips",
+              "outbound_trips": "outbound_trips", "return_trips": "return_trips"}
+TRIP_FIELDS = ("dep_time", "arr_time", "cost")
+OPS = ("add", "update", "remove")
+
+
+class DeltaError(ValueError):
+    """无法应用的更新（格式错误、目的地或车次不存在、时间或票价不合法）"""
+
+
+class LiveDataset:
+    """可增量更新的数据集；apply / query 可以在不同线程中同时调用"""
+
+    def __init__(self, data, error_log=100):
+        self.lock = threading.RLock()
+        self.destinations = tuple(data["destinations"])
+        self.params = data["params"]
+        self._base = {key: value for key, value in data.items() if key not in DIRECTIONS.values()}
+        # 方向 -> 目的地 -> {车次: 只读车次记录}；更新时整体替换记录，不修改记录本身
+        self._trips = {direction: {j: dict(data[direction].get(j, {})) for j in self.destinations}
+                       for direction in ("outbound_trips", "return_trips")}
+        self._frozen = {direction: {j: FrozenDict(trips) for j, trips in by_dest.items()}
+                        for direction, by_dest in self._trips.items()}
+        self._snapshot = None
+        self._dirty = set()          # 有未刷新更新的目的地
+        self._index = None           # QueryIndex，第一次查询时构建
+        self._pairs = {}             # (查询参数, 目的地) -> 并列最优目的地的全部可行组合
+        self._results = {}           # 查询参数 -> (版本, 结果)
+        self.version = 0             # 每应用一条更新加 1
+        self.applied = 0
+        self.rejected = 0
+        self.errors = deque(maxlen=error_log)  # 最近被拒绝的更新 (行号, 说明)
+
+    # --- 应用更新 ---
+
+    def apply(self, delta):
+        """应用一条更新，返回受影响的目的地；不合法时抛出 DeltaError"""
+        if not isinstance(delta, dict):
+            raise DeltaError("更新必须是 JSON 对象")
+        op = delta.get("op")
+        if op not in OPS:
+            raise DeltaError(f"未知的操作: {op!r}（可选 {', '.join(OPS)}）")
+        direction = DIRECTIONS.get(delta.get("direction"))
+        if direction is None:
+            raise DeltaError(f"direction 必须是 outbound 或 return: {delta.get('direction')!r}")
+        j = delta.get("destination")
+        if j not in self.params:
+            raise DeltaError(f"目的地 '{j}' 不在数据集中")
+        tid = delta.get("trip")
+        if not isinstance(tid, str) or not tid:
+            raise DeltaError("缺少车次编号 trip")
+
+        with self.lock:
+            trips = self._trips[direction][j]
+            if op == "remove":
+                if trips.pop(tid, None) is None:
+                    raise DeltaError(f"目的地 '{j}' 没有车次 '{tid}'")
+            else:
+                old = trips.get(tid)
+                if op == "update" and old is None:
+                    raise DeltaError(f"目的地 '{j}' 没有车次 '{tid}'，新增车次请用 add")
+                if op == "add" and old is not None:
+                    raise DeltaError(f"目的地 '{j}' 已有车次 '{tid}'，修改车次请用 update")
+                trips[tid] = trip = _trip_record(delta, old if op == "update" else None)
+                new_classes = [c for c in trip.get(FARES_KEY, ()) if c not in self._base.get("fare_classes", ())]
+                if new_classes:
+                    self._base["fare_classes"] = tuple(self._base.get("fare_classes", ())) + tuple(new_classes)
+            self._dirty.add(j)
+            self.version += 1
+            self.applied += 1
+        return j
+
+    def apply_lines(self, lines, start_line=1):
+        """应用 JSONL 文本行，返回 (应用条数, 拒绝条数)；被拒绝的更新记录在 errors 中"""
+        applied = rejected = 0
+        for number, line in enumerate(lines, start_line):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self.apply(json.loads(line))
+                applied += 1
+            except (DeltaError, json.JSONDecodeError) as e:
+                rejected += 1
+                message = str(e) if isinstance(e, DeltaError) else f"不是合法的 JSON（{e}）"
+                with self.lock:
+                    self.rejected += 1
+                    self.errors.append((number, message))
+        return applied, rejected
+
+    # --- 查询 ---
+
+    def _refresh(self):
+        """把有变化的目的地同步到只读快照、查询索引和缓存（调用方持有锁）"""
+        if self._snapshot is not None and not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        for j in dirty:
+            for direction in self._frozen:
+                self._frozen[direction][j] = FrozenDict(self._trips[direction][j])
+        snapshot = dict(self._base)
+        snapshot.update({direction: FrozenDict(by_dest) for direction, by_dest in self._frozen.items()})
+        self._snapshot = FrozenDict(snapshot)
+        if self._index is not None:
+            self._index.update(self._snapshot, dirty)
+        if dirty:
+            self._pairs = {key: pairs for key, pairs in self._pairs.items() if key[1] not in dirty}
+
+    def snapshot(self):
+        """当前数据的只读快照（结构与 load_dataset 的结果相同），可交给任意求解引擎"""
+        with self.lock:
+            self._refresh()
+            return self._snapshot
+
+    def query(self, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24, W_ret_start=72, W_ret_end=120,
+              limit=None):
+        """返回 (optimal_solutions, target_objective_value)，含义与 load_json_and_solve 相同
+
+        整数小时的时间窗口使用查询索引，其他窗口直接计算各目的地的最低票价。
+        参数相同且数据没有变化时直接返回上次的结果。
+        """
+        settings = (alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end, limit)
+        with self.lock:
+            cached = self._results.get(settings)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            self._refresh()
+            data = self._snapshot
+            windows = (W_out_start, W_out_end, W_ret_start, W_ret_end)
+            integral = all(float(w).is_integer() for w in windows)
+            if integral and self._index is None:
+                self._index = QueryIndex(data)
+
+            score = {j: self.params[j]['U'] - alpha * self.params[j]['D'] for j in self.destinations}
+            target_objective_value = None
+            tied = []
+            for j in sorted(self.destinations, key=lambda j: -score[j]):
+                if target_objective_value is not None and target_objective_value - score[j] >= TOL:
+                    break
+                if integral:
+                    feasible = self._index.min_cost(j, *windows) <= budget
+                else:
+                    feasible = cheapest_pair(destination_task(data, j, budget, *windows))[1] is not None
+                if feasible:
+                    if target_objective_value is None:
+                        target_objective_value = score[j]
+                    tied.append(j)
+
+            optimal_solutions = []
+            for j in self.destinations:
+                if j not in tied:
+                    continue
+                key = (settings[:6], j)
+                if key not in self._pairs:
+                    self._pairs[key] = feasible_pairs(destination_task(data, j, budget, *windows))[1]
+                for out, ret in self._pairs[key]:
+                    if limit is not None and len(optimal_solutions) >= limit:
+                        break
+                    optimal_solutions.append(pair_to_solution(j, out, ret, score[j]))
+            result = (optimal_solutions, target_objective_value)
+            self._results[settings] = (self.version, result)
+            if len(self._results) > 64:
+                self._results.pop(next(iter(self._results)))
+            return result
+
+
+def _trip_record(delta, old):
+    """由更新生成新的只读车次记录；old 为被修改的原记录（新增时为 None）"""
+    trip = {} if old is None else dict(old)  # 保留座位数、延误参数等其他字段
+    if FARES_KEY in delta:
+        fares = delta[FARES_KEY]
+        if not isinstance(fares, dict) or not fares or any(_number(v) is None or _number(v) < 0
+                                                          for v in fares.values()):
+            raise DeltaError(f"{FARES_KEY} 必须是非空的 {{席别: 非负票价}} 对象")
+        trip[FARES_KEY] = FrozenDict({c: _number(v) for c, v in fares.items()})
+        trip["cost"] = min(trip[FARES_KEY].values())  # 与数据校验一致：cost 取最便宜的席别
+    elif "cost" in delta:
+        trip.pop(FARES_KEY, None)  # 只给出 cost 的改价不再区分席别
+    for field in TRIP_FIELDS:
+        if field in delta and not (field == "cost" and FARES_KEY in delta):
+            value = _number(delta[field])
+            if value is None:
+                raise DeltaError(f"{field} 不是数字: {delta[field]!r}")
+            trip[field] = value
+    missing = [field for field in TRIP_FIELDS if field not in trip]
+    if missing:
+        raise DeltaError(f"新增车次缺少字段: {', '.join(missing)}")
+    if trip["arr_time"] < trip["dep_time"]:
+        raise DeltaError(f"到达时间 {trip['arr_time']} 早于发车时间 {trip['dep_time']}")
+    if trip["cost"] < 0:
+        raise DeltaError(f"票价不能为负: {trip['cost']}")
+    return FrozenDict(trip)
+
+
+class FeedReader(threading.Thread):
+    """后台线程：从文件或管道逐行读取更新并应用到 LiveDataset
+
+    follow 为 True 时读到文件末尾后继续等待新写入的行（类似 tail -f），直到 stop() 被调用。
+    """
+
+    def __init__(self, live, stream, follow=False, poll_interval=0.2):
+        super().__init__(daemon=True)
+        self.live = live
+        self.stream = stream
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self.lines = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        pending = ""
+        while not self._stop_event.is_set():
+            line = self.stream.readline()
+            if not line:
+                if not self.follow:
+                    break
+                self._stop_event.wait(self.poll_interval)
+                continue
+            if not line.endswith("\n") and self.follow:
+                pending += line  # 写入方还没写完这一行
+                continue
+            line, pending = pending + line, ""
+            self.lines += 1
+            self.live.apply_lines([line], self.lines)
+        if pending:
+            self.lines += 1
+            self.live.apply_lines([pending], self.lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把 JSONL 增量更新流应用到数据集，并持续输出最优解")
+    parser.add_argument("json_path", help="初始数据文件")
+    parser.add_argument("--feed", default="-", help="更新文件（- 为标准输入）")
+    parser.add_argument("--follow", action="store_true", help="读到文件末尾后继续等待新的更新")
+    parser.add_argument("--interval", type=float, default=1.0, help="输出最优解的间隔（秒）")
+    parser.add_argument("--origin", default=None, help="多出发地数据文件中的出发地")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--budget", type=float, default=1200)
+    parser.add_argument("--out-window", type=float, nargs=2, default=(0, 24), metavar=("START", "END"))
+    parser.add_argument("--ret-window", type=float, nargs=2, default=(72, 120), metavar=("START", "END"))
+    args = parser.parse_args()
+
+    data, report = load_dataset(args.json_path, origin=args.origin)
+    print_validation_report(report)
+    live = LiveDataset(data)
+    stream = sys.stdin if args.feed == "-" else open(args.feed, "r", encoding="utf-8")
+    reader = FeedReader(live, stream, follow=args.follow)
+    headers = ["目的地", "去程车次", "去程票价", "返程车次", "返程票价", "总交通成本", "停留时间(h)", "目标值"]
+    shown = None
+    start = time.perf_counter()
+
+    def report_result():
+        global shown
+        with live.lock:
+            version, applied, rejected = live.version, live.applied, live.rejected
+            errors = list(live.errors)
+            live.errors.clear()
+        for number, message in errors:
+            print(f"第 {number} 行的更新被拒绝：{message}")
+        if version == shown:
+            return
+        shown = version
+        solutions, objective = live.query(args.alpha, args.budget, *args.out_window, *args.ret_window)
+        elapsed = time.perf_counter() - start
+        print(f"\n[{time.strftime('%H:%M:%S')}] 已应用 {applied} 条更新（拒绝 {rejected} 条，"
+              f"{applied / max(elapsed, 1e-9):.0f} 条/秒）")
+        if objective is None:
+            print("未找到可行解。")
+            return
+        print(f"最优目标值 {objective}，{len(solutions)} 个最优解")
+        print_table([[sol['destination'], sol['outbound'][0], sol['outbound'][1], sol['return'][0],
+                      sol['return'][1], sol['cost'], sol['stay'], f"{sol['objective']:.2f}"]
+                     for sol in solutions], headers)
+
+    reader.start()
+    try:
+        while reader.is_alive():
+            reader.join(args.interval)
+            report_result()
+    except KeyboardInterrupt:
+        reader.stop()
+    report_result()
@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import pulp
+from edit_journal import atomic_write_json
+from solve_limits import parse_cbc_log
+from trip_store import trip_tuples
+
+# --- 已构建 MILP 模型的磁盘缓存 ---
+# 大数据集上 create_model() 用 Python 逐条构造约束（停留时间约束为 去程数 × 返程数 × 2 条），
+# 耗时往往超过 CBC 求解本身。模型结构只取决于车次和停留时间上下限，与 α、预算、时间窗口无关：
+#   预算      只出现在 Budget_Limit 的右端项；
+#   时间窗口  只出现在 OutWindow* / RetWindow* 的右端项（大 M 写法下每个车次都有这两条约束）；
+#   U、D、α   只出现在目标函数中 x[j] 的系数上。
+# 因此第一次求解时把模型写成 MPS 文件（变量、约束使用 PuLP 的规范化名称 X0000000 / C0000000），
+# 另存一个 JSON 记录 "规范化名称 -> (x/y/z, 目的地, 车次)" 以及各参数对应的约束行；
+# 之后（包括新进程中）按数据集哈希命中缓存时，直接在 MPS 文本上改写右端项和目标系数，
+# 逐个排除已找到的最优解时也只追加一行，再直接调用 CBC，不再构造任何 PuLP 对象。
+# 注意：启用车次预筛选时，剔除结果与预算、时间窗口有关，参数不同会得到不同的缓存条目。
+
+FORMAT_VERSION = 1
+CACHE_DIR = os.environ.get("OR_MODEL_CACHE",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), ".model_cache"))
+MAX_ENTRIES = 16  # 超出后删除最久未使用的条目
+
+# 约束名前缀 -> (对应的参数, 参数增加 1 时右端项的变化)
+# PuLP 把 "常数 >= W - M(1-y)" 规范化为 "M·y <= 常数 - W + M"，两种窗口约束的右端项都随 W 减小
+PARAM_ROWS = {
+    "Budget_Limit": ("budget", 1),
+    "OutWindowStart_": ("W_out_start", -1),
+    "OutWindowEnd_": ("W_out_end", -1),
+    "RetWindowStart_": ("W_ret_start", -1),
+    "RetWindowEnd_": ("W_ret_end", -1),
+}
+SETTING_NAMES = ("budget", "W_out_start", "W_out_end", "W_ret_start", "W_ret_end")
+
+
+def dataset_key(data, M):
+    """模型结构的哈希：车次、停留时间上下限和大 M（U、D 只影响目标系数，不参与哈希）"""
+    structure = {
+        "version": FORMAT_VERSION,
+        "M": M,
+        "destinations": list(data["destinations"]),
+        "stay": [[data["params"][j]['min_stay_hours'], data["params"][j]['max_stay_hours']]
+                 for j in data["destinations"]],
+        "outbound": {j: {t: [dep, arr, cost] for t, dep, arr, cost in trip_tuples(data["outbound_trips"].get(j, {}))}
+                     for j in data["destinations"]},
+        "return": {j: {t: [dep, arr, cost] for t, dep, arr, cost in trip_tuples(data["return_trips"].get(j, {}))}
+                   for j in data["destinations"]},
+    }
+    text = json.dumps(structure, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CompiledModel:
+    """从缓存的 MPS 文件载入的模型；只能修改参数、追加排除约束和求解"""
+
+    def __init__(self, mps_path, meta):
+        self.variables = {col: tuple(v) for col, v in meta["variables"].items()}  # 列名 -> (kind, j, trip)
+        self.columns = {v: col for col, v in self.variables.items()}
+        self.x_columns = {v[1]: col for col, v in self.variables.items() if v[0] == "x"}
+        self.param_rows = meta["param_rows"]  # 行名 -> [参数, 系数]
+        self.built_with = meta["built_with"]
+        self._parse(mps_path)
+        self._extra_rows = []
+        self._extra_entries = {}  # 列名 -> 追加的系数行
+        self._extra_rhs = []
+        self._objective = {}
+        self._settings = dict(self.built_with)
+
+    def _parse(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        section = None
+        self._rows = []
+        self._columns = []  # [列名, 不含目标系数的文本, 是否整数]
+        self._rhs = {}
+        self._bounds = []
+        current = None
+        integer = False
+        for line in lines:
+            if not line.startswith(" "):
+                section = line.split()[0] if line.strip() else section
+                continue
+            if section == "ROWS":
+                if not line.startswith(" N "):
+                    self._rows.append(line)
+            elif section == "COLUMNS":
+                parts = line.split()
+                if parts[1] == "'MARKER'":
+                    integer = parts[2] == "'INTORG'"
+                    current = None
+                    continue
+                if current is None or current[0] != parts[0]:
+                    current = [parts[0], [], integer]
+                    self._columns.append(current)
+                if parts[1] != "OBJ":
+                    current[1].append(line)
+            elif section == "RHS":
+                parts = line.split()
+                self._rhs[parts[1]] = float(parts[2])
+            elif section == "BOUNDS":
+                self._bounds.append(line)
+        for column in self._columns:
+            column[1] = "".join(column[1])
+        # 与参数无关的右端项只格式化一次
+        self._static_rhs = "".join("    RHS       %-8s  % .12e\n" % (row, value)
+                                   for row, value in self._rhs.items() if row not in self.param_rows)
+
+    def set_parameters(self, params, alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end):
+        """改写目标系数 U - α·D 和预算 / 时间窗口对应的右端项"""
+        self._objective = {col: params[j]['U'] - alpha * params[j]['D'] for j, col in self.x_columns.items()}
+        self._settings = dict(zip(SETTING_NAMES, (budget, W_out_start, W_out_end, W_ret_start, W_ret_end)))
+
+    def exclude(self, chosen):
+        """追加约束：chosen 中的变量（solve() 返回的 (kind, j, trip)）不能同时取 1"""
+        row = "E%07d" % len(self._extra_rows)
+        self._extra_rows.append(" L  %s\n" % row)
+        for var in chosen:
+            col = self.columns[var]
+            self._extra_entries.setdefault(col, []).append("    %-8s  %-8s  % .12e\n" % (col, row, 1))
+        self._extra_rhs.append("    RHS       %-8s  % .12e\n" % (row, len(chosen) - 1))
+
+    def _rhs_text(self):
+        lines = []
+        for row, (name, sign) in self.param_rows.items():
+            value = self._rhs[row] + sign * (self._settings[name] - self.built_with[name])
+            lines.append("    RHS       %-8s  % .12e\n" % (row, value))
+        return self._static_rhs + "".join(lines) + "".join(self._extra_rhs)
+
+    def write_mps(self, path):
+        parts = ["*SENSE:Maximize\nNAME          MODEL\nROWS\n N  OBJ\n"]
+        parts.extend(self._rows)
+        parts.extend(self._extra_rows)
+        parts.append("COLUMNS\n")
+        for col, body, is_int in self._columns:
+            if is_int:
+                parts.append("    MARK      'MARKER'                 'INTORG'\n")
+            parts.append(body)
+            if col in self._extra_entries:
+                parts.extend(self._extra_entries[col])
+            coef = self._objective.get(col, 0)
+            if coef != 0:
+                parts.append("    %-8s  %-8s  % .12e\n" % (col, "OBJ", coef))
+            if is_int:
+                parts.append("    MARK      'MARKER'                 'INTEND'\n")
+        parts.append("RHS\n")
+        parts.append(self._rhs_text())
+        parts.append("BOUNDS\n")
+        parts.extend(self._bounds)
+        parts.append("ENDATA\n")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(parts))
+
+    def solve(self, msg=0, budget=None):
+        """返回 (状态, 目标值, [取值为 1 的 (kind, j, trip), ...], 日志汇总)
+
+        状态与 pulp.LpStatus 相同；budget 为 SolveBudget 时按剩余时间和节点上限调用 CBC，
+        日志汇总见 solve_limits.parse_cbc_log，另有 'proven' 表示是否已证明最优。
+        """
+        solver = pulp.PULP_CBC_CMD(msg=msg)
+        with tempfile.TemporaryDirectory() as tmp:
+            mps_path = os.path.join(tmp, "model.mps")
+            sol_path = os.path.join(tmp, "model.sol")
+            self.write_mps(mps_path)
+            limits = budget.cbc_args() if budget is not None else []
+            result = subprocess.run([solver.path, mps_path, "-max"] + limits +
+                                    ["-solve", "-printingOptions", "all", "-solution", sol_path],
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                    text=True, check=True)
+            if msg:
+                print(result.stdout)
+            if not os.path.exists(sol_path):
+                raise pulp.PulpSolverError(f"CBC 未生成解文件：{solver.path}")
+            status, sol_status = solver.get_status(sol_path)
+            status = pulp.LpStatus[status]
+            log = parse_cbc_log(result.stdout)
+            log['proven'] = sol_status == pulp.LpSolutionOptimal
+            chosen = []
+            objective = 0.0
+            if status == 'Optimal':
+                with open(sol_path, "r") as f:
+                    next(f)
+                    for line in f:
+                        parts = line.split()
+                        if parts and parts[0] == "**":
+                            parts = parts[1:]
+                        if len(parts) < 3 or parts[1] not in self.variables:
+                            continue
+                        if float(parts[2]) > 0.9:
+                            chosen.append(self.variables[parts[1]])
+                            objective += self._objective.get(parts[1], 0)
+        return status, objective, chosen, log
+
+
+def _paths(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.mps"), os.path.join(cache_dir, f"{key}.json")
+
+
+def _prune(cache_dir, keep):
+    entries = sorted((os.path.getmtime(os.path.join(cache_dir, name)), name[:-5])
+                     for name in os.listdir(cache_dir) if name.endswith(".json"))
+    for _, key in entries[:max(0, len(entries) - keep)]:
+        for path in _paths(cache_dir, key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def save_model(prob, x, y, z, settings, mps_path, meta_path):
+    """把 PuLP 模型写成 MPS + 变量 / 参数行映射（元数据最后写入，存在即表示条目完整）"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(mps_path), suffix=".mps.tmp")
+    os.close(fd)
+    try:
+        _, var_names, row_names, _ = prob.writeMPS(tmp, rename=1)
+        os.replace(tmp, mps_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    variables = {var_names[x[j].name]: ["x", j, None] for j in x}
+    variables.update({var_names[v.name]: ["y", j, t] for (j, t), v in y.items()})
+    variables.update({var_names[v.name]: ["z", j, t] for (j, t), v in z.items()})
+    param_rows = {}
+    for name, row in row_names.items():
+        for prefix, (param, sign) in PARAM_ROWS.items():
+            if name.startswith(prefix):
+                param_rows[row] = [param, sign]
+                break
+    meta = {"version": FORMAT_VERSION, "variables": variables, "param_rows": param_rows,
+            "built_with": {name: settings[name] for name in SETTING_NAMES}}
+    atomic_write_json(meta_path, meta)
+    return meta
+
+
+def compiled_model(data, build, settings, M=10000, cache_dir=CACHE_DIR):
+    """返回 (CompiledModel, 是否命中缓存)
+
+    build() 返回 (prob, x, y, z)，只在未命中时调用；settings 为构建时使用的
+    {'budget', 'W_out_start', ...}，用于之后换算右端项。
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = dataset_key(data, M)
+    mps_path, meta_path = _paths(cache_dir, key)
+    meta = None
+    if os.path.exists(meta_path) and os.path.exists(mps_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except ValueError:
+            meta = None
+        if meta is not None and meta.get("version") != FORMAT_VERSION:
+            meta = None
+    hit = meta is not None
+    if hit:
+        os.utime(meta_path)
+    else:
+        prob, x, y, z = build()
+        meta = save_model(prob, x, y, z, settings, mps_path, meta_path)
+        _prune(cache_dir, MAX_ENTRIES)
+    return CompiledModel(mps_path, meta), hit
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """删除全部缓存条目，返回删除的文件数"""
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith((".mps", ".json", ".tmp")):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    # python model_cache.py --clear      清空缓存
+    # python model_cache.py [数据文件]    预先构建并缓存模型（批量任务开始前运行一次）
+    if "--clear" in sys.argv[1:]:
+        print(f"已删除 {clear_cache()} 个缓存文件（{CACHE_DIR}）")
+        sys.exit(0)
+    import OR
+    path = sys.argv[1] if len(sys.argv) > 1 else "edited_travel_data.json"
+    start = time.perf_counter()
+    OR.load_json_and_solve(path, model_cache=CACHE_DIR)
+    print(f"\n总耗时 {time.perf_counter() - start:.2f}s，缓存目录 {CACHE_DIR}")
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections.abc import Mapping
+from decomposed_solve import cheapest_pair, feasible_pairs, pair_to_solution, _make_executor, M, TOL
+from dataset_validator import (validate_dataset, FrozenDict, load_validated, print_validation_report, DatasetError,
+                               FARES_KEY, SEATS_KEY)
+from trip_store import TripStore, DestTripsView
+from result_export import print_table
+
+# --- 多出发地数据集 ---
+# 原数据格式隐含一个出发站（data2.json 中车次编号都带 _HZ 后缀），其他城市出发需要各自一份文件。
+# 多出发地格式在车次上增加一层出发地：
+#   {"origins": ["杭州", "上海"], "destinations": [...], "params": {...},
+#    "outbound_trips": {"杭州": {目的地: {车次: {...}}}, "上海": {...}},
+#    "return_trips":   {"杭州": {...}, "上海": {...}}}
+# 目的地参数（U、D、停留时间）由各出发地共用。全部车次按方向存入一个 TripStore，
+# 以 (出发地, 目的地) 为分段键；origin(o) 返回与单出发地数据集结构相同的只读视图，
+# 车次直接引用共享的列存储，不复制数据，现有的求解引擎可以直接使用。
+# solve_all_origins 对全部出发地一起求解：目标值排序只算一次，全部 (出发地, 目的地) 的
+# 可行性判断放进同一个进程池，车次按时间窗口的筛选直接读取列数组。
+
+ORIGINS_KEY = "origins"
+# 一次求解全部出发地时只读取发车、到达时间和票价列，不处理以下车次字段；多出发地文件中出现时作为错误报告
+UNSUPPORTED_TRIP_FIELDS = (FARES_KEY, SEATS_KEY, "delay_prob", "delay_mean")
+
+
+class OriginTripsView(Mapping):
+    """某个出发地某个方向的车次视图：{目的地: DestTripsView}"""
+    __slots__ = ("_store", "_origin", "_destinations")
+
+    def __init__(self, store, origin, destinations):
+        self._store = store
+        self._origin = origin
+        self._destinations = [j for j in destinations if (origin, j) in store.dest_index]
+
+    def __getitem__(self, j):
+        if (self._origin, j) not in self._store.dest_index:
+            raise KeyError(j)
+        return DestTripsView(self._store, (self._origin, j))
+
+    def __iter__(self):
+        return iter(self._destinations)
+
+    def __len__(self):
+        return len(self._destinations)
+
+
+class MultiOriginDataset:
+    """已校验的多出发地数据集"""
+
+    def __init__(self, origins, destinations, params, out_store, ret_store):
+        self.origins = tuple(origins)
+        self.destinations = tuple(destinations)
+        self.params = params
+        self.out_store = out_store
+        self.ret_store = ret_store
+        self._views = {}
+
+    def origin(self, o):
+        """出发地 o 的数据集视图（与 load_dataset 返回的结构相同）；同一出发地总是返回同一个对象"""
+        if o not in self.origins:
+            raise KeyError(o)
+        view = self._views.get(o)
+        if view is None:
+            view = FrozenDict(origin=o, destinations=self.destinations, params=self.params,
+                              outbound_trips=OriginTripsView(self.out_store, o, self.destinations),
+                              return_trips=OriginTripsView(self.ret_store, o, self.destinations))
+            self._views[o] = view
+        return view
+
+    def task(self, o, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end):
+        """与 decomposed_solve.destination_task 相同的任务元组，直接从列数组筛选车次"""
+        p = self.params[j]
+        return ((o, j), _window_rows(self.out_store, (o, j), W_out_start, W_out_end, key_index=2),
+                _window_rows(self.ret_store, (o, j), W_ret_start, W_ret_end, key_index=1),
+                p['min_stay_hours'], p['max_stay_hours'], budget)
+
+
+def _window_rows(store, key, start, end, key_index):
+    if key not in store.dest_index:
+        return []
+    rows = [t for t in store.trip_tuples(key) if start <= t[1] <= end]
+    rows.sort(key=lambda t: t[key_index])
+    return rows
+
+
+def _unsupported_fields(normalized):
+    """{字段: [出现位置, ...]}：各出发地规范化后的车次中，多出发地求解不读取的字段"""
+    found = {}
+    for o, data in normalized.items():
+        if data is None:
+            continue
+        for direction, name in (("outbound_trips", "去程"), ("return_trips", "返程")):
+            for j, trips in data[direction].items():
+                for tid, info in trips.items():
+                    for field in UNSUPPORTED_TRIP_FIELDS:
+                        if field in info:
+                            found.setdefault(field, []).append(f"出发地 '{o}' 目的地 '{j}' {name}车次 '{tid}'")
+    return found
+
+
+def validate_multi_origin(raw, stay_defaults=(0, M)):
+    """校验多出发地数据，返回 (MultiOriginDataset 或 None, 报告)
+
+    每个出发地按单出发地格式校验；各出发地都出现的相同问题（如目的地参数错误）只报告一次，
+    其余问题前面标明出发地。
+    """
+    errors, warnings = [], []
+    origins = raw.get(ORIGINS_KEY)
+    if not isinstance(origins, list) or not origins or not all(isinstance(o, str) for o in origins):
+        return None, {'errors': ["origins 必须是非空的出发地名称列表"], 'warnings': warnings}
+    if len(set(origins)) != len(origins):
+        warnings.append("origins 中有重复的出发地，只保留一次")
+        origins = list(dict.fromkeys(origins))
+    for key in ("outbound_trips", "return_trips"):
+        if not isinstance(raw.get(key), dict):
+            return None, {'errors': [f"{key} 必须是 {{出发地: {{目的地: {{车次: ...}}}}}} 形式的对象"],
+                          'warnings': warnings}
+        extra = [o for o in raw[key] if o not in origins]
+        if extra:
+            warnings.append(f"{key} 中的出发地不在 origins 列表中，已忽略: {', '.join(map(str, extra))}")
+
+    normalized = {}
+    seen = {'errors': {}, 'warnings': {}}  # 消息 -> 出现该消息的出发地
+    for o in origins:
+        single = {"destinations": raw.get("destinations"), "params": raw.get("params"),
+                  "outbound_trips": raw["outbound_trips"].get(o, {}), "return_trips": raw["return_trips"].get(o, {})}
+        normalized[o], report = validate_dataset(single, stay_defaults)
+        for kind in seen:
+            for message in report[kind]:
+                seen[kind].setdefault(message, []).append(o)
+    for kind, target in (('errors', errors), ('warnings', warnings)):
+        for message, where in seen[kind].items():
+            target.append(message if len(where) == len(origins) else f"[出发地 {', '.join(where)}] {message}")
+    for field, where in _unsupported_fields(normalized).items():
+        errors.append(f"多出发地数据文件不支持车次字段 {field}（共 {len(where)} 个车次，如 {where[0]}），"
+                      f"请删除该字段或按出发地拆分为单出发地文件")
+    report = {'errors': errors, 'warnings': warnings}
+    if errors:
+        return None, report
+
+    first = normalized[origins[0]]
+    keys = [(o, j) for o in origins for j in first["destinations"]]
+    stores = [TripStore.from_trip_dicts(keys, {(o, j): normalized[o][direction].get(j, {}) for o, j in keys})
+              for direction in ("outbound_trips", "return_trips")]
+    return MultiOriginDataset(origins, first["destinations"], first["params"], *stores), report
+
+
+def load_multi_origin(path, stay_defaults=(0, M)):
+    """读取多出发地数据文件，返回 (MultiOriginDataset, 报告)；与 load_dataset 共用缓存"""
+    dataset, report = load_validated(path, stay_defaults)
+    if getattr(dataset, "origins", None) is None:
+        raise DatasetError(path, {'errors': [f"{path} 不是多出发地数据文件（缺少 {ORIGINS_KEY}）"], 'warnings': []})
+    return dataset, report
+
+
+def merge_origin_files(files):
+    """把多个单出发地数据文件合并为多出发地格式；files 为 {出发地: 路径}，目的地参数取第一个文件"""
+    merged = {ORIGINS_KEY: list(files), "destinations": [], "params": {}, "outbound_trips": {}, "return_trips": {}}
+    for o, path in files.items():
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        for j in raw["destinations"]:
+            if j not in merged["params"]:
+                merged["destinations"].append(j)
+                merged["params"][j] = raw["params"].get(j)
+            elif raw["params"].get(j) != merged["params"][j]:
+                print(f"警告：{path} 中目的地 '{j}' 的参数与之前的文件不同，使用第一个文件中的参数")
+        merged["outbound_trips"][o] = raw["outbound_trips"]
+        merged["return_trips"][o] = raw["return_trips"]
+    return merged
+
+
+def solve_all_origins(dataset, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24, W_ret_start=72,
+                      W_ret_end=120, workers=None, executor="process"):
+    """对每个出发地求解，返回 {出发地: (optimal_solutions, target_objective_value)}
+
+    各出发地共用目标值排序，全部 (出发地, 目的地) 任务在同一个进程池中计算；executor 为 None 时串行。
+    """
+    params = dataset.params
+    score = {j: params[j]['U'] - alpha * params[j]['D'] for j in dataset.destinations}
+    tasks = [dataset.task(o, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+             for o in dataset.origins for j in dataset.destinations]
+    if executor is None or len(tasks) <= 1:
+        pool = None
+        map_fn = map
+    else:
+        pool = _make_executor(executor, workers or os.cpu_count())
+        chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count())))
+        map_fn = lambda fn, items: pool.map(fn, items, chunksize=chunksize)
+
+    try:
+        feasible = {o: [] for o in dataset.origins}
+        for (o, j), best in map_fn(cheapest_pair, tasks):
+            if best is not None:
+                feasible[o].append(j)
+        targets = {o: max((score[j] for j in js), default=None) for o, js in feasible.items()}
+        tied_tasks = [task for task in tasks if task[0][1] in feasible[task[0][0]]
+                      and abs(score[task[0][1]] - targets[task[0][0]]) < TOL]
+        results = {o: ([], targets[o]) for o in dataset.origins}
+        for (o, j), pairs in map_fn(feasible_pairs, tied_tasks):
+            results[o][0].extend(pair_to_solution(j, out, ret, score[j]) for out, ret in pairs)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多出发地数据：批量求解或合并单出发地文件")
+    parser.add_argument("json_path", help="多出发地数据文件（--merge 时为输出文件）")
+    parser.add_argument("--merge", nargs="+", metavar="出发地=文件", help="把单出发地文件合并为多出发地格式")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--serial", action="store_true", help="不使用进程池")
+    args = parser.parse_args()
+
+    if args.merge:
+        files = dict(item.split("=", 1) for item in args.merge)
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(merge_origin_files(files), f, ensure_ascii=False, indent=2)
+        print(f"已合并 {len(files)} 个出发地到 {args.json_path}")
+        sys.exit(0)
+
+    dataset, report = load_multi_origin(args.json_path)
+    print_validation_report(report)
+    start = time.perf_counter()
+    results = solve_all_origins(dataset, workers=args.workers, executor=None if args.serial else "process")
+    print(f"{len(dataset.origins)} 个出发地求解耗时 {time.perf_counter() - start:.3f}s")
+    headers = ["出发地", "目的地", "去程车次", "返程车次", "总交通成本", "停留时间(h)", "目标值"]
+    table = []
+    for o, (solutions, objective) in results.items():
+        if objective is None:
+            table.append([o, "-", "-", "-", "-", "-", "无可行解"])
+        table.extend([o, sol['destination'], sol['outbound'][0], sol['return'][0], sol['cost'], sol['stay'],
+                      f"{sol['objective']:.2f}"] for sol in solutions)
+    print_table(table, headers)
@@ -0,0 +1,109 @@
+import sys
+from bisect import bisect_left, bisect_right
+from decomposed_solve import destination_task, pair_to_solution, TOL
+from result_export import print_table
+from dataset_validator import load_dataset
+
+# --- 效用 / 交通成本 / 停留时间 的 Pareto 前沿 ---
+# 返回在 (U - α·D 越大越好, 总票价越低越好, 停留时间越长越好) 三个指标上互不支配的全部方案，
+# 不需要反复修改预算和 α 重新求解，也不做多次 ε-约束 MILP。
+#   1. 目的地内部：去程按到达时间排序后，可搭配的返程是按发车时间排序的一段区间 [lo, hi)，
+#      停留时间随返程下标递增。区间内不被支配的返程只可能是从 hi-1 出发、沿 "之前最近的不更贵的返程"
+#      链向前走到的那些（票价逐个不增），链用单调栈一次预处理，因此不需要枚举全部组合。
+#      所有去程的候选再做一次 (票价, 停留) 二维天际线。
+#   2. 目的地之间：按目标值从高到低分组扫描（相差小于 TOL 视为同一组），用树状数组维护
+#      "已扫描的更高目标值方案中，票价不超过 c 的最长停留"，被其覆盖的方案即被支配。
+
+
+def _skyline_2d(points):
+    """points 为 (cost, stay, ...)，返回票价更低 / 停留更长意义下不被支配的点（完全相同的点都保留）"""
+    kept = []
+    best_stay = best_cost = None
+    for p in sorted(points, key=lambda p: (p[0], -p[1])):
+        if best_stay is None or p[1] > best_stay:
+            best_stay, best_cost = p[1], p[0]
+            kept.append(p)
+        elif p[1] == best_stay and p[0] == best_cost:
+            kept.append(p)
+    return kept
+
+
+def destination_skyline(task):
+    """返回 (目的地, [(总票价, 停留时间, 去程, 返程), ...])：目的地内部的二维天际线"""
+    j, outs, rets, min_stay, max_stay, budget = task
+    ret_deps = [t[1] for t in rets]
+    # prev_cheaper[i]：i 之前最近的票价不高于 rets[i] 的返程下标，没有时为 -1
+    prev_cheaper = []
+    stack = []
+    for i, ret in enumerate(rets):
+        while stack and rets[stack[-1]][3] > ret[3]:
+            stack.pop()
+        prev_cheaper.append(stack[-1] if stack else -1)
+        stack.append(i)
+
+    candidates = []
+    for out in outs:
+        lo = bisect_left(ret_deps, out[2] + min_stay)
+        hi = bisect_right(ret_deps, out[2] + max_stay)
+        limit = budget - out[3]
+        i = hi - 1
+        while i >= lo:
+            ret = rets[i]
+            if ret[3] <= limit:
+                candidates.append((out[3] + ret[3], ret[1] - out[2], out, ret))
+            i = prev_cheaper[i]
+    return j, _skyline_2d(candidates)
+
+
+def pareto_frontier(data, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24,
+                    W_ret_start=72, W_ret_end=120):
+    """返回 Pareto 前沿上的全部方案（与 load_json_and_solve 相同的解结构），按目标值降序、票价升序排列"""
+    destinations = data["destinations"]
+    params = data["params"]
+    score = {j: params[j]['U'] - alpha * params[j]['D'] for j in destinations}
+    skylines = dict(destination_skyline(destination_task(data, j, budget, W_out_start, W_out_end,
+                                                         W_ret_start, W_ret_end))
+                    for j in destinations)
+
+    costs = sorted({p[0] for points in skylines.values() for p in points})
+    rank = {c: i + 1 for i, c in enumerate(costs)}
+    tree = [float('-inf')] * (len(costs) + 1)  # 前缀最大停留时间
+
+    order = sorted((j for j in destinations if skylines[j]), key=lambda j: -score[j])
+    frontier = []
+    k = 0
+    while k < len(order):
+        # 目标值相同（相差小于 TOL）的目的地之间只比较票价和停留
+        group = [order[k]]
+        k += 1
+        while k < len(order) and score[group[0]] - score[order[k]] < TOL:
+            group.append(order[k])
+            k += 1
+        points = _skyline_2d([p + (j,) for j in group for p in skylines[j]])
+        kept = []
+        for p in points:
+            i, best = rank[p[0]], float('-inf')
+            while i > 0:
+                best = max(best, tree[i])
+                i -= i & -i
+            if best < p[1]:
+                kept.append(p)
+        for p in kept:
+            i = rank[p[0]]
+            while i < len(tree):
+                tree[i] = max(tree[i], p[1])
+                i += i & -i
+            frontier.append(pair_to_solution(p[4], p[2], p[3], score[p[4]]))
+    frontier.sort(key=lambda sol: (-sol['objective'], sol['cost'], -sol['stay']))
+    return frontier
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "edited_travel_data.json"
+    data, _ = load_dataset(path)
+    frontier = pareto_frontier(data)
+    headers = ["目的地", "去程车次", "返程车次", "总交通成本", "停留时间(h)", "目标值"]
+    table = [[sol['destination'], sol['outbound'][0], sol['return'][0], sol['cost'], sol['stay'],
+              f"{sol['objective']:.2f}"] for sol in frontier]
+    print(f"Pareto 前沿共 {len(frontier)} 个方案")
+    print_table(table, headers)
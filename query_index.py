@@ -0,0 +1,167 @@
+import math
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from decomposed_solve import destination_task, iter_feasible_pairs, pair_to_solution, TOL
+from trip_store import trip_tuples
+
+# --- 参数实时查询索引（结果窗口滑块使用） ---
+# 每个数据集只构建一次，之后任意 (α, 预算, 出发窗口, 返程窗口) 的查询都不需要调用 CBC。
+# 时间窗口按整数小时取值（与界面一致）。把车次的发车时间映射为桶：整点 h 记为 2h，(h, h+1) 内记为 2h+1，
+# 则 "h_a <= 发车 <= h_b" 恰好等价于 "桶号在 [2h_a, 2h_b] 内"。对每个目的地：
+#   行 = 一个去程桶，列 = 一个返程桶，单元格 = 该去程桶与该返程桶之间满足停留时间约束的组合的最低总票价；
+#   每行一张稀疏表，窗口查询 = 对去程桶区间内的各行做 O(1) 区间最小值。
+# 查询时按目标值 U - α·D 从高到低检查目的地，第一个（及并列的）最低票价不超过预算的目的地即最优，
+# 之后只对这些目的地枚举全部可行组合，结果与 MILP / 分解求解相同。
+
+INF = float('inf')
+
+
+def time_key(t):
+    """发车时间所在的桶号"""
+    floor = math.floor(t)
+    return 2 * floor if t == floor else 2 * floor + 1
+
+
+class _RowMin:
+    """一行的静态区间最小值查询（稀疏表，array('d') 存储）"""
+    __slots__ = ("levels",)
+
+    def __init__(self, values):
+        self.levels = [array('d', values)]
+        k = 1
+        while 2 * k <= len(values):
+            prev = self.levels[-1]
+            self.levels.append(array('d', map(min, prev[:len(prev) - k], prev[k:])))
+            k *= 2
+
+    def query(self, lo, hi):
+        if lo >= hi:
+            return INF
+        level = (hi - lo).bit_length() - 1
+        row = self.levels[level]
+        return min(row[lo], row[hi - (1 << level)])
+
+
+class _DestinationIndex:
+    __slots__ = ("out_keys", "ret_keys", "rows")
+
+    def __init__(self, out_trips, ret_trips, min_stay, max_stay):
+        rets = sorted((dep, cost) for _, dep, _, cost in trip_tuples(ret_trips))
+        ret_deps = [dep for dep, _ in rets]
+        ret_bucket = [time_key(dep) for dep in ret_deps]
+        self.ret_keys = sorted(set(ret_bucket))
+        column = {key: k for k, key in enumerate(self.ret_keys)}
+        ret_column = [column[key] for key in ret_bucket]
+
+        groups = {}
+        for _, dep, arr, cost in trip_tuples(out_trips):
+            lo = bisect_left(ret_deps, arr + min_stay)
+            hi = bisect_right(ret_deps, arr + max_stay)
+            if lo < hi:
+                groups.setdefault(time_key(dep), []).append((cost, lo, hi))
+        self.out_keys = sorted(groups)
+        self.rows = []
+        n = len(rets)
+        for key in self.out_keys:
+            # 按去程票价从低到高 "涂色"：每个返程只记录第一个（最便宜的）能搭配的去程，并查集跳过已涂色的位置
+            best = [INF] * n
+            parent = list(range(n + 1))
+            for cost, lo, hi in sorted(groups[key]):
+                i = lo
+                while True:
+                    root = i
+                    while parent[root] != root:
+                        root = parent[root]
+                    while parent[i] != root:
+                        parent[i], i = root, parent[i]
+                    i = root
+                    if i >= hi:
+                        break
+                    best[i] = cost
+                    parent[i] = i + 1
+            cells = [INF] * len(self.ret_keys)
+            for k in range(n):
+                if best[k] < INF:
+                    total = best[k] + rets[k][1]
+                    if total < cells[ret_column[k]]:
+                        cells[ret_column[k]] = total
+            self.rows.append(_RowMin(cells))
+
+    def min_cost(self, W_out_start, W_out_end, W_ret_start, W_ret_end):
+        """窗口内可行组合的最低总票价，没有时为 inf"""
+        r_lo = bisect_left(self.ret_keys, 2 * W_ret_start)
+        r_hi = bisect_right(self.ret_keys, 2 * W_ret_end)
+        if r_lo >= r_hi:
+            return INF
+        o_lo = bisect_left(self.out_keys, 2 * W_out_start)
+        o_hi = bisect_right(self.out_keys, 2 * W_out_end)
+        return min((self.rows[i].query(r_lo, r_hi) for i in range(o_lo, o_hi)), default=INF)
+
+
+class QueryIndex:
+    """数据集的参数查询索引"""
+
+    def __init__(self, data):
+        self.data = data
+        self.destinations = list(data["destinations"])
+        self.params = data["params"]
+        self._index = {}
+        for j in self.destinations:
+            self._build(j)
+
+    def _build(self, j):
+        p = self.params[j]
+        self._index[j] = _DestinationIndex(self.data["outbound_trips"].get(j, {}),
+                                           self.data["return_trips"].get(j, {}),
+                                           p['min_stay_hours'], p['max_stay_hours'])
+
+    def update(self, data, destinations):
+        """数据集中只有 destinations 的车次有变化时，只重建这些目的地的索引"""
+        self.data = data
+        for j in destinations:
+            self._build(j)
+
+    def min_cost(self, j, W_out_start, W_out_end, W_ret_start, W_ret_end):
+        return self._index[j].min_cost(W_out_start, W_out_end, W_ret_start, W_ret_end)
+
+    def query(self, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24, W_ret_start=72, W_ret_end=120,
+              limit=None):
+        """返回 (optimal_solutions, target_objective_value)，含义与 load_json_and_solve 相同
+
+        时间窗口应为整数小时；limit 限制枚举的并列最优组合数（None 为不限）。
+        """
+        score = {j: self.params[j]['U'] - alpha * self.params[j]['D'] for j in self.destinations}
+        target_objective_value = None
+        tied = []
+        for j in sorted(self.destinations, key=lambda j: -score[j]):
+            if target_objective_value is not None and target_objective_value - score[j] >= TOL:
+                break
+            if self._index[j].min_cost(W_out_start, W_out_end, W_ret_start, W_ret_end) <= budget:
+                if target_objective_value is None:
+                    target_objective_value = score[j]
+                tied.append(j)
+        optimal_solutions = []
+        for j in self.destinations:
+            if j not in tied:
+                continue
+            task = destination_task(self.data, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+            for out, ret in iter_feasible_pairs(task):
+                if limit is not None and len(optimal_solutions) >= limit:
+                    return optimal_solutions, target_objective_value
+                optimal_solutions.append(pair_to_solution(j, out, ret, score[j]))
+        return optimal_solutions, target_objective_value
+
+
+if __name__ == "__main__":
+    from dataset_validator import load_dataset
+    path = sys.argv[1] if len(sys.argv) > 1 else "edited_travel_data.json"
+    data, _ = load_dataset(path)
+    start = time.perf_counter()
+    index = QueryIndex(data)
+    print(f"索引构建耗时 {time.perf_counter() - start:.3f}s")
+    start = time.perf_counter()
+    solutions, objective = index.query()
+    print(f"默认参数查询耗时 {(time.perf_counter() - start) * 1000:.2f}ms，最优目标值 {objective}，"
+          f"{len(solutions)} 个最优解")
@@ -0,0 +1,360 @@
+import argparse
+import ast
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import OR
+from dataset_validator import validate_dataset
+from decomposed_solve import decomposed_solve, best_first_solve
+from pareto_frontier import pareto_frontier
+from query_index import QueryIndex
+
+# --- 回归检查：最优解集合 + 性能基线 ---
+# 1. 正确性：对仓库自带的三份数据（data2.json、edited_travel_data.json、example.py 中的内置数据），
+#    每个已注册的求解引擎都必须得到与 regression/golden/<名称>.json 完全相同的最优目标值和最优解集合
+#    （按 目的地/去程/返程 排序后比较）。新增引擎只需在 ENGINES 中登记一个函数。
+# 2. 专项检查：针对已修复问题构造的小数据（CASES），每项返回 None 表示通过，否则返回问题说明。
+# 3. 性能：在固定随机种子生成的大规模数据上计时各个阶段，与 regression/baseline.json 比较，
+#    超过 基线 × threshold（且超出量大于 MIN_SLACK 秒，避免毫秒级计时抖动误报）即判为退化。
+# 用法：
+#   python regression_check.py                    # 检查正确性和性能
+#   python regression_check.py --skip-bench       # 只检查正确性
+#   python regression_check.py --update-golden    # 用 MILP 重新生成标准答案（确认模型改动无误后再用）
+#   python regression_check.py --update-baseline  # 在当前机器上重新记录性能基线
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(HERE, "regression", "golden")
+BASELINE_PATH = os.path.join(HERE, "regression", "baseline.json")
+SETTINGS = {"alpha": 1.0, "budget": 1200, "W_out_start": 0, "W_out_end": 24, "W_ret_start": 72, "W_ret_end": 120}
+MIN_SLACK = 0.05  # 秒
+
+
+# --- 数据 ---
+def load_example_data():
+    """不执行 example.py（它在导入时就会求解），直接从源码中取出数据字面量"""
+    with open(os.path.join(HERE, "example.py"), "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                values[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass
+    params = {j: dict(p, min_stay_hours=values["min_stay"], max_stay_hours=values["max_stay"])
+              for j, p in values["params"].items()}
+    return {"destinations": values["destinations"], "params": params,
+            "outbound_trips": values["outbound_trips"], "return_trips": values["return_trips"]}
+
+
+def load_json_file(name):
+    with open(os.path.join(HERE, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+FIXTURES = {
+    "data2": lambda: load_json_file("data2.json"),
+    "edited_travel_data": lambda: load_json_file("edited_travel_data.json"),
+    "example": load_example_data,
+}
+
+
+def generate_instance(n_dest, n_trips, seed):
+    """生成大规模测试数据：U/D 取连续值，避免出现海量并列最优解"""
+    rng = random.Random(seed)
+    dests = [f"D{i}" for i in range(n_dest)]
+    data = {"destinations": dests, "params": {}, "outbound_trips": {}, "return_trips": {}}
+    for j in dests:
+        data["params"][j] = {"U": rng.uniform(5, 9), "D": rng.uniform(2, 4), "min_stay_hours": 48,
+                             "max_stay_hours": 72}
+        data["outbound_trips"][j] = {}
+        data["return_trips"][j] = {}
+        for i in range(n_trips):
+            dep = round(rng.uniform(0, 30), 1)
+            data["outbound_trips"][j][f"{j}o{i}"] = {"dep_time": dep, "arr_time": round(dep + rng.uniform(1, 6), 1),
+                                                     "cost": rng.randint(100, 900)}
+            dep = round(rng.uniform(60, 130), 1)
+            data["return_trips"][j][f"{j}r{i}"] = {"dep_time": dep, "arr_time": round(dep + rng.uniform(1, 6), 1),
+                                                   "cost": rng.randint(100, 900)}
+    return data
+
+
+# --- 求解引擎：输入数据，输出 (最优目标值, [(目的地, 去程, 返程), ...]) ---
+def _canonical(solutions, objective):
+    pairs = sorted((sol['destination'], sol['outbound'][0], sol['return'][0]) for sol in solutions)
+    return (None if objective is None else round(objective, 6)), pairs
+
+
+def _via_or(engine, prefilter=None, model_cache=None):
+    """通过 OR.load_json_and_solve 求解（与 GUI 使用同一入口）"""
+    def run(data):
+        for key, value in SETTINGS.items():
+            setattr(OR, key, value)
+        fd, path = tempfile.mkstemp(suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            with contextlib.redirect_stdout(io.StringIO()):
+                table, _ = OR.load_json_and_solve(path, prefilter=prefilter, engine=engine,
+                                                    model_cache=model_cache)
+        finally:
+            os.remove(path)
+        if not table:
+            return None, []
+        p = data["params"][table[0][0]]  # 表格中的目标值只保留两位小数，这里按参数重新计算
+        objective = round(p['U'] - SETTINGS["alpha"] * p['D'], 6)
+        return objective, sorted((row[0], row[1], row[3]) for row in table)
+    return run
+
+
+def _decomposed(data):
+    return _canonical(*decomposed_solve(data, executor=None, **SETTINGS))
+
+
+def _query_index(data):
+    normalized, _ = validate_dataset(data)
+    return _canonical(*QueryIndex(normalized).query(**SETTINGS))
+
+
+ENGINES = {
+    "milp": _via_or("milp"),
+    "milp+exact": _via_or("milp", prefilter="exact"),
+    "milp(model_cache)": _via_or("milp", model_cache=os.path.join(tempfile.gettempdir(), "or_regression_models")),
+    "decomposed": _via_or("decomposed"),
+    "decomposed(serial)": _decomposed,
+    "best_first": _via_or("best_first"),
+    "query_index": _query_index,
+}
+REFERENCE_ENGINE = "milp"
+
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f"{name}.json")
+
+
+def update_golden():
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    for name, load in FIXTURES.items():
+        objective, pairs = ENGINES[REFERENCE_ENGINE](load())
+        with open(golden_path(name), "w", encoding="utf-8") as f:
+            json.dump({"settings": SETTINGS, "objective": objective, "solutions": pairs}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"已更新 {golden_path(name)}：目标值 {objective}，{len(pairs)} 个最优解")
+
+
+def check_golden(engines):
+    failures = 0
+    for name, load in FIXTURES.items():
+        with open(golden_path(name), "r", encoding="utf-8") as f:
+            golden = json.load(f)
+        expected = (golden["objective"], [tuple(p) for p in golden["solutions"]])
+        data = load()
+        for engine in engines:
+            got = ENGINES[engine](data)
+            if got == expected:
+                print(f"  通过  {name:<20} {engine}")
+                continue
+            failures += 1
+            print(f"  失败  {name:<20} {engine}：目标值 {got[0]}（应为 {expected[0]}），"
+                  f"{len(got[1])} 个解（应为 {len(expected[1])} 个）")
+            missing = sorted(set(expected[1]) - set(got[1]))[:5]
+            extra = sorted(set(got[1]) - set(expected[1]))[:5]
+            if missing:
+                print(f"        缺少: {missing}")
+            if extra:
+                print(f"        多出: {extra}")
+    return failures
+
+
+# --- 专项检查 ---
+def _connection_solutions(legs, **settings):
+    """由原始时刻表生成换乘车次（出发地 H，目的地 X），返回最优解的 [(去程, 返程)]"""
+    from connections import build_connections, merge_connections
+    data = {"destinations": ["X"], "params": {"X": {"U": 5, "D": 1, "min_stay_hours": 24, "max_stay_hours": 96}},
+            "outbound_trips": {}, "return_trips": {}}
+    settings = dict(SETTINGS, **settings)
+    merge_connections(data, *build_connections(legs, "H", ["X"], out_window=(settings["W_out_start"], settings["W_out_end"]),
+                                               ret_window=(settings["W_ret_start"], settings["W_ret_end"])))
+    normalized, _ = validate_dataset(data)
+    solutions, _ = decomposed_solve(normalized, executor=None, **settings)
+    return sorted((sol['outbound'][0], sol['return'][0]) for sol in solutions)
+
+
+def case_connections_outbound_window():
+    """换乘生成不能因为出发更晚而舍弃较早的去程：去程窗口排除晚班车时仍应选中早班车"""
+    # T2 出发更晚、到达更早、票价相同，但去程窗口只到 8 点
+    legs = [{"train": "T1", "from": "H", "to": "X", "dep_time": 7, "arr_time": 20, "cost": 100},
+            {"train": "T2", "from": "H", "to": "X", "dep_time": 10, "arr_time": 12, "cost": 100},
+            {"train": "R1", "from": "X", "to": "H", "dep_time": 80, "arr_time": 82, "cost": 100}]
+    got = _connection_solutions(legs, W_out_end=8)
+    return None if got == [("T1", "R1")] else f"去程窗口 0~8 时应选 T1，得到 {got}"
+
+
+def case_connections_return_window():
+    """返程同理：R2 从目的地出发更早、回到出发地更早，返程窗口排除 R1 时仍应选中 R2"""
+    legs = [{"train": "T1", "from": "H", "to": "X", "dep_time": 7, "arr_time": 9, "cost": 100},
+            {"train": "R1", "from": "X", "to": "H", "dep_time": 90, "arr_time": 95, "cost": 100},
+            {"train": "R2", "from": "X", "to": "H", "dep_time": 80, "arr_time": 100, "cost": 100}]
+    got = _connection_solutions(legs, W_ret_end=85)
+    return None if got == [("T1", "R2")] else f"返程窗口 72~85 时应选 R2，得到 {got}"
+
+
+def _multi_origin_file(directory, extra_trip_fields=None):
+    """由 data2.json 构造两个出发地车次相同的多出发地文件，返回路径"""
+    data = load_json_file("data2.json")
+    trips = {key: json.loads(json.dumps(data[key])) for key in ("outbound_trips", "return_trips")}
+    if extra_trip_fields:
+        for info in next(iter(trips["outbound_trips"].values())).values():
+            info.update(extra_trip_fields)
+    raw = {"origins": ["A", "B"], "destinations": data["destinations"], "params": data["params"],
+           "outbound_trips": {o: trips["outbound_trips"] for o in ("A", "B")},
+           "return_trips": {o: trips["return_trips"] for o in ("A", "B")}}
+    path = os.path.join(directory, "multi.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(raw, f, ensure_ascii=False)
+    return path
+
+
+def case_watch_multi_origin_unchanged():
+    """监视多出发地文件：内容不变、只是重新写入时不应重新计算任何目的地"""
+    from watch_mode import DatasetWatcher
+    with tempfile.TemporaryDirectory() as directory:
+        path = _multi_origin_file(directory)
+        watcher = DatasetWatcher(path, debounce=0, origin="B", **SETTINGS)
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = watcher.poll(now=0)
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # 重新解析同样的内容
+            watcher.poll(now=1)
+            second = watcher.poll(now=2)
+    if first is None or second is None:
+        return "没有得到求解结果"
+    if second['changed']:
+        return f"内容未变却重新计算了 {len(second['changed'])} 个目的地"
+    return None if second['solutions'] == first['solutions'] else "重新读取后最优解不同"
+
+
+def case_multi_origin_rejects_dropped_fields():
+    """多出发地文件中的 fares / seats / delay_prob 无法存入列存储，应报告错误而不是静默丢弃"""
+    from dataset_validator import DatasetError, load_dataset
+    with tempfile.TemporaryDirectory() as directory:
+        path = _multi_origin_file(directory, {"seats": 100, "delay_prob": 0.1})
+        try:
+            load_dataset(path, origin="A")
+        except DatasetError as e:
+            text = "\n".join(e.report['errors'])
+            return None if "seats" in text and "delay_prob" in text else f"错误中没有指出字段: {text}"
+    return "带 seats / delay_prob 的多出发地文件通过了校验"
+
+
+def case_connections_no_pass_through_home():
+    """途经出发地的列车：不能把 "出发地 → 某站 → 出发地 → 目的地" 当作一个换乘方案"""
+    # 唯一到 X 的方式是 T1 先离开 H、回到 H 后再开往 X；从 H 直接乘 T1 的后一段才是合理方案
+    legs = [{"train": "T1", "from": "H", "to": "A", "dep_time": 6, "arr_time": 7, "cost": 50},
+            {"train": "T1", "from": "A", "to": "H", "dep_time": 7, "arr_time": 8, "cost": 50},
+            {"train": "T1", "from": "H", "to": "X", "dep_time": 8, "arr_time": 10, "cost": 100},
+            {"train": "R1", "from": "X", "to": "H", "dep_time": 80, "arr_time": 82, "cost": 100}]
+    from connections import build_connections
+    outbound, _ = build_connections(legs, "H", ["X"])
+    costs = sorted(trip["cost"] for trip in outbound["X"].values())
+    return None if costs == [100] else f"去程方案票价应只有 [100]，得到 {costs}"
+
+
+CASES = [case_connections_outbound_window, case_connections_return_window, case_connections_no_pass_through_home,
+         case_watch_multi_origin_unchanged,
+         case_multi_origin_rejects_dropped_fields]
+
+
+def check_cases():
+    failures = 0
+    for case in CASES:
+        problem = case()
+        failures += problem is not None
+        print(f"  {'通过' if problem is None else '失败'}  {case.__name__}" + (f"：{problem}" if problem else ""))
+    return failures
+
+
+# --- 性能基准 ---
+def _timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmarks(repeat):
+    """返回 {基准名称: 秒}"""
+    timings = {}
+    large = generate_instance(100, 1000, seed=2025)
+    timings["validate(100x1000)"], (normalized, _) = _timed(lambda: validate_dataset(large), repeat)
+    timings["decomposed(100x1000)"], _ = _timed(lambda: decomposed_solve(normalized, executor=None, **SETTINGS),
+                                                repeat)
+    timings["best_first(100x1000)"], _ = _timed(lambda: best_first_solve(normalized, **SETTINGS), repeat)
+    timings["pareto(100x1000)"], _ = _timed(lambda: pareto_frontier(normalized, **SETTINGS), repeat)
+    timings["query_index_build(100x1000)"], index = _timed(lambda: QueryIndex(normalized), repeat)
+    # 与 GUI 滑块相同，最多列出 LIVE_RESULT_LIMIT 个并列解
+    queries = [dict(SETTINGS, alpha=a / 4, budget=b) for a in range(8) for b in range(400, 1600, 200)]
+    timings["query_index_48_queries"], _ = _timed(
+        lambda: [index.query(limit=OR.LIVE_RESULT_LIMIT, **q) for q in queries], repeat)
+    # MILP 要为最优目的地的每个可行组合各求解一次，实例不宜过大
+    medium = generate_instance(10, 6, seed=7)
+    timings["milp(10x6)"], _ = _timed(lambda: ENGINES["milp"](medium), repeat)
+    return timings
+
+
+def check_benchmarks(timings, baseline, threshold):
+    failures = 0
+    for name, seconds in timings.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"  新增  {name:<30} {seconds:.3f}s（基线中没有记录）")
+            continue
+        limit = max(base * threshold, base + MIN_SLACK)
+        status = "通过" if seconds <= limit else "退化"
+        failures += status == "退化"
+        print(f"  {status}  {name:<30} {seconds:.3f}s  基线 {base:.3f}s  上限 {limit:.3f}s")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="最优解回归检查与性能基准")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES),
+                        help="要检查的求解引擎")
+    parser.add_argument("--update-golden", action="store_true", help="用 MILP 重新生成标准答案")
+    parser.add_argument("--update-baseline", action="store_true", help="重新记录性能基线")
+    parser.add_argument("--skip-bench", action="store_true", help="跳过性能基准")
+    parser.add_argument("--threshold", type=float, default=1.5, help="允许的耗时倍数（相对基线）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个基准重复次数（取最快一次）")
+    args = parser.parse_args()
+
+    if args.update_golden:
+        update_golden()
+    print("--- 最优解回归检查 ---")
+    failures = check_golden(args.engines)
+    print("\n--- 专项检查 ---")
+    failures += check_cases()
+
+    if not args.skip_bench:
+        print("\n--- 性能基准 ---")
+        timings = run_benchmarks(args.repeat)
+        if args.update_baseline or not os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+                json.dump({name: round(t, 4) for name, t in timings.items()}, f, ensure_ascii=False, indent=2)
+            print(f"已写入性能基线 {BASELINE_PATH}")
+            for name, seconds in timings.items():
+                print(f"  {name:<30} {seconds:.3f}s")
+        else:
+            with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+                failures += check_benchmarks(timings, json.load(f), args.threshold)
+
+    print("\n全部通过。" if failures == 0 else f"\n{failures} 项未通过。")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,213 @@
+import csv
+import json
+import os
+import struct
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from tabulate import tabulate
+
+# --- 结果流式导出 ---
+# 并列最优解 / Top-K 方案多达上万条时，先拼成完整表格再用 tabulate 的 grid 格式输出会占用大量时间和内存。
+# 这里的写入器逐行接收结果，每积累 CHUNK_ROWS 行写入一次文件：
+#   .csv   : UTF-8（带 BOM，Excel 可直接打开）
+#   .jsonl : 每行一个 {表头: 值} 对象
+#   .orcol : 紧凑的二进制列式文件。文件头为 MAGIC + 一行 JSON（表头、字节序），之后每块为
+#            [行数 uint32] + 每列 [类型 1 字节][长度 uint64][数据]；
+#            全为整数的列存为 array('q')，其余全为数字的列存为 array('d')；重复值多的文本列（目的地、合规标记等）存为字典 + array('I') 编码；
+#            其余文本列存为 UTF-8 拼接串 + array('q') 偏移量。
+# tabulate 只用于少量结果的交互输出（print_table），多于 SMALL_TABLE_ROWS 行时只打印前几行。
+
+CHUNK_ROWS = 1000
+SMALL_TABLE_ROWS = 200
+MAGIC = b"ORCOL1\n"
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".orcol": "orcol"}
+
+
+class ResultWriter(ABC):
+    """逐行写入结果的基类；可用作上下文管理器，子类实现 _write_chunk"""
+
+    def __init__(self, path, headers, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.headers = list(headers)
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._buffer = []
+        self._file = None
+
+    def write_row(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self):
+        if self._buffer:
+            self._write_chunk(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    @abstractmethod
+    def _write_chunk(self, rows):
+        """把一块行写入 self._file"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvResultWriter(ResultWriter):
+    def __init__(self, path, headers, chunk_rows=CHUNK_ROWS):
+        super().__init__(path, headers, chunk_rows)
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.headers)
+
+    def _write_chunk(self, rows):
+        self._csv.writerows(rows)
+
+
+class JsonlResultWriter(ResultWriter):
+    def __init__(self, path, headers, chunk_rows=CHUNK_ROWS):
+        super().__init__(path, headers, chunk_rows)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def _write_chunk(self, rows):
+        headers = self.headers
+        self._file.write("".join(json.dumps(dict(zip(headers, row)), ensure_ascii=False) + "\n" for row in rows))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _encode_strings(values):
+    parts = [v.encode("utf-8") for v in values]
+    offsets = array('q', [0])
+    for part in parts:
+        offsets.append(offsets[-1] + len(part))
+    return struct.pack("<Q", len(parts)) + offsets.tobytes() + b"".join(parts)
+
+
+def _decode_strings(payload, swap):
+    n = struct.unpack("<Q", payload[:8])[0]
+    offsets = array('q')
+    offsets.frombytes(payload[8:8 + 8 * (n + 1)])
+    if swap:
+        offsets.byteswap()
+    blob = payload[8 + 8 * (n + 1):]
+    return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(n)], 8 + 8 * (n + 1) + offsets[n]
+
+
+class ColumnarResultWriter(ResultWriter):
+    def __init__(self, path, headers, chunk_rows=CHUNK_ROWS):
+        super().__init__(path, headers, chunk_rows)
+        self._file = open(path, "wb")
+        meta = {"headers": self.headers, "byteorder": sys.byteorder}
+        self._file.write(MAGIC + json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _write_chunk(self, rows):
+        out = [struct.pack("<I", len(rows))]
+        for k in range(len(self.headers)):
+            values = [row[k] for row in rows]
+            if all(_is_number(v) for v in values):
+                if all(isinstance(v, int) for v in values) and all(-2 ** 63 <= v < 2 ** 63 for v in values):
+                    kind, payload = b"q", array('q', values).tobytes()
+                else:
+                    kind, payload = b"d", array('d', values).tobytes()
+                out.append(kind + struct.pack("<Q", len(payload)) + payload)
+                continue
+            values = [str(v) for v in values]
+            codes = {}
+            for v in values:
+                codes.setdefault(v, len(codes))
+            if len(codes) * 2 <= len(values):
+                kind = b"c"
+                payload = _encode_strings(list(codes)) + array('I', [codes[v] for v in values]).tobytes()
+            else:
+                kind, payload = b"s", _encode_strings(values)
+            out.append(kind + struct.pack("<Q", len(payload)) + payload)
+        self._file.write(b"".join(out))
+
+
+WRITERS = {"csv": CsvResultWriter, "jsonl": JsonlResultWriter, "orcol": ColumnarResultWriter}
+
+
+def open_writer(path, headers, fmt=None, chunk_rows=CHUNK_ROWS):
+    """按 fmt（csv/jsonl/orcol）或文件扩展名创建写入器"""
+    if fmt is None:
+        fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise ValueError(f"无法根据扩展名判断导出格式: {path}（支持 {', '.join(FORMATS)}）")
+    return WRITERS[fmt](path, headers, chunk_rows)
+
+
+def export_rows(path, headers, rows, fmt=None):
+    """把可迭代的行全部写入文件，返回写入的行数"""
+    with open_writer(path, headers, fmt) as writer:
+        writer.write_rows(rows)
+    return writer.rows_written
+
+
+def read_columnar(path):
+    """读取 .orcol 文件，返回 (表头, 逐行生成器)"""
+    f = open(path, "rb")
+    if f.read(len(MAGIC)) != MAGIC:
+        f.close()
+        raise ValueError(f"不是列式结果文件: {path}")
+    meta = json.loads(f.readline().decode("utf-8"))
+    headers = meta["headers"]
+    swap = meta["byteorder"] != sys.byteorder
+
+    def rows():
+        with f:
+            while True:
+                head = f.read(4)
+                if not head:
+                    return
+                n = struct.unpack("<I", head)[0]
+                columns = []
+                for _ in headers:
+                    kind = f.read(1)
+                    payload = f.read(struct.unpack("<Q", f.read(8))[0])
+                    if kind in (b"d", b"q"):
+                        col = array(kind.decode())
+                        col.frombytes(payload)
+                        if swap:
+                            col.byteswap()
+                        columns.append(col)
+                    elif kind == b"c":
+                        dictionary, used = _decode_strings(payload, swap)
+                        codes = array('I')
+                        codes.frombytes(payload[used:])
+                        if swap:
+                            codes.byteswap()
+                        columns.append([dictionary[c] for c in codes])
+                    else:
+                        columns.append(_decode_strings(payload, swap)[0])
+                yield from zip(*columns)
+
+    return headers, rows()
+
+
+def print_table(table, headers, limit=SMALL_TABLE_ROWS, preview=20):
+    """少量结果用 tabulate 打印；超过 limit 行时只打印前 preview 行"""
+    if len(table) <= limit:
+        print(tabulate(table, headers, tablefmt="grid", stralign="center"))
+        return
+    print(" | ".join(map(str, headers)))
+    for row in table[:preview]:
+        print(" | ".join(map(str, row)))
+    print(f"... 共 {len(table)} 行，只显示前 {preview} 行；完整结果请导出为 CSV/JSONL/ORCOL 文件。")
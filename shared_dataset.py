@@ -0,0 +1,185 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataset_validator import FrozenDict, load_dataset, print_validation_report, thaw
+from decomposed_solve import best_first_solve
+from trip_store import TripStore, stores_from_data
+
+# --- 多进程共享的只读数据集 ---
+# 进程池中的每个求解进程各自解析一遍 JSON，数据量大、进程多时内存放不下，启动也慢。
+# publish() 把校验后的数据集按 trip_store.py 的列式结构写入一个共享文件（默认在内存文件系统 /dev/shm 中）：
+#   MAGIC | 头部 (版本号, 元数据位置, 元数据长度) | 各列数组（按 8 字节对齐）| 元数据 JSON（目的地、参数、各列位置）
+# 求解进程用 attach() / current() 以只读方式 mmap 该文件，TripStore 直接建立在映射的内存上，不复制数据，
+# 启动只需读取元数据（毫秒级）。所有进程共享操作系统的同一份页缓存。
+# 发布新快照时先写入临时文件，再用 os.replace 原子替换：已经映射旧文件的进程继续使用旧版本直到
+# 下一次调用 current()，新版本对之后的调用整体可见，不会读到写了一半的数据。
+# 共享文件只保存车次的发车、到达时间和票价，不含分席别票价等附加字段。
+
+MAGIC = b"ORSHM1\n\0"
+HEADER = struct.Struct("<QQQ")  # 版本号、元数据位置、元数据长度
+ALIGN = 8
+SHARED_DIR = os.environ.get("OR_SHARED_DIR",
+                            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+# 与 TripStore 构造参数的顺序一致
+STORE_COLUMNS = ("dest_offsets", "id_blob", "id_offsets", "dep_time", "arr_time", "cost")
+DIRECTIONS = ("outbound_trips", "return_trips")
+
+
+def shared_path(name, directory=SHARED_DIR):
+    return os.path.join(directory, f"or_dataset_{name}.bin")
+
+
+def read_version(name, directory=SHARED_DIR):
+    """共享文件当前的版本号，不存在时为 None"""
+    try:
+        with open(shared_path(name, directory), "rb") as f:
+            head = f.read(len(MAGIC) + HEADER.size)
+    except FileNotFoundError:
+        return None
+    if head[:len(MAGIC)] != MAGIC:
+        return None
+    return HEADER.unpack_from(head, len(MAGIC))[0]
+
+
+def publish(data, name, directory=SHARED_DIR):
+    """把数据集写入共享文件（原子替换旧版本），返回新的版本号"""
+    path = shared_path(name, directory)
+    version = (read_version(name, directory) or 0) + 1
+    stores = dict(zip(DIRECTIONS, stores_from_data(data)))
+    meta = {key: thaw(value) for key, value in data.items() if key not in DIRECTIONS and key != "fare_classes"}
+    meta["version"] = version
+    meta["byteorder"] = sys.byteorder
+    meta["columns"] = {}
+
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".or_dataset_{name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + HEADER.pack(0, 0, 0))
+            for direction, store in stores.items():
+                columns = meta["columns"][direction] = {}
+                for column in STORE_COLUMNS:
+                    values = getattr(store, column)
+                    f.write(b"\0" * (-f.tell() % ALIGN))
+                    typecode = "B" if column == "id_blob" else values.typecode
+                    columns[column] = [f.tell(), typecode, len(values)]
+                    f.write(values)
+            payload = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+            meta_offset = f.tell()
+            f.write(payload)
+            f.seek(len(MAGIC))
+            f.write(HEADER.pack(version, meta_offset, len(payload)))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return version
+
+
+def remove(name, directory=SHARED_DIR):
+    """删除共享文件；已经映射的进程不受影响"""
+    try:
+        os.remove(shared_path(name, directory))
+    except FileNotFoundError:
+        pass
+
+
+class SharedDataset:
+    """以只读方式映射的一个共享数据集版本；data 与 load_dataset 的结果结构相同，可交给各求解引擎"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        if bytes(buf[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} 不是共享数据集文件")
+        self.version, meta_offset, meta_length = HEADER.unpack_from(buf, len(MAGIC))
+        meta = json.loads(bytes(buf[meta_offset:meta_offset + meta_length]))
+        if meta.pop("byteorder") != sys.byteorder:
+            raise ValueError(f"{path} 的字节序与本机不同")
+        meta.pop("version")
+        layout = meta.pop("columns")
+
+        def column(direction, name):
+            offset, typecode, length = layout[direction][name]
+            size = struct.calcsize(typecode)
+            return buf[offset:offset + length * size].cast(typecode)
+
+        destinations = meta["destinations"]
+        self.stores = {direction: TripStore(destinations, *(column(direction, name) for name in STORE_COLUMNS))
+                       for direction in DIRECTIONS}
+        meta["params"] = {j: FrozenDict(p) for j, p in meta["params"].items()}
+        meta.update({direction: store.as_mapping() for direction, store in self.stores.items()})
+        self.data = FrozenDict(meta)
+
+
+def attach(name, directory=SHARED_DIR):
+    """映射共享数据集的当前版本"""
+    return SharedDataset(shared_path(name, directory))
+
+
+_attached = {}  # (目录, 名称) -> SharedDataset，每个进程一份
+
+
+def current(name, directory=SHARED_DIR):
+    """返回共享数据集最新版本的 data；文件没有被替换时直接使用已有的映射，开销只有一次 stat"""
+    key = (directory, name)
+    shared = _attached.get(key)
+    inode = os.stat(shared_path(name, directory)).st_ino
+    if shared is None or shared.inode != inode:
+        shared = _attached[key] = attach(name, directory)
+    return shared.data
+
+
+def solve_shared(name, settings, directory=SHARED_DIR):
+    """在求解进程中使用：按 settings（alpha、budget、时间窗口）求解共享数据集的最新版本，
+    返回 (版本号, optimal_solutions, target_objective_value)"""
+    data = current(name, directory)
+    version = _attached[(directory, name)].version
+    return (version, *best_first_solve(data, **settings))
+
+
+def _attach_time(name, directory):
+    start = time.perf_counter()
+    current(name, directory)
+    return os.getpid(), time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把数据集发布为多进程共享的只读文件，并演示求解进程映射使用")
+    parser.add_argument("json_path", help="数据文件路径")
+    parser.add_argument("--name", default="default", help="共享数据集名称")
+    parser.add_argument("--dir", default=SHARED_DIR, help="共享文件所在目录（默认 /dev/shm）")
+    parser.add_argument("--origin", default=None, help="多出发地数据文件中的出发地")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="演示用的求解进程数")
+    parser.add_argument("--keep", action="store_true", help="结束后保留共享文件，供其他进程使用")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data, report = load_dataset(args.json_path, origin=args.origin)
+    parse_time = time.perf_counter() - start
+    print_validation_report(report)
+    start = time.perf_counter()
+    version = publish(data, args.name, args.dir)
+    path = shared_path(args.name, args.dir)
+    print(f"解析 {parse_time * 1000:.1f}ms，发布版本 {version} 到 {path}"
+          f"（{os.path.getsize(path) / 1024:.1f} KiB，{(time.perf_counter() - start) * 1000:.1f}ms）")
+
+    settings = [dict(alpha=a / 2, budget=b) for a in range(4) for b in (800, 1200, 1600)]
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            attach_times = dict(pool.map(_attach_time, [args.name] * args.workers, [args.dir] * args.workers))
+            print(f"{len(attach_times)} 个求解进程映射共享数据，最长耗时 {max(attach_times.values()) * 1000:.2f}ms")
+            for s, (v, solutions, objective) in zip(settings, pool.map(solve_shared, [args.name] * len(settings),
+                                                                        settings, [args.dir] * len(settings))):
+                print(f"版本 {v}  α={s['alpha']:<4} 预算={s['budget']:<5} 最优目标值 {objective}，{len(solutions)} 个最优解")
+    finally:
+        if not args.keep:
+            remove(args.name, args.dir)
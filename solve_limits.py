@@ -0,0 +1,114 @@
+import re
+import time
+import pulp
+
+# --- 求解时限、节点上限与 MIP 间隙 ---
+# 逐个排除法会反复调用 CBC，直到出现次优或无解为止；病态实例可能让一次查询一直阻塞。
+# SolveBudget 表示整次查询（包括全部并列解的枚举）的截止时间和每次调用 CBC 的节点上限：
+#   每次调用 CBC 前取剩余时间作为 -sec 参数，时间用完就停止枚举，返回已经找到的解并标记为不完整。
+# CBC 因时限 / 节点上限提前停止时，PuLP 的 status 仍然是 Optimal，只有 sol_status 区分
+# "已证明最优" 和 "只找到可行解"；最优界和间隙只出现在 CBC 的日志里，由 parse_cbc_log 读取。
+
+_LOG_PATTERNS = {
+    "result": re.compile(r"^Result - (.+?)\s*$", re.M),
+    "objective": re.compile(r"^Objective value:\s+(\S+)", re.M),
+    "bound": re.compile(r"^(?:Upper|Lower) bound:\s+(\S+)", re.M),
+    "gap": re.compile(r"^Gap:\s+(\S+)", re.M),
+    "nodes": re.compile(r"^Enumerated nodes:\s+(\d+)", re.M),
+    "wallclock": re.compile(r"Wallclock seconds\):\s+(\S+)"),
+}
+
+
+def parse_cbc_log(text):
+    """从 CBC 日志末尾的汇总中读取 {'result', 'objective', 'bound', 'gap', 'nodes', 'wallclock'}，没有的项为 None"""
+    info = {}
+    for key, pattern in _LOG_PATTERNS.items():
+        matches = pattern.findall(text)
+        value = matches[-1] if matches else None
+        if value is not None and key != "result":
+            value = int(value) if key == "nodes" else float(value)
+        info[key] = value
+    return info
+
+
+def stop_reason(log, allotted=None):
+    """CBC 因预算提前停止时返回 'time_limit' / 'node_limit'，否则返回 None
+
+    allotted 为这次调用给 CBC 的秒数：CBC 2.10 在预处理阶段被时限打断时不输出 "Result - Stopped"，
+    而是报告 "Pre-processing says infeasible"；用满了时限的无解结果因此也按超时处理。
+    """
+    result = (log.get("result") or "").lower()
+    if "time" in result:
+        return "time_limit"
+    if "node" in result:
+        return "node_limit"
+    if allotted is not None and log.get("wallclock") is not None and log["wallclock"] >= allotted:
+        return "time_limit"
+    return None
+
+
+class SolveBudget:
+    """一次查询的总时限（秒）和每次调用 CBC 的节点上限；都为 None 时不限制"""
+
+    def __init__(self, time_limit=None, max_nodes=None, clock=time.monotonic):
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.clock = clock
+        self.start = clock()
+        self.deadline = None if time_limit is None else self.start + time_limit
+        self.allotted = None  # 最近一次调用 CBC 时给出的秒数
+
+    @property
+    def limited(self):
+        return self.time_limit is not None or self.max_nodes is not None
+
+    def elapsed(self):
+        return self.clock() - self.start
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.clock())
+
+    def expired(self):
+        return self.deadline is not None and self.clock() >= self.deadline
+
+    def pulp_solver(self, log_path=None):
+        """按剩余时间创建 PULP_CBC_CMD；log_path 用于之后读取最优界和间隙"""
+        options = {}
+        self.allotted = None
+        if self.deadline is not None:
+            options["timeLimit"] = self.allotted = max(self.remaining(), 0.01)
+        if self.max_nodes is not None:
+            options["maxNodes"] = self.max_nodes
+        if log_path is not None:
+            options["logPath"] = log_path
+        return pulp.PULP_CBC_CMD(msg=0, **options)
+
+    def stop_reason(self, log):
+        """最近一次调用 CBC 是否因预算提前停止，见 stop_reason()"""
+        return stop_reason(log, self.allotted)
+
+    def cbc_args(self):
+        """直接调用 cbc 时的命令行参数"""
+        args = []
+        self.allotted = None
+        if self.deadline is not None:
+            self.allotted = round(max(self.remaining(), 0.01), 3)
+            args += ["-sec", f"{self.allotted:.3f}"]
+        if self.max_nodes is not None:
+            args += ["-maxNodes", str(self.max_nodes)]
+        return args
+
+
+def new_solve_info():
+    """load_json_and_solve 填写的求解信息"""
+    return {
+        'complete': True,        # 是否已证明找到了全部最优解
+        'proven_optimal': None,  # 最优目标值是否已被 CBC 证明（没有调用 CBC 时为 None）
+        'stopped': None,         # 'time_limit' / 'node_limit' / None
+        'bound': None,           # 第一次求解时 CBC 给出的最优界
+        'gap': None,             # 第一次求解的相对间隙（已证明最优时为 0）
+        'solves': 0,             # 调用 CBC 的次数
+        'elapsed': 0.0,          # 总耗时（秒）
+    }
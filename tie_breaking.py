@@ -0,0 +1,116 @@
+import heapq
+import sys
+from decomposed_solve import destination_task, cheapest_pair, iter_feasible_pairs, pair_to_solution, TOL
+from dataset_validator import load_dataset
+from result_export import print_table
+
+# --- 并列最优解的字典序排序 ---
+# 目标值 U - α·D 只与目的地有关，同一目的地（及目标值并列的目的地）的所有可行组合都是最优解，
+# 以前要用 CBC 逐个排除、全部列出后再由用户自己挑选。这里一次完成：
+#   1. 按目标值从高到低检查目的地（cheapest_pair 判断是否存在可行组合），得到并列最优的目的地；
+#   2. 对这些目的地的可行组合按 (次要目标, 第三目标, ...) 组成的键排序，只保留前 top 个（堆），
+#      不需要 CBC，也不需要保存全部并列解。
+# 第一个次要目标为 "cost" 且只要最优的一个时，先求出最低票价，再只枚举票价等于它的组合。
+# OR.py 中指定并列排序时，无论选择哪种求解方式都经由 rank_ties 一次完成，不再逐个列出并列解。
+
+# 名称 -> (说明, 键函数(out, ret, stay, 参数))；键越小越好。out/ret 为 (车次, 发车, 到达, 票价)
+CRITERIA = {
+    "cost": ("总交通成本最低", lambda out, ret, stay, arg: out[3] + ret[3]),
+    "stay": ("停留时间最长", lambda out, ret, stay, arg: -stay),
+    "short_stay": ("停留时间最短", lambda out, ret, stay, arg: stay),
+    "stay_target": ("停留时间最接近", lambda out, ret, stay, arg: abs(stay - arg)),
+    "departure": ("去程出发最早", lambda out, ret, stay, arg: out[1]),
+    "late_departure": ("去程出发最晚", lambda out, ret, stay, arg: -out[1]),
+    "return": ("返程出发最早", lambda out, ret, stay, arg: ret[1]),
+    "late_return": ("返程出发最晚", lambda out, ret, stay, arg: -ret[1]),
+}
+DEFAULT_CRITERIA = ("cost", "departure")
+
+
+def parse_criteria(spec):
+    """把 "cost,stay_target=60,departure" 或 ["cost", ("stay_target", 60)] 解析为 [(名称, 参数), ...]"""
+    items = spec.split(",") if isinstance(spec, str) else spec
+    criteria = []
+    for item in items:
+        if isinstance(item, str):
+            name, _, arg = item.strip().partition("=")
+            arg = float(arg) if arg else None
+        else:
+            name, arg = item
+        if name not in CRITERIA:
+            raise ValueError(f"未知的排序依据: {name}（可选 {', '.join(CRITERIA)}）")
+        if name == "stay_target" and arg is None:
+            raise ValueError("stay_target 需要指定目标停留时间，例如 stay_target=60")
+        criteria.append((name, arg))
+    return criteria
+
+
+def tied_destinations(data, alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end):
+    """返回 (目标值, [(目的地, 任务, 最低票价), ...])：目标值最高的可行目的地（含并列）"""
+    params = data["params"]
+    score = {j: params[j]['U'] - alpha * params[j]['D'] for j in data["destinations"]}
+    target_objective_value = None
+    tied = []
+    for j in sorted(data["destinations"], key=lambda j: -score[j]):
+        if target_objective_value is not None and target_objective_value - score[j] >= TOL:
+            break
+        task = destination_task(data, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+        best = cheapest_pair(task)[1]
+        if best is not None:
+            if target_objective_value is None:
+                target_objective_value = score[j]
+            tied.append((j, task, best))
+    return target_objective_value, tied
+
+
+def rank_ties(data, criteria=DEFAULT_CRITERIA, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24,
+              W_ret_start=72, W_ret_end=120, top=1):
+    """返回 (按 criteria 排序的前 top 个最优解, 目标值)；top 为 None 时返回全部并列解（已排序）"""
+    criteria = parse_criteria(criteria)
+    keys = [(CRITERIA[name][1], arg) for name, arg in criteria]
+    target_objective_value, tied = tied_destinations(data, alpha, budget, W_out_start, W_out_end,
+                                                     W_ret_start, W_ret_end)
+    if target_objective_value is None:
+        return [], None
+
+    if top == 1 and criteria and criteria[0][0] == "cost":
+        # 只要最优的一个：票价高于最低票价的组合不可能排在第一
+        lowest = min(best for _, _, best in tied)
+        tied = [(j, task[:5] + (lowest,), best) for j, task, best in tied if best == lowest]
+
+    def candidates():
+        # 完全相同的键按目的地顺序、去程、返程车次编号排列，保证结果确定
+        for order, (j, task, _) in enumerate(tied):
+            for out, ret in iter_feasible_pairs(task):
+                stay = ret[1] - out[2]
+                yield tuple(fn(out, ret, stay, arg) for fn, arg in keys) + (order, out[0], ret[0]), j, out, ret
+
+    ranked = sorted(candidates(), key=lambda c: c[0]) if top is None else \
+        heapq.nsmallest(top, candidates(), key=lambda c: c[0])
+    params = data["params"]
+    return [pair_to_solution(j, out, ret, params[j]['U'] - alpha * params[j]['D'])
+            for _, j, out, ret in ranked], target_objective_value
+
+
+def describe_criteria(criteria):
+    parts = []
+    for name, arg in parse_criteria(criteria):
+        label = CRITERIA[name][0]
+        parts.append(f"{label} {arg:g}h" if arg is not None else label)
+    return " → ".join(parts)
+
+
+if __name__ == "__main__":
+    # python tie_breaking.py [数据文件] [排序依据，如 cost,stay_target=60,departure] [前 N 个]
+    path = sys.argv[1] if len(sys.argv) > 1 else "edited_travel_data.json"
+    spec = sys.argv[2] if len(sys.argv) > 2 else ",".join(DEFAULT_CRITERIA)
+    top = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    data, _ = load_dataset(path)
+    solutions, objective = rank_ties(data, spec, top=top)
+    if objective is None:
+        print("未找到可行解。")
+        sys.exit(0)
+    print(f"最优目标值 {objective}，并列时依次按：{describe_criteria(spec)}")
+    headers = ["名次", "目的地", "去程车次", "返程车次", "总交通成本", "停留时间(h)", "目标值"]
+    print_table([[k, sol['destination'], sol['outbound'][0], sol['return'][0], sol['cost'], sol['stay'],
+                  f"{sol['objective']:.2f}"] for k, sol in enumerate(solutions, 1)], headers)
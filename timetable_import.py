@@ -0,0 +1,207 @@
+import argparse
+import csv
+import math
+import os
+from datetime import datetime
+
+# --- CSV/TSV 时刻表批量导入 ---
+# 按列读取整张表，每个字段做一次整列转换与校验（发车早于到达、票价非负、车次编号不重复），
+# 所有错误汇总到同一个列表中返回，而不是逐行弹窗。
+# 转换按列进行：时刻表中大量重复的时间和票价文本只解析一次（对整列的不同取值 map），
+# 再按下标取回整列结果；numpy 只是延误评估的可选依赖，导入不依赖它。
+# 绝对时间（如 2025-05-01 08:30）换算为相对起始时间的小时数，规则与编辑器的 get_time_input 相同；
+# 纯数字则视为已经是相对小时数。
+
+FIELDS = ("trip_id", "dest", "direction", "dep_time", "arr_time", "cost")
+FIELD_LABELS = {"trip_id": "车次", "dest": "目的地", "direction": "方向",
+                "dep_time": "发车时间", "arr_time": "到达时间", "cost": "票价"}
+# 自动匹配列名时使用的候选名称（小写比较）
+FIELD_ALIASES = {
+    "trip_id": ("车次", "车次编号", "train", "trip", "trip_id", "id"),
+    "dest": ("目的地", "destination", "dest", "city"),
+    "direction": ("方向", "direction", "dir", "type"),
+    "dep_time": ("发车", "发车时间", "出发时间", "dep", "dep_time", "departure"),
+    "arr_time": ("到达", "到达时间", "arr", "arr_time", "arrival"),
+    "cost": ("票价", "价格", "cost", "price", "fare"),
+}
+OUTBOUND_WORDS = {"去程", "去", "outbound", "out", "o"}
+RETURN_WORDS = {"返程", "返", "return", "ret", "r"}
+
+
+def to_relative_hours(input_date, start_date):
+    """把绝对时间换算为相对 start_date 的小时数（分钟数 >= 30 时进位）"""
+    hours = (input_date - start_date).total_seconds() / 3600
+    if input_date.minute >= 30:
+        return int(hours) + 1
+    return int(hours)
+
+
+def read_table(path, delimiter=None):
+    """读取 CSV/TSV，返回 (表头, {列名: [字符串, ...]})"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if delimiter is None:
+            if os.path.splitext(path)[1].lower() in (".tsv", ".tab"):
+                delimiter = "\t"
+            else:
+                sample = f.read(4096)
+                f.seek(0)
+                try:
+                    delimiter = csv.Sniffer().sniff(sample, delimiters=",\t;").delimiter
+                except csv.Error:
+                    delimiter = ","
+        reader = csv.reader(f, delimiter=delimiter)
+        header = [h.strip() for h in next(reader, [])]
+        rows = [row for row in reader if any(cell.strip() for cell in row)]
+    # 按列转置：之后的每一步都是整列处理
+    columns = {h: [row[k].strip() if k < len(row) else "" for row in rows] for k, h in enumerate(header)}
+    return header, columns
+
+
+def guess_mapping(header):
+    """根据表头猜测 字段 -> 列名 的对应关系"""
+    lowered = {h.lower(): h for h in header}
+    mapping = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias.lower() in lowered:
+                mapping[field] = lowered[alias.lower()]
+                break
+    return mapping
+
+
+def _parse_number(text):
+    """解析数值；无法解析或不是有限数（nan、inf）时返回 None"""
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _convert_column(values, parse):
+    """整列转换：不同的取值各解析一次；返回 (数值列表, 出错的行下标列表)"""
+    unique = list(set(values))
+    parsed = dict(zip(unique, map(parse, unique)))
+    result = [parsed[text] for text in values]
+    return result, [k for k, value in enumerate(result) if value is None]
+
+
+def _convert_times(values, start_date):
+    def parse(text):
+        hours = _parse_number(text)
+        if hours is None:
+            try:
+                hours = to_relative_hours(datetime.fromisoformat(text.replace("/", "-")), start_date)
+            except ValueError:
+                return None
+        return hours
+    return _convert_column(values, parse)
+
+
+def _convert_costs(values):
+    return _convert_column(values, _parse_number)
+
+
+def missing_fields(mapping, default_dest=None, default_direction=None):
+    """没有对应列（目的地、方向也没有默认值）的字段"""
+    defaults = {"dest": default_dest, "direction": default_direction}
+    return [field for field in FIELDS if not mapping.get(field) and defaults.get(field) is None]
+
+
+def import_timetable(columns, mapping, start_date, existing=None, default_dest=None,
+                     default_direction=None):
+    """转换并校验整张表
+
+    mapping: 字段 -> 列名；dest/direction 没有对应列时使用 default_dest/default_direction。
+    existing: {"outbound": outbound_trips, "return": return_trips}，用于检查与已有车次编号重复。
+    返回 {'trips': {"outbound"/"return": {目的地: {车次: {...}}}}, 'errors': [...], 'rows': 行数, 'imported': 导入行数}
+    errors 中每项为 (行号, 说明)，行号从 2 开始（第 1 行是表头）。
+    """
+    existing = existing or {"outbound": {}, "return": {}}
+    n = len(next(iter(columns.values()), []))
+    errors = []
+
+    def column(field):
+        name = mapping.get(field)
+        return columns[name] if name else None
+
+    missing = missing_fields(mapping, default_dest, default_direction)
+    if missing:
+        return {'trips': {"outbound": {}, "return": {}}, 'rows': n, 'imported': 0,
+                'errors': [(1, f"未指定{FIELD_LABELS[field]}列") for field in missing]}
+    trip_ids = column("trip_id")
+    dests = column("dest") or [default_dest] * n
+    directions = column("direction")
+    if directions is None:
+        directions = [default_direction] * n
+    else:
+        directions = ["outbound" if v.lower() in OUTBOUND_WORDS else
+                      "return" if v.lower() in RETURN_WORDS else None for v in directions]
+
+    deps, bad_dep = _convert_times(column("dep_time"), start_date)
+    arrs, bad_arr = _convert_times(column("arr_time"), start_date)
+    costs, bad_cost = _convert_costs(column("cost"))
+
+    invalid = set()
+    for field, bad in (("发车时间", bad_dep), ("到达时间", bad_arr), ("票价", bad_cost)):
+        errors.extend((k + 2, f"{field}无法解析") for k in bad)
+        invalid.update(bad)
+    for k in range(n):
+        if not trip_ids[k]:
+            errors.append((k + 2, "车次编号为空"))
+            invalid.add(k)
+        if not dests[k]:
+            errors.append((k + 2, "目的地为空"))
+            invalid.add(k)
+        if directions[k] is None:
+            errors.append((k + 2, "无法识别去程/返程"))
+            invalid.add(k)
+    parsed = [k for k in range(n) if k not in invalid]
+    bad_order = [k for k in parsed if deps[k] >= arrs[k]]
+    bad_sign = [k for k in parsed if costs[k] < 0]
+    errors.extend((k + 2, "发车时间应早于到达时间") for k in bad_order)
+    errors.extend((k + 2, "票价不能为负") for k in bad_sign)
+    invalid.update(bad_order)
+    invalid.update(bad_sign)
+
+    # 车次编号重复：同一方向、同一目的地内唯一；保留第一个有效的行，其余的报告并跳过
+    first = {}
+    for k, key in enumerate(zip(directions, dests, trip_ids)):
+        if k in invalid:
+            continue
+        direction, dest, tid = key
+        if key in first:
+            errors.append((k + 2, f"车次编号 '{tid}' 与第 {first[key] + 2} 行重复，已跳过"))
+            invalid.add(k)
+            continue
+        first[key] = k
+        if tid in existing.get(direction, {}).get(dest, {}):
+            errors.append((k + 2, f"车次编号 '{tid}' 在目的地 '{dest}' 中已存在"))
+            invalid.add(k)
+
+    trips = {"outbound": {}, "return": {}}
+    for k in range(n):
+        if k in invalid:
+            continue
+        trips[directions[k]].setdefault(dests[k], {})[trip_ids[k]] = {
+            "dep_time": deps[k], "arr_time": arrs[k], "cost": costs[k]}
+    errors.sort()
+    return {'trips': trips, 'errors': errors, 'rows': n, 'imported': n - len(invalid)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="校验 CSV/TSV 时刻表")
+    parser.add_argument("table", help="CSV/TSV 文件")
+    parser.add_argument("--start", default=None, help="起始时间，例如 2025-05-01T00:00（绝对时间换算时使用）")
+    parser.add_argument("--dest", default=None, help="没有目的地列时使用的目的地")
+    parser.add_argument("--direction", choices=["outbound", "return"], default=None,
+                        help="没有方向列时使用的方向")
+    args = parser.parse_args()
+
+    header, columns = read_table(args.table)
+    start = datetime.fromisoformat(args.start) if args.start else datetime(datetime.now().year, 1, 1)
+    result = import_timetable(columns, guess_mapping(header), start,
+                              default_dest=args.dest, default_direction=args.direction)
+    print(f"共 {result['rows']} 行，可导入 {result['imported']} 行，错误 {len(result['errors'])} 条")
+    for row_no, message in result['errors'][:50]:
+        print(f"  第 {row_no} 行：{message}")
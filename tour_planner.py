@@ -0,0 +1,186 @@
+import heapq
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from result_export import print_table
+
+# --- 多城市环线规划 (A→B→C→返程) ---
+# 车次视为时间扩展图中的边：节点为 "在某时刻到达某城市" 的事件。
+# 用标签设定 (label-setting) 的资源约束最短路求解，标签资源为 (时间, 成本, 效用, 已访问城市)，
+# 时间扩展图同一节点上被支配的标签直接剪枝，不需要为每条环线建立 MILP 变量。
+#
+# 数据格式在原有 JSON 基础上增加可选的城市间车次：
+#   "transfer_trips": {"A": {"B": {"车次": {"dep_time": .., "arr_time": .., "cost": ..}}}}
+# 没有 transfer_trips 时退化为原模型的单目的地出行。
+
+M = 10000  # 与 OR.py 一致：缺省的最长停留时间
+
+
+class _Label:
+    """时间扩展图中 "到达某城市" 节点上的一个部分环线"""
+    __slots__ = ("city", "time", "cost", "utility", "visited", "legs")
+
+    def __init__(self, city, time, cost, utility, visited, legs):
+        self.city = city
+        self.time = time
+        self.cost = cost
+        self.utility = utility
+        self.visited = visited
+        self.legs = legs
+
+
+
+def _build_departures(destinations, return_trips, transfer_trips):
+    """按城市整理离开事件（城市间车次与返程），按发车时间排序"""
+    departures = {}
+    for c in destinations:
+        events = []
+        for tid, info in return_trips.get(c, {}).items():
+            events.append((info['dep_time'], info['arr_time'], info['cost'], None, tid))
+        for d, trips in transfer_trips.get(c, {}).items():
+            if d == c or d not in destinations:
+                continue
+            for tid, info in trips.items():
+                events.append((info['dep_time'], info['arr_time'], info['cost'], d, tid))
+        events.sort(key=lambda e: e[0])
+        departures[c] = ([e[0] for e in events], events)
+    return departures
+
+
+def plan_tours(data, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24,
+               W_ret_start=72, W_ret_end=120, max_cities=3, top_k=10):
+    """返回效用最高的 top_k 条环线（按 总效用 降序、总成本 升序）"""
+    destinations = data["destinations"]
+    params = data["params"]
+    outbound_trips = data["outbound_trips"]
+    return_trips = data["return_trips"]
+    transfer_trips = data.get("transfer_trips", {})
+
+    dest_set = set(destinations)
+    score = {j: params[j]['U'] - alpha * params[j]['D'] for j in destinations}
+    stay = {j: (params[j].get('min_stay_hours', 0), params[j].get('max_stay_hours', M)) for j in destinations}
+    departures = _build_departures(dest_set, return_trips, transfer_trips)
+    # 用于上界剪枝：按效用降序排列的正分城市
+    positive_scores = sorted(((c, s) for c, s in score.items() if s > 0), key=lambda cs: -cs[1])
+    # 用于预算剪枝：从每个城市回家的最低剩余成本下界
+    min_ret = {c: min((info['cost'] for info in return_trips.get(c, {}).values()
+                       if W_ret_start <= info['dep_time'] <= W_ret_end), default=float('inf'))
+               for c in destinations}
+    global_min_ret = min(min_ret.values(), default=float('inf'))
+    min_transfer = {c: min((e[2] for e in departures[c][1] if e[3] is not None), default=float('inf'))
+                    for c in destinations}
+    cost_lb = {c: min(min_ret[c], min_transfer[c] + global_min_ret) for c in destinations}
+
+    # 初始标签：满足出发时间窗口和预算的去程车次
+    # 标签按已获效用优先展开，尽早得到高效用的完整环线，使上界剪枝尽快生效
+    heap = []
+    counter = 0
+    node_labels = {}
+    for j in destinations:
+        for tout, info in outbound_trips.get(j, {}).items():
+            if not (W_out_start <= info['dep_time'] <= W_out_end) or info['cost'] + cost_lb[j] > budget:
+                continue
+            leg = ("去程", None, j, tout, info['dep_time'], info['arr_time'], info['cost'])
+            label = _Label(j, info['arr_time'], info['cost'], score[j], frozenset((j,)), (leg,))
+            heapq.heappush(heap, (-label.utility, label.time, counter, label))
+            counter += 1
+
+    tours = []  # 小顶堆，保存当前最好的 top_k 条环线
+    while heap:
+        label = heapq.heappop(heap)[-1]
+        min_stay_c, max_stay_c = stay[label.city]
+        if label.time + min_stay_c > W_ret_end:
+            continue  # 之后的任何车次都赶不上返程窗口
+
+        # 上界剪枝：即使再访问剩余效用最高的城市也无法进入 top_k
+        if len(tours) >= top_k:
+            remaining = max_cities - len(label.visited)
+            bound = label.utility
+            for c, s in positive_scores:
+                if remaining <= 0:
+                    break
+                if c not in label.visited:
+                    bound += s
+                    remaining -= 1
+            if bound < tours[0][0] - 1e-5:
+                continue
+
+        # 可选离开车次区间相同的标签等价于时间扩展图中的同一节点，在其上做支配检查
+        deps, events = departures[label.city]
+        lo = bisect_left(deps, label.time + min_stay_c)
+        hi = bisect_right(deps, label.time + max_stay_c)
+        key = (label.city, lo, hi)
+        bucket = node_labels.setdefault(key, [])
+        # 支配：成本不高、效用不低、已访问城市更少（后续可选城市更多）。
+        # 被 top_k 个标签支配时，其任何延伸都不可能进入前 top_k 名
+        dominated_by = 0
+        label_cost, label_utility, label_visited = label.cost, label.utility, label.visited
+        for other in bucket:
+            if (other.cost <= label_cost and other.utility >= label_utility
+                    and other.visited <= label_visited):
+                dominated_by += 1
+                if dominated_by >= top_k:
+                    break
+        if dominated_by >= top_k:
+            continue
+        bucket.append(label)
+
+        for dep, arr, cost, target, tid in events[lo:hi]:
+            new_cost = label.cost + cost
+            if new_cost > budget:
+                continue
+            if target is None:
+                # 返程：结束环线
+                if not (W_ret_start <= dep <= W_ret_end):
+                    continue
+                leg = ("返程", label.city, None, tid, dep, arr, cost)
+                # 效用按不同城市顺序累加会有浮点误差，取整后再比较
+                entry = (round(label.utility, 6), -new_cost, counter, label.legs + (leg,))
+                counter += 1
+                if len(tours) < top_k:
+                    heapq.heappush(tours, entry)
+                elif entry[:2] > tours[0][:2]:
+                    heapq.heapreplace(tours, entry)
+            else:
+                if (target in label.visited or len(label.visited) >= max_cities or arr < dep
+                        or new_cost + cost_lb[target] > budget):
+                    continue
+                leg = ("中转", label.city, target, tid, dep, arr, cost)
+                new_label = _Label(target, arr, new_cost, label.utility + score[target],
+                                   label.visited | {target}, label.legs + (leg,))
+                heapq.heappush(heap, (-new_label.utility, arr, counter, new_label))
+                counter += 1
+
+    results = []
+    for utility, neg_cost, _, legs in sorted(tours, key=lambda t: (-t[0], -t[1], t[2])):
+        cities = [leg[2] for leg in legs if leg[2] is not None]
+        # 每个城市的停留时间 = 下一段发车时间 - 本段到达时间
+        stays = [legs[k + 1][4] - legs[k][5] for k in range(len(legs) - 1)]
+        results.append({'cities': cities, 'legs': list(legs), 'cost': -neg_cost,
+                        'objective': utility, 'stays': stays})
+    return results
+
+
+def load_json_and_plan_tours(json_path, **kwargs):
+    """读取 JSON 数据并规划多城市环线，返回 (table, headers)"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    tours = plan_tours(data, **kwargs)
+
+    headers = ["排名", "城市路线", "车次", "停留时间(h)", "总交通成本", "目标值"]
+    table = []
+    for rank, tour in enumerate(tours, 1):
+        route = "→".join(tour['cities'])
+        trains = " / ".join(leg[3] for leg in tour['legs'])
+        stays = ", ".join(f"{s:g}" for s in tour['stays'])
+        table.append([rank, route, trains, stays, tour['cost'], f"{tour['objective']:.2f}"])
+    if not tours:
+        print("未找到可行的环线方案。")
+    return table, headers
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "edited_travel_data.json"
+    table, headers = load_json_and_plan_tours(path)
+    if table:
+        print_table(table, headers)
@@ -0,0 +1,142 @@
+import json
+import sys
+from bisect import bisect_left, bisect_right
+
+# --- 求解前的被支配车次剔除 ---
+# 对每个目的地，去程车次 o 能与之搭配的返程是一段按发车时间排序的连续区间
+#   ret.dep ∈ [o.arr + min_stay, o.arr + max_stay] ∩ 返程时间窗口，
+# 返程车次同理对应一段按到达时间排序的去程区间。
+#   exact 模式：只剔除不可能出现在任何可行方案中的车次（不在时间窗口内、没有可搭配车次、
+#               与最便宜的可搭配车次相加仍超预算），多个最优解的枚举结果不变；
+#   aggressive 模式：在 exact 基础上，若另一车次的可搭配区间包含本车次的区间且票价不高，
+#               则本车次被支配，只保留非支配车次。最优目标值不变，但可能少列出并列最优解。
+# 去程必须是早于返程的车次，max_stay 约束决定了 "到达更早" 并不总是更好，因此这里用区间包含判断支配。
+
+M = 10000  # 与 OR.py 一致：缺省的最长停留时间
+
+
+class _SparseMin:
+    """静态区间最小值查询（稀疏表）"""
+
+    def __init__(self, values):
+        self.table = [list(values)]
+        k = 1
+        while 2 * k <= len(values):
+            prev = self.table[-1]
+            self.table.append([min(prev[i], prev[i + k]) for i in range(len(values) - 2 * k + 1)])
+            k *= 2
+
+    def query(self, lo, hi):
+        """返回 values[lo:hi] 的最小值，区间为空时返回 inf"""
+        if lo >= hi:
+            return float('inf')
+        level = (hi - lo).bit_length() - 1
+        row = self.table[level]
+        return min(row[lo], row[hi - (1 << level)])
+
+
+def _partner_ranges(trips, partners, key, partner_key, stay_lo, stay_hi):
+    """计算每个车次可搭配的对方车次区间 [lo, hi) 及其中的最低票价"""
+    partners = sorted(partners, key=lambda t: t[partner_key])
+    times = [t[partner_key] for t in partners]
+    rmq = _SparseMin([t['cost'] for t in partners])
+    result = []
+    for t in trips:
+        lo = bisect_left(times, t[key] + stay_lo)
+        hi = bisect_right(times, t[key] + stay_hi)
+        result.append((lo, hi, rmq.query(lo, hi)))
+    return result
+
+
+def _non_dominated(items):
+    """items 为 (lo, hi, cost, tid)，返回不被其他车次支配的车次编号集合"""
+    # 按 lo 升序、hi 降序、票价升序处理：之前处理过的车次 lo 都不大于当前车次，
+    # 只需查询其中 hi 不小于当前 hi 的最低票价，用树状数组维护后缀最小值。
+    his = sorted({hi for _, hi, _, _ in items}, reverse=True)
+    rank = {hi: i + 1 for i, hi in enumerate(his)}  # hi 越大，下标越小
+    tree = [float('inf')] * (len(his) + 1)
+    kept = set()
+    for lo, hi, cost, tid in sorted(items, key=lambda it: (it[0], -it[1], it[2])):
+        i, best = rank[hi], float('inf')
+        while i > 0:
+            best = min(best, tree[i])
+            i -= i & -i
+        if best <= cost:
+            continue
+        kept.add(tid)
+        i = rank[hi]
+        while i < len(tree):
+            tree[i] = min(tree[i], cost)
+            i += i & -i
+    return kept
+
+
+def filter_dominated_trips(data, mode="exact", budget=1200, W_out_start=0, W_out_end=24,
+                           W_ret_start=72, W_ret_end=120):
+    """返回 (剔除后的数据, 统计报告)，不修改原数据"""
+    if mode not in ("exact", "aggressive"):
+        raise ValueError(f"未知的剔除模式: {mode}")
+    destinations = data["destinations"]
+    params = data["params"]
+    outbound_trips = data["outbound_trips"]
+    return_trips = data["return_trips"]
+
+    new_outbound, new_return = {}, {}
+    for j in destinations:
+        min_stay_j = params[j].get('min_stay_hours', 0)
+        max_stay_j = params[j].get('max_stay_hours', M)
+        outs = [(tid, info) for tid, info in outbound_trips.get(j, {}).items()
+                if W_out_start <= info['dep_time'] <= W_out_end]
+        rets = [(tid, info) for tid, info in return_trips.get(j, {}).items()
+                if W_ret_start <= info['dep_time'] <= W_ret_end]
+
+        # 去程：可搭配返程满足 ret.dep - out.arr ∈ [min_stay, max_stay]
+        out_ranges = _partner_ranges([info for _, info in outs], [info for _, info in rets],
+                                     'arr_time', 'dep_time', min_stay_j, max_stay_j)
+        # 返程：可搭配去程满足 out.arr ∈ [ret.dep - max_stay, ret.dep - min_stay]
+        ret_ranges = _partner_ranges([info for _, info in rets], [info for _, info in outs],
+                                     'dep_time', 'arr_time', -max_stay_j, -min_stay_j)
+
+        out_items = [(lo, hi, info['cost'], tid) for (tid, info), (lo, hi, partner_cost) in zip(outs, out_ranges)
+                     if lo < hi and info['cost'] + partner_cost <= budget]
+        ret_items = [(lo, hi, info['cost'], tid) for (tid, info), (lo, hi, partner_cost) in zip(rets, ret_ranges)
+                     if lo < hi and info['cost'] + partner_cost <= budget]
+
+        if mode == "aggressive":
+            keep_out = _non_dominated(out_items)
+            keep_ret = _non_dominated(ret_items)
+        else:
+            keep_out = {item[3] for item in out_items}
+            keep_ret = {item[3] for item in ret_items}
+        new_outbound[j] = {tid: info for tid, info in outbound_trips.get(j, {}).items() if tid in keep_out}
+        new_return[j] = {tid: info for tid, info in return_trips.get(j, {}).items() if tid in keep_ret}
+
+    before = sum(len(outbound_trips.get(j, {})) + len(return_trips.get(j, {})) for j in destinations)
+    after = sum(len(new_outbound[j]) + len(new_return[j]) for j in destinations)
+    report = {
+        'mode': mode,
+        'outbound_before': sum(len(outbound_trips.get(j, {})) for j in destinations),
+        'outbound_after': sum(len(new_outbound[j]) for j in destinations),
+        'return_before': sum(len(return_trips.get(j, {})) for j in destinations),
+        'return_after': sum(len(new_return[j]) for j in destinations),
+        'reduction_ratio': (1 - after / before) if before else 0.0,
+    }
+    filtered = dict(data)
+    filtered["outbound_trips"] = new_outbound
+    filtered["return_trips"] = new_return
+    return filtered, report
+
+
+def print_filter_report(report):
+    print(f"车次剔除（{report['mode']}）：去程 {report['outbound_before']} → {report['outbound_after']}，"
+          f"返程 {report['return_before']} → {report['return_after']}，"
+          f"缩减比例 {report['reduction_ratio']:.1%}")
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "edited_travel_data.json"
+    mode = sys.argv[2] if len(sys.argv) > 2 else "exact"
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    _, report = filter_dominated_trips(data, mode)
+    print_filter_report(report)
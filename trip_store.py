@@ -0,0 +1,296 @@
+from array import array
+from itertools import repeat
+from collections.abc import Mapping
+from dataset_validator import FrozenDict
+
+# --- 列式车次存储 ---
+# 原数据中每个车次是嵌套在目的地字典里的 {"dep_time", "arr_time", "cost"} 小字典，
+# 每个车次要占用几百字节，热循环里的每次 trips[j][t]['cost'] 还要做两次哈希查找。
+# TripStore 把同一方向的全部车次存成几列连续数组：
+#   dep_time / arr_time / cost : 全为整数时为 array('q')（结果和导出中仍是整数），否则为 array('d')
+#   dest_offsets               : 第 k 个目的地的车次位于行 [dest_offsets[k], dest_offsets[k+1])
+#   车次编号                    : UTF-8 拼接成一个 bytes，另用 id_offsets 记录每行的起止位置
+# 行号就是整数车次 ID，目的地下标就是整数目的地 ID。
+# 分席别票价、座位数、延误参数等少数车次才有的字段存在 extras {行号: FrozenDict} 中。
+# TripRecord 是带 __slots__ 的单行视图；TripsView / DestTripsView 提供与原嵌套字典相同的
+# 读取方式 (trips[j][tid]['cost'] / info.get('seats'))，dataset_validator 校验后的数据集即为这种视图。
+# 热循环不逐行经过视图：trip_tuples() 按 dest_offsets 切出一个目的地的列数组片段，
+# 直接得到 [(车次编号, 发车, 到达, 票价)]，求解引擎、查询索引和 MILP 建模都使用这一接口。
+
+COLUMNS = ("dep_time", "arr_time", "cost")
+
+
+def _column(values):
+    """全为整数的列存为 array('q')，否则为 array('d')"""
+    if all(type(v) is int for v in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            pass
+    return array('d', values)
+
+
+class TripRecord(Mapping):
+    """单个车次的只读视图，兼容 info['cost'] / info.get('seats') 的字典式访问"""
+    __slots__ = ("_store", "row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self.row = row
+
+    @property
+    def trip_id(self):
+        return self._store.trip_id(self.row)
+
+    @property
+    def dest(self):
+        return self._store.destinations[self._store.dest_of(self.row)]
+
+    @property
+    def dep_time(self):
+        return self._store.dep_time[self.row]
+
+    @property
+    def arr_time(self):
+        return self._store.arr_time[self.row]
+
+    @property
+    def cost(self):
+        return self._store.cost[self.row]
+
+    @property
+    def extras(self):
+        """列以外的字段（fares、seats 等），没有时为空字典"""
+        return self._store.extras.get(self.row, {})
+
+    def __getitem__(self, key):
+        if key in COLUMNS:
+            return getattr(self._store, key)[self.row]
+        return self.extras[key]
+
+    def get(self, key, default=None):
+        if key in COLUMNS:
+            return getattr(self._store, key)[self.row]
+        return self.extras.get(key, default)
+
+    def __contains__(self, key):
+        return key in COLUMNS or key in self.extras
+
+    def keys(self):
+        return COLUMNS + tuple(self.extras)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(COLUMNS) + len(self.extras)
+
+    def as_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __eq__(self, other):
+        # 按字段值比较（与原来的车次字典相同），不比较所属的存储和行号
+        if isinstance(other, Mapping):
+            return self.as_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"TripRecord({self.trip_id!r}, dep={self.dep_time}, arr={self.arr_time}, cost={self.cost})"
+
+
+class TripStore:
+    """同一方向（去程或返程）全部车次的列式存储"""
+
+    def __init__(self, destinations, dest_offsets, id_blob, id_offsets, dep_time, arr_time, cost, extras=None):
+        self.destinations = list(destinations)
+        self.dest_index = {j: k for k, j in enumerate(self.destinations)}
+        self.dest_offsets = dest_offsets
+        self.id_blob = id_blob
+        self.id_offsets = id_offsets
+        self.dep_time = dep_time
+        self.arr_time = arr_time
+        self.cost = cost
+        self.extras = {} if extras is None else extras  # 行号 -> 列以外的字段
+        self._ids = {}        # 目的地下标 -> [车次编号]，按需解码
+        self._row_index = {}  # 目的地下标 -> {车次编号: 行号}，按需建立
+
+    @classmethod
+    def from_trip_dicts(cls, destinations, trips):
+        """由原有的 {目的地: {车次: {...}}} 结构构建；车次字典中列以外的字段放入 extras"""
+        dest_offsets = array('q', [0])
+        id_parts, id_offsets = [], array('q', [0])
+        dep_time, arr_time, cost = [], [], []
+        extras = {}
+        for j in destinations:
+            for tid, info in trips.get(j, {}).items():
+                encoded = tid.encode("utf-8")
+                id_parts.append(encoded)
+                id_offsets.append(id_offsets[-1] + len(encoded))
+                if len(info) > len(COLUMNS):
+                    extras[len(dep_time)] = FrozenDict({k: v for k, v in info.items() if k not in COLUMNS})
+                dep_time.append(info['dep_time'])
+                arr_time.append(info['arr_time'])
+                cost.append(info['cost'])
+            dest_offsets.append(len(dep_time))
+        return cls(destinations, dest_offsets, b"".join(id_parts), id_offsets,
+                   _column(dep_time), _column(arr_time), _column(cost), extras)
+
+    def __len__(self):
+        return len(self.dep_time)
+
+    def rows(self, j):
+        """目的地 j 的行号范围"""
+        k = self.dest_index[j]
+        return range(self.dest_offsets[k], self.dest_offsets[k + 1])
+
+    def dest_of(self, row):
+        """行号所属的目的地下标（二分查找 dest_offsets）"""
+        lo, hi = 0, len(self.destinations)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.dest_offsets[mid + 1] <= row:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def trip_id(self, row):
+        return bytes(self.id_blob[self.id_offsets[row]:self.id_offsets[row + 1]]).decode("utf-8")
+
+    def trip_ids(self, j):
+        """目的地 j 的车次编号列表（按行号顺序），每个目的地只解码一次"""
+        k = self.dest_index[j]
+        ids = self._ids.get(k)
+        if ids is None:
+            lo, hi = self.dest_offsets[k], self.dest_offsets[k + 1]
+            blob = bytes(self.id_blob[self.id_offsets[lo]:self.id_offsets[hi]])
+            base = self.id_offsets[lo]
+            bounds = self.id_offsets[lo:hi + 1]
+            if blob.isascii():  # 字节位置即字符位置，整段解码一次后切片
+                text = blob.decode("ascii")
+                ids = [text[a - base:b - base] for a, b in zip(bounds, bounds[1:])]
+            else:
+                ids = [blob[a - base:b - base].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+            self._ids[k] = ids
+        return ids
+
+    def trip_tuples(self, j):
+        """目的地 j 的全部车次 [(车次编号, 发车, 到达, 票价)]，直接切取列数组"""
+        k = self.dest_index[j]
+        lo, hi = self.dest_offsets[k], self.dest_offsets[k + 1]
+        return list(zip(self.trip_ids(j), self.dep_time[lo:hi], self.arr_time[lo:hi], self.cost[lo:hi]))
+
+    def row_of(self, j, tid):
+        """由 (目的地, 车次编号) 查行号，找不到时抛出 KeyError"""
+        k = self.dest_index[j]
+        index = self._row_index.get(k)
+        if index is None:
+            index = dict(zip(self.trip_ids(j), range(self.dest_offsets[k], self.dest_offsets[k + 1])))
+            self._row_index[k] = index
+        return index[tid]
+
+    def record(self, row):
+        return TripRecord(self, row)
+
+    def as_mapping(self):
+        """返回兼容 trips[j][tid]['cost'] 访问方式的只读视图"""
+        return TripsView(self)
+
+    def to_trip_dicts(self):
+        """还原为原有的嵌套字典结构（用于保存 JSON）"""
+        return {j: {tid: TripRecord(self, row).as_dict() for tid, row in zip(self.trip_ids(j), self.rows(j))}
+                for j in self.destinations}
+
+    def nbytes(self):
+        """各列占用的字节数（不含 Python 对象头）"""
+        return (len(self.id_blob) + sum(col.itemsize * len(col) for col in
+                (self.dest_offsets, self.id_offsets, self.dep_time, self.arr_time, self.cost)))
+
+
+class DestTripsView(Mapping):
+    """某个目的地的车次视图：{车次编号: TripRecord}"""
+    __slots__ = ("_store", "_j")
+
+    def __init__(self, store, j):
+        self._store = store
+        self._j = j
+
+    def __getitem__(self, tid):
+        return TripRecord(self._store, self._store.row_of(self._j, tid))
+
+    def __iter__(self):
+        return iter(self._store.trip_ids(self._j))
+
+    def __len__(self):
+        return len(self._store.rows(self._j))
+
+    def __contains__(self, tid):
+        try:
+            self._store.row_of(self._j, tid)
+        except KeyError:
+            return False
+        return True
+
+    def items(self):
+        store = self._store
+        return zip(store.trip_ids(self._j), map(TripRecord, repeat(store), store.rows(self._j)))
+
+    def trip_tuples(self):
+        return self._store.trip_tuples(self._j)
+
+    def __eq__(self, other):
+        if isinstance(other, DestTripsView):
+            # 直接比较两段列数组（及附加字段），不为每个车次建立 TripRecord
+            return self._by_id() == other._by_id()
+        return Mapping.__eq__(self, other)
+
+    def _by_id(self):
+        extras = self._store.extras
+        return {t[0]: t[1:] + (extras.get(row),) for t, row in zip(self.trip_tuples(), self._store.rows(self._j))}
+
+    __hash__ = None
+
+
+class TripsView(Mapping):
+    """整个方向的车次视图：{目的地: DestTripsView}"""
+    __slots__ = ("_store",)
+
+    def __init__(self, store):
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store
+
+    def __getitem__(self, j):
+        if j not in self._store.dest_index:
+            raise KeyError(j)
+        return DestTripsView(self._store, j)
+
+    def __iter__(self):
+        return iter(self._store.destinations)
+
+    def __len__(self):
+        return len(self._store.destinations)
+
+
+def trip_tuples(trips):
+    """一个目的地车次的 [(车次编号, 发车, 到达, 票价)]；trips 为 DestTripsView 时直接读列数组，否则为原嵌套字典"""
+    if isinstance(trips, DestTripsView):
+        return trips.trip_tuples()
+    return [(tid, info['dep_time'], info['arr_time'], info['cost']) for tid, info in trips.items()]
+
+
+def stores_from_data(data):
+    """由数据文件内容构建 (去程 TripStore, 返程 TripStore)；已是列式视图的方向直接取出其存储"""
+    destinations = list(data["destinations"])
+    stores = []
+    for key in ("outbound_trips", "return_trips"):
+        trips = data[key]
+        if isinstance(trips, TripsView) and trips.store.destinations == destinations:
+            stores.append(trips.store)
+        else:
+            stores.append(TripStore.from_trip_dicts(destinations, trips))
+    return tuple(stores)
@@ -0,0 +1,152 @@
+import argparse
+import os
+import time
+from decomposed_solve import destination_task, cheapest_pair, feasible_pairs, pair_to_solution, TOL
+from dataset_validator import load_dataset, print_validation_report, DatasetError
+from result_export import open_writer, print_table
+
+# --- 监视模式：数据文件变化后自动重新求解 ---
+# 按固定间隔检查文件的 (修改时间, 大小)，两次检查之间线程处于休眠状态，空闲时几乎不占 CPU。
+# 检测到变化后等文件在 debounce 秒内不再变化（一次生成过程往往分多次写入）再读取；
+# 读到写了一半的文件（JSON 无效）时保留上次结果，下一轮再试。
+# 与上一次解析的数据逐个目的地比较参数和车次，只对有变化的目的地重新计算最低可行票价，
+# 再合并所有目的地得到新的最优解集合（与 decomposed_solve 的 map / reduce 相同）。
+
+
+class DatasetWatcher:
+    """监视一个数据文件；poll() 非阻塞，适合在 GUI 的 after 回调中调用"""
+
+    def __init__(self, path, alpha=1.0, budget=1200, W_out_start=0, W_out_end=24, W_ret_start=72,
+                 W_ret_end=120, debounce=0.5, origin=None):
+        self.path = path
+        self.origin = origin  # 多出发地数据文件中的出发地
+        self.settings = (alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+        self.debounce = debounce
+        self._stat = None        # 上次读取时的 (mtime_ns, size)
+        self._seen = None        # 最近一次看到的 (mtime_ns, size)
+        self._seen_at = 0.0
+        self.data = None         # 上次解析的数据
+        self._best = {}          # 目的地 -> 最低可行总票价（不可行为 None）
+        self._pairs = {}         # 目的地 -> 全部可行组合（只为并列最优的目的地计算）
+
+    def _changed_destinations(self, data):
+        """与上次的数据比较，返回 (有变化的目的地, 被删除的目的地)"""
+        old = self.data
+        if old is None:
+            return list(data["destinations"]), []
+        changed = []
+        for j in data["destinations"]:
+            if (j not in old["params"] or old["params"][j] != data["params"][j]
+                    or old["outbound_trips"].get(j) != data["outbound_trips"].get(j)
+                    or old["return_trips"].get(j) != data["return_trips"].get(j)):
+                changed.append(j)
+        removed = [j for j in old["destinations"] if j not in data["params"]]
+        return changed, removed
+
+    def poll(self, now=None):
+        """检查一次文件；有新结果时返回 {'solutions', 'objective', 'changed', 'removed'}，否则返回 None"""
+        now = time.monotonic() if now is None else now
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        stat = (st.st_mtime_ns, st.st_size)
+        if stat == self._stat:
+            return None
+        if stat != self._seen:
+            self._seen, self._seen_at = stat, now
+            if self._stat is not None:  # 首次读取不需要等待
+                return None
+        if self._stat is not None and now - self._seen_at < self.debounce:
+            return None
+
+        try:
+            data, report = load_dataset(self.path, origin=self.origin)
+        except DatasetError as e:
+            print_validation_report(e.report)
+            self._stat = stat
+            return None
+        except ValueError:
+            return None  # 文件可能还没写完，下一轮再试
+        print_validation_report(report)
+        self._stat = stat
+        return self._resolve(data)
+
+    def _resolve(self, data):
+        alpha, budget, W_out_start, W_out_end, W_ret_start, W_ret_end = self.settings
+        changed, removed = self._changed_destinations(data)
+        for j in removed:
+            self._best.pop(j, None)
+            self._pairs.pop(j, None)
+        tasks = {}
+        for j in changed:
+            tasks[j] = destination_task(data, j, budget, W_out_start, W_out_end, W_ret_start, W_ret_end)
+            self._best[j] = cheapest_pair(tasks[j])[1]
+            self._pairs.pop(j, None)
+        self.data = data
+
+        params = data["params"]
+        score = {j: params[j]['U'] - alpha * params[j]['D'] for j in data["destinations"]}
+        feasible = [j for j in data["destinations"] if self._best.get(j) is not None]
+        solutions, objective = [], None
+        if feasible:
+            objective = max(score[j] for j in feasible)
+            for j in feasible:
+                if abs(score[j] - objective) >= TOL:
+                    continue
+                if j not in self._pairs:
+                    task = tasks.get(j) or destination_task(data, j, budget, W_out_start, W_out_end,
+                                                            W_ret_start, W_ret_end)
+                    self._pairs[j] = feasible_pairs(task)[1]
+                solutions.extend(pair_to_solution(j, out, ret, score[j]) for out, ret in self._pairs[j])
+        return {'solutions': solutions, 'objective': objective, 'changed': changed, 'removed': removed}
+
+    def run(self, on_result, interval=1.0, stop_event=None):
+        """阻塞运行：每 interval 秒检查一次，有新结果时调用 on_result(result)"""
+        while stop_event is None or not stop_event.is_set():
+            result = self.poll()
+            if result is not None:
+                on_result(result)
+            if stop_event is not None:
+                stop_event.wait(interval)
+            else:
+                time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="监视数据文件，变化后自动重新求解")
+    parser.add_argument("json_path", nargs="?", default="edited_travel_data.json", help="数据文件路径")
+    parser.add_argument("--interval", type=float, default=1.0, help="检查间隔（秒）")
+    parser.add_argument("--debounce", type=float, default=0.5, help="文件停止变化多久后再读取（秒）")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--budget", type=float, default=1200)
+    parser.add_argument("--out-window", type=float, nargs=2, default=(0, 24), metavar=("START", "END"))
+    parser.add_argument("--ret-window", type=float, nargs=2, default=(72, 120), metavar=("START", "END"))
+    parser.add_argument("--export", default=None, help="每次更新后写入的结果文件 (.csv/.jsonl/.orcol)")
+    parser.add_argument("--origin", default=None, help="多出发地数据文件中的出发地")
+    args = parser.parse_args()
+
+    watcher = DatasetWatcher(args.json_path, args.alpha, args.budget, *args.out_window, *args.ret_window,
+                             debounce=args.debounce, origin=args.origin)
+    headers = ["目的地", "去程车次", "去程票价", "返程车次", "返程票价", "总交通成本", "停留时间(h)", "目标值"]
+
+    def report(result):
+        stamp = time.strftime("%H:%M:%S")
+        print(f"\n[{stamp}] 重新计算了 {len(result['changed'])} 个目的地"
+              + (f"，删除 {len(result['removed'])} 个" if result['removed'] else ""))
+        if result['objective'] is None:
+            print("未找到可行解。")
+            return
+        table = [[sol['destination'], sol['outbound'][0], sol['outbound'][1], sol['return'][0], sol['return'][1],
+                  sol['cost'], sol['stay'], f"{sol['objective']:.2f}"] for sol in result['solutions']]
+        print(f"最优目标值 {result['objective']}，{len(table)} 个最优解")
+        print_table(table, headers)
+        if args.export:
+            with open_writer(args.export, headers) as writer:
+                writer.write_rows(table)
+
+    print(f"正在监视 {args.json_path}（Ctrl+C 退出）")
+    try:
+        watcher.run(report, interval=args.interval)
+    except KeyboardInterrupt:
+        pass